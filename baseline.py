@@ -0,0 +1,506 @@
+import json
+import threading
+from typing import Optional
+
+import numpy as np
+
+# Parameters of the quantile sketch of each column, the same as SageMaker Model Monitor
+# https://docs.aws.amazon.com/sagemaker/latest/dg/model-monitor-byoc-statistics.html
+KLL_K = 2048
+KLL_C = 0.64
+
+# Number of equal width buckets the distribution of each column is reported with
+DISTRIBUTION_BUCKETS = 10
+
+# Counts and moments of every column, saved with the quantile sketches to resume the statistics
+STATISTICS_ARRAYS = [
+    "present",
+    "missing",
+    "sum",
+    "mean",
+    "m2",
+    "min",
+    "max",
+    "integral",
+]
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch of a column. Values are kept in levels, every value in level `h`
+    standing for `2**h` values, and a level holding more values than its capacity is
+    sorted and every other value is promoted to the level above. The memory used is
+    bounded by `k`, regardless of the number of values added, and sketches of different
+    chunks of a column can be merged.
+    """
+
+    def __init__(self, k: int = KLL_K, c: float = KLL_C, seed: Optional[int] = None):
+        """
+        :param k: Capacity of the highest level, the larger the more accurate
+        :param c: Capacity of each level relative to the level above it
+        :param seed: Seed of the random number generator choosing the values promoted
+        """
+        self.k = k
+        self.c = c
+        self.count = 0
+        self.levels: list[np.ndarray] = [np.zeros(0, dtype=np.float64)]
+        self._generator = np.random.default_rng(seed)
+
+    def capacity(self, level: int) -> int:
+        """
+        :param level: Level of the sketch, 0 is the lowest
+        :return: maximum number of values the level holds before it is compacted
+        """
+        depth = len(self.levels) - 1 - level
+        return max(2, int(np.ceil(self.k * self.c**depth)))
+
+    def update(self, values: np.ndarray) -> None:
+        """
+        :param values: Values added to the sketch, missing values should be removed first
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        self.count += values.shape[0]
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compact()
+
+    def merge(self, other: "KLLSketch") -> None:
+        """
+        :param other: Sketch of other values of the same column, added to this sketch
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.zeros(0, dtype=np.float64))
+        for level, values in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], values])
+        self.count += other.count
+        self._compact()
+
+    def _compact(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            values = self.levels[level]
+            if values.shape[0] <= self.capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.zeros(0, dtype=np.float64))
+            values = np.sort(values)
+            # An odd value out stays at this level, so no weight is lost.
+            odd = values.shape[0] % 2
+            offset = int(self._generator.integers(2))
+            promoted = values[odd:][offset::2]
+            self.levels[level] = values[:odd]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            # Capacities depend on the number of levels, so check every level again.
+            level = 0
+
+    def weighted_values(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :return: every value held by the sketch, sorted, and the number of values each stands for
+        """
+        values = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [
+                np.full(level.shape[0], 2.0**index)
+                for index, level in enumerate(self.levels)
+            ]
+        )
+        order = np.argsort(values, kind="stable")
+        return values[order], weights[order]
+
+    def quantiles(self, q: np.ndarray) -> np.ndarray:
+        """
+        :param q: Quantiles to estimate, between 0 and 1
+        :return: estimated value of each quantile, NaN when the sketch is empty
+        """
+        q = np.asarray(q, dtype=np.float64)
+        values, weights = self.weighted_values()
+        if values.shape[0] == 0:
+            return np.full(q.shape, np.nan)
+        cumulative = np.cumsum(weights)
+        index = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        return values[np.minimum(index, values.shape[0] - 1)]
+
+    def buckets(self, lower: float, upper: float, buckets: int) -> list[dict]:
+        """
+        :param lower: Lower bound of the first bucket, the smallest value of the column
+        :param upper: Upper bound of the last bucket, the largest value of the column
+        :param buckets: Number of equal width buckets
+        :return: estimated number of values within each bucket
+        """
+        values, weights = self.weighted_values()
+        counts, edges = np.histogram(
+            values, bins=buckets, range=(lower, upper), weights=weights
+        )
+        return [
+            {
+                "lower_bound": float(low),
+                "upper_bound": float(high),
+                "count": float(count),
+            }
+            for low, high, count in zip(edges[:-1], edges[1:], counts)
+        ]
+
+    def generator_state(self) -> str:
+        """
+        :return: state of the random number generator choosing the values promoted, as JSON
+        """
+        return json.dumps(self._generator.bit_generator.state)
+
+    def restore(
+        self, levels: list[np.ndarray], count: int, generator_state: str
+    ) -> None:
+        """
+        Continue from a saved sketch, promoting the same values as the saved sketch would have.
+
+        :param levels: Values held by each level of the saved sketch
+        :param count: Number of values added to the saved sketch
+        :param generator_state: State of the random number generator, see `generator_state`
+        """
+        self.levels = [np.asarray(level, dtype=np.float64) for level in levels]
+        self.count = count
+        self._generator.bit_generator.state = json.loads(generator_state)
+
+    def to_dict(self) -> dict:
+        """
+        :return: the sketch as saved within Model Monitor statistics
+        """
+        return {
+            "parameters": {"c": self.c, "k": float(self.k)},
+            "data": [level.tolist() for level in self.levels],
+        }
+
+
+class ColumnStatistics:
+    """
+    Statistics of every column of the test data, updated chunk by chunk in a single pass:
+    the count of present and missing (NaN) values, mean and standard deviation, minimum
+    and maximum, whether every value is a whole number and a quantile sketch. Counts and
+    moments are updated for every column at once, and are merged with Chan's parallel
+    algorithm, so the chunks can arrive in any order.
+    """
+
+    def __init__(
+        self, columns: int, k: int = KLL_K, c: float = KLL_C, seed: Optional[int] = None
+    ):
+        """
+        :param columns: Number of columns
+        :param k: Capacity of the highest level of each quantile sketch
+        :param c: Capacity of each level of a sketch relative to the level above it
+        :param seed: Seed of the quantile sketches
+        """
+        self.present = np.zeros(columns, dtype=np.int64)
+        self.missing = np.zeros(columns, dtype=np.int64)
+        self.sum = np.zeros(columns, dtype=np.float64)
+        self.mean = np.zeros(columns, dtype=np.float64)
+        # Sum of squared differences from the mean.
+        self.m2 = np.zeros(columns, dtype=np.float64)
+        self.min = np.full(columns, np.inf)
+        self.max = np.full(columns, -np.inf)
+        self.integral = np.ones(columns, dtype=bool)
+        self.sketches = [
+            KLLSketch(k=k, c=c, seed=None if seed is None else seed + column)
+            for column in range(columns)
+        ]
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self) -> int:
+        return int(self.present[0] + self.missing[0]) if self.present.size else 0
+
+    def update(self, values: np.ndarray) -> None:
+        """
+        Add a chunk of rows, safe to call from several threads.
+
+        :param values: `(rows, columns)` values of each column, NaN for a missing value
+        """
+        values = np.asarray(values, dtype=np.float64)
+        is_present = ~np.isnan(values)
+        present = is_present.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            total = np.where(is_present, values, 0.0).sum(axis=0)
+            mean = np.where(present > 0, total / present, 0.0)
+            m2 = np.where(is_present, (values - mean) ** 2, 0.0).sum(axis=0)
+            integral = np.all(~is_present | (values == np.trunc(values)), axis=0)
+        low = np.where(is_present, values, np.inf).min(axis=0, initial=np.inf)
+        high = np.where(is_present, values, -np.inf).max(axis=0, initial=-np.inf)
+        with self._lock:
+            self._merge_moments(present, total, mean, m2)
+            self.missing += values.shape[0] - present
+            self.min = np.minimum(self.min, low)
+            self.max = np.maximum(self.max, high)
+            self.integral &= integral
+            for column, sketch in enumerate(self.sketches):
+                sketch.update(values[is_present[:, column], column])
+
+    def merge(self, other: "ColumnStatistics") -> None:
+        """
+        :param other: Statistics of other rows of the same columns, added to these statistics
+        """
+        with self._lock:
+            self._merge_moments(other.present, other.sum, other.mean, other.m2)
+            self.missing += other.missing
+            self.min = np.minimum(self.min, other.min)
+            self.max = np.maximum(self.max, other.max)
+            self.integral &= other.integral
+            for sketch, other_sketch in zip(self.sketches, other.sketches):
+                sketch.merge(other_sketch)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """
+        :return: every count, moment and sketch, as arrays that can be saved in the NPZ format
+        """
+        with self._lock:
+            depth = max(len(sketch.levels) for sketch in self.sketches)
+            lengths = np.zeros((len(self.sketches), depth), dtype=np.int64)
+            for column, sketch in enumerate(self.sketches):
+                lengths[column, : len(sketch.levels)] = [
+                    level.shape[0] for level in sketch.levels
+                ]
+            return {
+                **{name: getattr(self, name).copy() for name in STATISTICS_ARRAYS},
+                "sketch_values": np.concatenate(
+                    [level for sketch in self.sketches for level in sketch.levels]
+                ),
+                "sketch_lengths": lengths,
+                "sketch_depths": np.asarray(
+                    [len(sketch.levels) for sketch in self.sketches], dtype=np.int64
+                ),
+                "sketch_counts": np.asarray(
+                    [sketch.count for sketch in self.sketches], dtype=np.int64
+                ),
+                "sketch_generators": np.asarray(
+                    [sketch.generator_state() for sketch in self.sketches]
+                ),
+            }
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: dict[str, np.ndarray], seed: Optional[int] = None
+    ) -> "ColumnStatistics":
+        """
+        :param arrays: statistics saved by `to_arrays`
+        :param seed: Seed of the quantile sketches, as when the statistics were saved
+        :return: the saved statistics, updated from where they were saved
+        """
+        lengths = arrays["sketch_lengths"]
+        statistics = cls(columns=lengths.shape[0], seed=seed)
+        for name in STATISTICS_ARRAYS:
+            setattr(
+                statistics, name, arrays[name].astype(getattr(statistics, name).dtype)
+            )
+        width = lengths.shape[1]
+        levels = np.split(arrays["sketch_values"], np.cumsum(lengths.reshape(-1))[:-1])
+        for column, sketch in enumerate(statistics.sketches):
+            sketch.restore(
+                levels=[
+                    levels[column * width + level]
+                    for level in range(int(arrays["sketch_depths"][column]))
+                ],
+                count=int(arrays["sketch_counts"][column]),
+                generator_state=str(arrays["sketch_generators"][column]),
+            )
+        return statistics
+
+    def _merge_moments(
+        self, present: np.ndarray, total: np.ndarray, mean: np.ndarray, m2: np.ndarray
+    ) -> None:
+        combined = self.present + present
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean - self.mean
+            self.mean = np.where(
+                combined > 0, self.mean + delta * present / combined, 0.0
+            )
+            self.m2 = np.where(
+                combined > 0,
+                self.m2 + m2 + delta**2 * self.present * present / combined,
+                0.0,
+            )
+        self.present = combined
+        self.sum = self.sum + total
+
+    def inferred_type(self, column: int) -> str:
+        """
+        :param column: Index of the column
+        :return: `Integral` or `Fractional`, `Unknown` when every value is missing
+        """
+        if self.present[column] == 0:
+            return "Unknown"
+        return "Integral" if self.integral[column] else "Fractional"
+
+    def feature_statistics(self, column: int, name: str) -> dict:
+        """
+        :param column: Index of the column
+        :param name: Name of the column within the statistics
+        :return: statistics of the column in the Model Monitor format
+        """
+        feature = {"name": name, "inferred_type": self.inferred_type(column)}
+        common = {
+            "num_present": int(self.present[column]),
+            "num_missing": int(self.missing[column]),
+        }
+        if self.present[column] == 0:
+            feature["numerical_statistics"] = {"common": common}
+            return feature
+        sketch = self.sketches[column]
+        feature["numerical_statistics"] = {
+            "common": common,
+            "mean": float(self.mean[column]),
+            "sum": float(self.sum[column]),
+            # Population standard deviation, as reported by Model Monitor.
+            "std_dev": float(np.sqrt(self.m2[column] / self.present[column])),
+            "min": float(self.min[column]),
+            "max": float(self.max[column]),
+            "distribution": {
+                "kll": {
+                    "buckets": sketch.buckets(
+                        lower=float(self.min[column]),
+                        upper=float(self.max[column]),
+                        buckets=DISTRIBUTION_BUCKETS,
+                    ),
+                    "sketch": sketch.to_dict(),
+                }
+            },
+        }
+        return feature
+
+    def feature_constraints(self, column: int, name: str) -> dict:
+        """
+        :param column: Index of the column
+        :param name: Name of the column within the constraints
+        :return: constraints suggested for the column in the Model Monitor format
+        """
+        rows = self.present[column] + self.missing[column]
+        feature = {
+            "name": name,
+            "inferred_type": self.inferred_type(column),
+            "completeness": float(self.present[column] / rows) if rows else 0.0,
+        }
+        if self.present[column]:
+            feature["num_constraints"] = {
+                "is_non_negative": bool(self.min[column] >= 0)
+            }
+        return feature
+
+
+def statistics_json(statistics: ColumnStatistics, columns: dict[str, int]) -> str:
+    """
+    :param statistics: Statistics of every column of the test data
+    :param columns: Index of each column included, by the name it is reported with
+    :return: `statistics.json` of a SageMaker Model Monitor baseline
+    """
+    return json.dumps(
+        {
+            "version": 0.0,
+            "dataset": {"item_count": statistics.rows},
+            "features": [
+                statistics.feature_statistics(column=column, name=name)
+                for name, column in columns.items()
+            ],
+        }
+    )
+
+
+def constraints_json(statistics: ColumnStatistics, columns: dict[str, int]) -> str:
+    """
+    :param statistics: Statistics of every column of the test data
+    :param columns: Index of each column included, by the name it is reported with
+    :return: `constraints.json` of a SageMaker Model Monitor baseline
+    """
+    return json.dumps(
+        {
+            "version": 0.0,
+            "features": [
+                statistics.feature_constraints(column=column, name=name)
+                for name, column in columns.items()
+            ],
+            # https://docs.aws.amazon.com/sagemaker/latest/dg/model-monitor-byoc-constraints.html
+            "monitoring_config": {
+                "evaluate_constraints": "Enabled",
+                "emit_metrics": "Enabled",
+                "datatype_check_threshold": 1.0,
+                "domain_content_threshold": 1.0,
+                "distribution_constraints": {
+                    "perform_comparison": "Enabled",
+                    "comparison_threshold": 0.1,
+                    "comparison_method": "Robust",
+                },
+            },
+        }
+    )
+
+
+class BaselineStatistics:
+    """
+    Statistics of the features, target variable and predictions of every row evaluated,
+    updated as the predictions of each mini-batch are received. The number of columns is
+    found from the first mini-batch.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        """
+        :param seed: Seed of the quantile sketches
+        """
+        self.seed = seed
+        self.columns: Optional[ColumnStatistics] = None
+        self.features = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self) -> int:
+        return self.columns.rows if self.columns is not None else 0
+
+    def update(
+        self, features: np.ndarray, actuals: np.ndarray, predictions: np.ndarray
+    ) -> None:
+        """
+        Add a mini-batch, safe to call from several threads.
+
+        :param features: features of each row
+        :param actuals: actual class of each row
+        :param predictions: predictions of each row, with a column for each endpoint evaluated
+        """
+        values = np.column_stack([features, actuals, predictions])
+        with self._lock:
+            if self.columns is None:
+                self.columns = ColumnStatistics(columns=values.shape[1], seed=self.seed)
+                self.features = features.shape[1]
+        self.columns.update(values)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """
+        :return: the statistics as arrays that can be saved in the NPZ format, none before
+            the first mini-batch
+        """
+        if self.columns is None:
+            return {}
+        return {"features": np.asarray(self.features), **self.columns.to_arrays()}
+
+    def restore(self, arrays: dict[str, np.ndarray]) -> None:
+        """
+        Continue from statistics saved by `to_arrays`, such as those of a previous attempt
+        of the evaluation, so the statistics include every row evaluated by either attempt.
+
+        :param arrays: statistics saved by `to_arrays`
+        """
+        with self._lock:
+            self.features = int(arrays["features"])
+            self.columns = ColumnStatistics.from_arrays(arrays, seed=self.seed)
+
+    def files(
+        self, feature_names: list[str], target_column: str, target: int = 0
+    ) -> dict[str, str]:
+        """
+        :param feature_names: Name of each feature column, in order
+        :param target_column: Name of the target variable column
+        :param target: Index of the endpoint whose predictions are included
+        :return: `statistics.json` and `constraints.json` of a SageMaker Model Monitor baseline
+        """
+        if len(feature_names) != self.features:
+            feature_names = ["_c{}".format(column) for column in range(self.features)]
+        columns = {name: column for column, name in enumerate(feature_names)}
+        columns[target_column] = self.features
+        columns["prediction"] = self.features + 1 + target
+        return {
+            "statistics.json": statistics_json(self.columns, columns),
+            "constraints.json": constraints_json(self.columns, columns),
+        }
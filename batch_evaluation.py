@@ -0,0 +1,473 @@
+"""
+Evaluate endpoints with many test datasets from the command line, such as re-evaluating
+a model with every historical test file, without replaying SQS messages one at a time.
+
+Each dataset is evaluated by a worker process, so reading, parsing and calculating the
+metrics of several datasets happen on separate cores. The endpoint invocations of every
+worker share one pool of `--max-invocations` slots, so the endpoint is never sent more
+mini-batches at the same time, however many datasets are evaluated at once. The report
+of each dataset, and a summary of every evaluation, are saved to `--output`.
+
+    python batch_evaluation.py --manifest evaluations.jsonl --processes 4 --max-invocations 16
+    python batch_evaluation.py --directory test-data --endpoint my-endpoint --stub
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
+
+from baseline import BaselineStatistics
+from clients import get_client
+from dataset import (
+    TARGET_COLUMN,
+    TEST_DATA_FORMATS,
+    detect_test_data_format,
+    open_test_data,
+    prefetch,
+    read_test_data_chunks,
+)
+from deduplication import row_hashes, row_words
+from endpoint import Predictor
+from exceptions import EndpointNotReadyError
+from metrics import ConfusionMatrixMetrics
+from model_evaluation import (
+    BASELINE_STATISTICS_ENABLED,
+    BOOTSTRAP_SEED,
+    ENDPOINT_CONTENT_TYPE,
+    TEST_DATA_CHUNK_ROWS,
+    create_predictor,
+    create_report,
+    predict_test_data,
+    wait_endpoint_status_in_service,
+)
+from models import EvaluationTarget
+from report import INTERVAL_METRIC_NAMES, save_report
+from serializers import get_serializer
+
+# Format of the log lines, including the worker process evaluating each dataset
+LOG_FORMAT = "%(asctime)s %(processName)s %(levelname)s %(message)s"
+
+# Configure logging
+logger = logging.getLogger("model-evaluation")
+
+# Endpoint invocations shared by every worker process, set as each worker starts
+invocation_slots: Optional[Any] = None
+
+
+class EvaluationRun(NamedTuple):
+    """An endpoint, or production variant, evaluated with a single test dataset."""
+
+    endpoint_name: str
+    test_data: str
+    target_variant: Optional[str] = None
+    test_data_format: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return EvaluationTarget(
+            endpointName=self.endpoint_name, targetVariant=self.target_variant
+        ).label
+
+
+class RunResult(NamedTuple):
+    """Outcome of a single evaluation, returned by the worker process to the runner."""
+
+    run: EvaluationRun
+    directory: str
+    rows: int
+    seconds: float
+    metrics: Optional[ConfusionMatrixMetrics] = None
+    roc_auc: float = math.nan
+    pr_auc: float = math.nan
+    error: Optional[str] = None
+
+
+class StubPredictor:
+    """
+    Offline stand-in for an endpoint, scoring every row from a hash of its features, so
+    the same row always has the same score whichever dataset or mini-batch it is in.
+    Mini-batches are still serialized, so only the invocation itself is left out.
+    """
+
+    def __init__(self, serializer: Any):
+        """
+        :param serializer: Serializer used to create the payload of a mini-batch
+        """
+        self.serializer = serializer
+
+    def predict(self, data: np.ndarray) -> bytes:
+        """
+        :param data: The mini-batch used for invoking.
+        :return: comma separated score of each row
+        """
+        self.serializer.serialize(data)
+        hashes = row_hashes(row_words(np.asarray(data, dtype=np.float64)))
+        # The top 53 bits of the hash, as a float64 holds them exactly.
+        scores = (hashes >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+        return ",".join("{:.6f}".format(score) for score in scores).encode("utf-8")
+
+
+class SharedSlotPredictor:
+    """
+    Predictor holding a slot of the invocation pool shared by every worker process
+    while each mini-batch is predicted.
+    """
+
+    def __init__(self, predictor: Predictor, slots: Any):
+        """
+        :param predictor: Predictor invoking the endpoint
+        :param slots: Semaphore shared by every worker process
+        """
+        self.predictor = predictor
+        # Mini-batches are sized by the payload of the wrapped predictor.
+        self.serializer = getattr(predictor, "serializer", None)
+        self.slots = slots
+
+    def predict(self, data: np.ndarray) -> bytes:
+        """
+        :param data: The mini-batch used for invoking.
+        :return: raw response body returned by the endpoint, once a slot is free
+        """
+        with self.slots:
+            return self.predictor.predict(data)
+
+
+def read_manifest(path: str) -> list[EvaluationRun]:
+    """
+    Read the evaluations listed in a JSON lines manifest, one evaluation per line with
+    the same field names as the SQS message, e.g.
+    `{"endpointName": "my-endpoint", "testData": "s3://bucket/test.csv"}`. Test data
+    is either an S3 URI or a local path, `targetVariant` and `testDataFormat` are optional.
+
+    :param path: Path of the manifest
+    :return: every evaluation, in the order listed
+    """
+    runs = []
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "endpointName" not in entry or "testData" not in entry:
+                raise ValueError(
+                    "Line {number} of {path} needs both endpointName and testData".format(
+                        number=number, path=path
+                    )
+                )
+            runs.append(
+                EvaluationRun(
+                    endpoint_name=entry["endpointName"],
+                    test_data=entry["testData"],
+                    target_variant=entry.get("targetVariant"),
+                    test_data_format=entry.get("testDataFormat"),
+                )
+            )
+    return runs
+
+
+def find_test_data(
+    directory: str, endpoint_name: str, target_variant: Optional[str] = None
+) -> list[EvaluationRun]:
+    """
+    :param directory: Local directory of test data files
+    :param endpoint_name: Endpoint evaluated with every file
+    :param target_variant: Production variant evaluated, SageMaker decides if not set
+    :return: an evaluation for every CSV, Parquet or Arrow file in the directory, by file name
+    """
+    return [
+        EvaluationRun(
+            endpoint_name=endpoint_name,
+            test_data=os.path.join(directory, name),
+            target_variant=target_variant,
+        )
+        for name in sorted(os.listdir(directory))
+        if os.path.splitext(name)[1].lower() in TEST_DATA_FORMATS
+        and os.path.isfile(os.path.join(directory, name))
+    ]
+
+
+def report_directories(runs: list[EvaluationRun], output: str) -> list[str]:
+    """
+    :param runs: every evaluation
+    :param output: Directory the reports are saved under
+    :return: directory of the report of each evaluation, `<output>/<endpoint>/<dataset>`,
+        numbered when the same endpoint is evaluated with datasets of the same name
+    """
+    directories = []
+    for index, run in enumerate(runs):
+        name = os.path.splitext(os.path.basename(run.test_data.rstrip("/")))[0]
+        directory = os.path.join(output, run.label, name)
+        if directory in directories:
+            directory = "{directory}-{index}".format(directory=directory, index=index)
+        directories.append(directory)
+    return directories
+
+
+@contextlib.contextmanager
+def open_dataset(test_data: str, test_data_format: str):
+    """
+    :param test_data: `s3://<bucket>/<key>` URI or local path of the test data
+    :param test_data_format: `csv`, `parquet` or `arrow`
+    :return: body of the test data, closed on exit
+    """
+    if test_data.startswith("s3://"):
+        bucket_name, _, key = test_data.removeprefix("s3://").partition("/")
+        body = open_test_data(
+            bucket_name=bucket_name,
+            key=key,
+            client=get_client("s3"),
+            test_data_format=test_data_format,
+        )["Body"]
+    else:
+        body = open(test_data, "rb")
+    with contextlib.closing(body):
+        yield body
+
+
+def create_run_predictor(run: EvaluationRun, stub: bool = False) -> Predictor:
+    """
+    :param run: Evaluation the predictor is for
+    :param stub: Score rows offline with `StubPredictor`, instead of invoking the endpoint
+    :return: predictor for the evaluation, holding a shared invocation slot per mini-batch
+        when run by a worker process
+    """
+    if stub:
+        predictor = StubPredictor(
+            serializer=get_serializer(content_type=ENDPOINT_CONTENT_TYPE)
+        )
+    else:
+        status = wait_endpoint_status_in_service(endpoint_name=run.endpoint_name)
+        if status != "InService":
+            raise EndpointNotReadyError(
+                "Endpoint: {endpoint_name} is {status}".format(
+                    endpoint_name=run.endpoint_name, status=status
+                )
+            )
+        predictor = create_predictor(
+            endpoint_name=run.endpoint_name, target_variant=run.target_variant
+        )
+    if invocation_slots is None:
+        return predictor
+    return SharedSlotPredictor(predictor=predictor, slots=invocation_slots)
+
+
+def evaluate_run(run: EvaluationRun, directory: str, stub: bool = False) -> RunResult:
+    """
+    Evaluate the endpoint with the test data and save its report, along with the Model
+    Monitor baseline statistics and constraints when enabled. A failed evaluation is
+    logged and returned, so the other evaluations carry on.
+
+    :param run: Endpoint and test data to evaluate
+    :param directory: Directory the report is saved to
+    :param stub: Score rows offline with `StubPredictor`, instead of invoking the endpoint
+    :return: outcome of the evaluation
+    """
+    started = time.monotonic()
+    logger.info("Evaluating %s with %s", run.label, run.test_data)
+    try:
+        predictor = create_run_predictor(run=run, stub=stub)
+        test_data_format = detect_test_data_format(
+            key=run.test_data, declared=run.test_data_format
+        )
+        feature_names: list[str] = []
+        baseline = (
+            BaselineStatistics(seed=BOOTSTRAP_SEED)
+            if BASELINE_STATISTICS_ENABLED
+            else None
+        )
+        with open_dataset(run.test_data, test_data_format) as body:
+            accumulator = predict_test_data(
+                chunks=prefetch(
+                    read_test_data_chunks(
+                        body=body,
+                        chunk_rows=TEST_DATA_CHUNK_ROWS,
+                        test_data_format=test_data_format,
+                        feature_names=feature_names,
+                    )
+                ),
+                predictor=predictor,
+                baseline=baseline,
+            )
+        metrics, curves, _, _, report = create_report(
+            label=run.label, accumulator=accumulator
+        )
+        if baseline is not None:
+            report.update(
+                baseline.files(feature_names=feature_names, target_column=TARGET_COLUMN)
+            )
+        save_report(directory=directory, files=report)
+    except Exception as error:
+        logger.exception("Failed to evaluate %s with %s", run.label, run.test_data)
+        return RunResult(
+            run=run,
+            directory=directory,
+            rows=0,
+            seconds=time.monotonic() - started,
+            error="{}: {}".format(type(error).__name__, error),
+        )
+    return RunResult(
+        run=run,
+        directory=directory,
+        rows=accumulator.rows,
+        seconds=time.monotonic() - started,
+        metrics=metrics,
+        roc_auc=curves.roc_auc,
+        pr_auc=curves.pr_auc,
+    )
+
+
+def initialize_worker(slots: Any) -> None:
+    """
+    :param slots: Semaphore of the invocation pool shared by every worker process
+    """
+    global invocation_slots
+    invocation_slots = slots
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
+
+def evaluate_runs(
+    runs: list[EvaluationRun],
+    directories: list[str],
+    processes: int,
+    max_invocations: int,
+    stub: bool = False,
+) -> list[RunResult]:
+    """
+    Evaluate every run across a pool of worker processes, each worker takes the next
+    run once it is done with its current one.
+
+    :param runs: Endpoints and test data to evaluate
+    :param directories: Directory the report of each run is saved to
+    :param processes: Number of worker processes
+    :param max_invocations: Maximum number of mini-batches sent at the same time, across every worker
+    :param stub: Score rows offline with `StubPredictor`, instead of invoking the endpoints
+    :return: outcome of each run, in the same order
+    """
+    # Worker processes are started fresh, as forking copies the threads and clients of the runner.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=max(1, min(processes, len(runs))),
+        mp_context=context,
+        initializer=initialize_worker,
+        initargs=(context.BoundedSemaphore(max_invocations),),
+    ) as executor:
+        return list(executor.map(evaluate_run, runs, directories, [stub] * len(runs)))
+
+
+def summary_markdown(results: list[RunResult]) -> str:
+    """
+    Format the outcome of every evaluation as a grid table, with a row for each.
+
+    :param results: outcome of each evaluation
+    :return: markdown table
+    """
+    # Only imported when used, as pandas is slow to import.
+    import pandas as pd
+
+    return pd.DataFrame(
+        [
+            {
+                "endpoint": result.run.label,
+                "test data": result.run.test_data,
+                "rows": result.rows,
+                "seconds": round(result.seconds, 2),
+                **{
+                    INTERVAL_METRIC_NAMES[name]: getattr(result.metrics, name, math.nan)
+                    for name in ConfusionMatrixMetrics._fields
+                },
+                INTERVAL_METRIC_NAMES["roc_auc"]: result.roc_auc,
+                INTERVAL_METRIC_NAMES["pr_auc"]: result.pr_auc,
+                "error": result.error or "",
+            }
+            for result in results
+        ]
+    ).to_markdown(tablefmt="grid", index=False)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    :param argv: Command line arguments, `sys.argv` if not set
+    :return: exit status, 1 when any evaluation failed
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        "--manifest",
+        help="JSON lines file with the endpointName and testData, an S3 URI or local path, of each evaluation",
+    )
+    source.add_argument(
+        "--directory",
+        help="Evaluate --endpoint with every CSV, Parquet or Arrow file in this directory",
+    )
+    parser.add_argument("--endpoint", help="Endpoint evaluated with --directory")
+    parser.add_argument("--target-variant", help="Production variant of --endpoint")
+    parser.add_argument(
+        "--output",
+        default="evaluation-reports",
+        help="Directory the reports are saved to",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes, each evaluating one dataset at a time",
+    )
+    parser.add_argument(
+        "--max-invocations",
+        type=int,
+        default=16,
+        help="Maximum mini-batches sent at the same time, across every worker process",
+    )
+    parser.add_argument(
+        "--stub",
+        action="store_true",
+        help="Score rows offline from a hash of their features, without invoking any endpoint",
+    )
+    args = parser.parse_args(argv)
+    if args.directory and not args.endpoint:
+        parser.error("--endpoint is required with --directory")
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
+    runs = (
+        read_manifest(args.manifest)
+        if args.manifest
+        else find_test_data(
+            directory=args.directory,
+            endpoint_name=args.endpoint,
+            target_variant=args.target_variant,
+        )
+    )
+    if not runs:
+        logger.warning("No test data found to evaluate")
+        return 1
+    results = evaluate_runs(
+        runs=runs,
+        directories=report_directories(runs=runs, output=args.output),
+        processes=args.processes,
+        max_invocations=args.max_invocations,
+        stub=args.stub,
+    )
+    save_report(directory=args.output, files={"SUMMARY.md": summary_markdown(results)})
+
+    failed = sum(result.error is not None for result in results)
+    logger.info(
+        "Evaluated %s of %s datasets, %s rows in total",
+        len(results) - failed,
+        len(results),
+        sum(result.rows for result in results),
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import logging
+import math
+import threading
+from typing import Any, Iterator, Optional
+
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger("model-evaluation")
+
+# Maximum size of a real-time endpoint invocation payload
+# https://docs.aws.amazon.com/sagemaker/latest/APIReference/API_runtime_InvokeEndpoint.html
+SAGEMAKER_MAX_PAYLOAD_BYTES = 6 * 1024 * 1024
+
+
+class BatchPlanner:
+    """
+    Decide how many rows are sent to the endpoint in each mini-batch. The batch size
+    is capped so the serialized payload stays under the payload ceiling, and when a
+    target latency is set, the batch size is adjusted from the observed latency of
+    each invocation to send as many rows per second as the endpoint allows.
+    """
+
+    def __init__(
+        self,
+        rows: int = 500,
+        max_payload_bytes: int = SAGEMAKER_MAX_PAYLOAD_BYTES,
+        target_latency: Optional[float] = None,
+        sample_rows: int = 100,
+        headroom: float = 0.9,
+    ):
+        """
+        :param rows: Initial number of rows sent in each mini-batch
+        :param max_payload_bytes: Payload ceiling of a single invocation
+        :param target_latency: Seconds an invocation should take, disables adjusting the batch size if not set
+        :param sample_rows: Number of rows serialized to estimate the size of a row
+        :param headroom: Fraction of the payload ceiling batches are planned against
+        """
+        self.rows = max(1, rows)
+        self.max_rows = self.rows if not target_latency else math.inf
+        self.max_payload_bytes = max_payload_bytes
+        self.target_latency = target_latency
+        self.sample_rows = sample_rows
+        self.headroom = headroom
+        self._lock = threading.Lock()
+
+    def fit_payload(self, data: np.ndarray, serializer: Any = None) -> int:
+        """
+        Estimate the serialized size of a row from a sample of rows spread across the
+        data, and cap the batch size so a mini-batch stays under the payload ceiling.
+
+        :param data: The test dataset used for invoking.
+        :param serializer: Serializer used by the predictor, the batch size is not capped if not set
+        :return: maximum number of rows in a mini-batch
+        """
+        if serializer is None or data.shape[0] == 0:
+            return self.rows
+        indices = np.unique(
+            np.linspace(0, data.shape[0] - 1, num=min(self.sample_rows, data.shape[0]))
+            .round()
+            .astype(int)
+        )
+        # Use the widest sampled row, so rows wider than the average are accounted for.
+        bytes_per_row = max(
+            payload_size(serializer.serialize(data[[i]])) for i in indices
+        )
+        payload_rows = max(
+            1, int(self.max_payload_bytes * self.headroom // (bytes_per_row + 1))
+        )
+        with self._lock:
+            if self.target_latency:
+                self.max_rows = payload_rows
+            else:
+                self.max_rows = min(self.max_rows, payload_rows)
+            self.rows = min(self.rows, self.max_rows)
+        logger.info(
+            "Estimated %s bytes per row, sending at most %s rows per mini-batch",
+            bytes_per_row,
+            self.max_rows,
+        )
+        return self.max_rows
+
+    def batches(self, total_rows: int) -> Iterator[tuple[int, int]]:
+        """
+        Plan the mini-batches for the data. Without a target latency the rows are split
+        evenly up front, otherwise each mini-batch uses the batch size at the time it is
+        requested, so adjustments apply to the remaining rows.
+
+        :param total_rows: Number of rows in the test dataset
+        :return: start (inclusive) and stop (exclusive) row offsets of each mini-batch
+        """
+        if not self.target_latency:
+            yield from split_into_batches(total_rows=total_rows, rows=self.rows)
+            return
+        start = 0
+        while start < total_rows:
+            stop = min(total_rows, start + self.rows)
+            yield start, stop
+            start = stop
+
+    def record(self, rows: int, seconds: float) -> None:
+        """
+        Adjust the batch size from the latency of a completed invocation, shrinking it in
+        proportion when over the target latency and growing it when well under.
+
+        :param rows: Number of rows sent in the mini-batch
+        :param seconds: Time taken for the endpoint to respond
+        """
+        if not self.target_latency:
+            return
+        with self._lock:
+            if seconds > self.target_latency:
+                self.rows = max(1, int(self.rows * self.target_latency / seconds))
+            elif seconds < self.target_latency / 2 and rows >= self.rows:
+                self.rows = int(min(self.max_rows, self.rows * 1.5 + 1))
+
+
+def split_into_batches(total_rows: int, rows: int) -> list[tuple[int, int]]:
+    """
+    Split the row range of the test dataset into mini-batches of roughly `rows` each,
+    matching the batch sizes produced by `np.array_split`.
+
+    :param total_rows: Number of rows in the test dataset
+    :param rows: How to split the data
+    :return: start (inclusive) and stop (exclusive) row offsets of each mini-batch
+    """
+    sections = int(total_rows / float(rows) + 1)
+    sizes = np.full(sections, total_rows // sections)
+    sizes[: total_rows % sections] += 1
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).tolist()
+    return [
+        (start, stop) for start, stop in zip(offsets[:-1], offsets[1:]) if stop > start
+    ]
+
+
+def payload_size(payload: Any) -> int:
+    """
+    Number of bytes sent for a serialized payload.
+
+    :param payload: serialized mini-batch
+    :return: size in bytes
+    """
+    if isinstance(payload, str):
+        return len(payload.encode("utf-8"))
+    return len(payload)
@@ -0,0 +1,76 @@
+"""
+Measure the time taken to calculate the bootstrap confidence intervals of the
+evaluation metrics, compared with resampling every row with a Python loop.
+
+    python benchmarks/bootstrap_intervals.py --rows 100000 --resamples 1000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Root of the repository, where the lambda modules are found
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bootstrap import bootstrap_intervals  # noqa: E402
+from metrics import MetricsAccumulator  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--resamples", type=int, default=1000)
+    parser.add_argument("--positive-rate", type=float, default=0.12)
+    parser.add_argument(
+        "--loop-resamples",
+        type=int,
+        default=50,
+        help="resamples timed with a Python loop over row resamples, 0 to skip",
+    )
+    args = parser.parse_args()
+
+    generator = np.random.default_rng(0)
+    actuals = (generator.random(args.rows) < args.positive_rate).astype(int)
+    scores = np.clip(generator.normal(0.3 + 0.35 * actuals, 0.2), 0, 1)
+    accumulator = MetricsAccumulator()
+    accumulator.update(actuals=actuals, scores=scores)
+
+    started = time.perf_counter()
+    intervals = bootstrap_intervals(
+        accumulator.score_histogram, resamples=args.resamples, seed=0
+    )
+    seconds = time.perf_counter() - started
+    print(
+        "{:,} resamples of {:,} rows: {:.3f} seconds".format(
+            args.resamples, args.rows, seconds
+        )
+    )
+    for name, interval in intervals._asdict().items():
+        print(
+            "  {:<12} {:.4f} [{:.4f}, {:.4f}]".format(
+                name, interval.estimate, interval.lower, interval.upper
+            )
+        )
+
+    if args.loop_resamples:
+        started = time.perf_counter()
+        for _ in range(args.loop_resamples):
+            index = generator.integers(0, args.rows, args.rows)
+            resampled = MetricsAccumulator()
+            resampled.update(actuals=actuals[index], scores=scores[index])
+            resampled.metrics()
+            resampled.curves()
+        loop_seconds = (time.perf_counter() - started) / args.loop_resamples
+        print(
+            "Python loop over row resamples: {:.3f} seconds for {:,} resamples (estimated)".format(
+                loop_seconds * args.resamples, args.resamples
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
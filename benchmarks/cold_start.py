@@ -0,0 +1,100 @@
+"""
+Measure how long importing the lambda handler module takes in a fresh interpreter,
+as paid by every cold start. Each run imports the module in a new process with
+`-X importtime`, and the slowest imports made directly by the module are reported,
+so a regression can be traced back to the import that caused it.
+
+    python benchmarks/cold_start.py --runs 10 --max-seconds 1.5
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+# Root of the repository, where the lambda handler module is found
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Line written by `-X importtime`, e.g. `import time:       313 |        313 | numpy`
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_module_once(module: str) -> tuple[float, dict[str, float]]:
+    """
+    Import the module in a fresh interpreter.
+
+    :param module: Name of the module to import
+    :return: total import time in seconds, and cumulative seconds of each direct import
+    """
+    environment = dict(os.environ, AWS_REGION="eu-west-2", PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+        cwd=REPOSITORY_ROOT,
+        env=environment,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total, imports = 0.0, {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        seconds = int(match.group(2)) / 1_000_000
+        # Nested imports are indented by two spaces for every level.
+        depth = (len(match.group(3)) - 1) // 2
+        if depth == 0 and match.group(4) == module:
+            total = seconds
+        elif depth == 1:
+            imports[match.group(4)] = seconds
+    return total, imports
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="model_evaluation")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        help="exit with an error when the median import time is slower than this",
+    )
+    args = parser.parse_args()
+
+    totals, imports = [], defaultdict(list)
+    # The first import warms the file system cache and is not counted.
+    import_module_once(args.module)
+    for _ in range(args.runs):
+        total, direct_imports = import_module_once(args.module)
+        totals.append(total)
+        for name, seconds in direct_imports.items():
+            imports[name].append(seconds)
+
+    median = statistics.median(totals)
+    print(
+        "import {module}: median {median:.3f}s, min {min:.3f}s, max {max:.3f}s over {runs} runs".format(
+            module=args.module,
+            median=median,
+            min=min(totals),
+            max=max(totals),
+            runs=args.runs,
+        )
+    )
+    slowest = sorted(
+        imports.items(), key=lambda item: statistics.median(item[1]), reverse=True
+    )
+    for name, seconds in slowest[: args.top]:
+        print("  {:>8.3f}s  {}".format(statistics.median(seconds), name))
+
+    if args.max_seconds is not None and median > args.max_seconds:
+        print("Import time regression, expected at most {}s".format(args.max_seconds))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
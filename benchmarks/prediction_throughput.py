@@ -0,0 +1,275 @@
+"""
+Measure the throughput of the prediction pipeline against a local stand-in endpoint,
+across batch sizes, concurrency levels and serializers. Every configuration runs in a
+fresh process, so the peak RSS reported belongs to that configuration alone.
+
+The `predictions` scenario times `perform_predictions` with test data already in
+memory. The `end-to-end` scenario times `lambda_handler` for an SQS event, with S3,
+SSM and SageMaker answered in-process, so streaming and parsing the test data,
+computing the metrics and uploading the report are included.
+
+    python benchmarks/prediction_throughput.py --rows 20000 --batch-sizes 100,500,2000 --workers 1,4,8
+    python benchmarks/prediction_throughput.py --scenario end-to-end --http --error-rate 0.05
+"""
+
+import argparse
+import functools
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, NamedTuple
+
+import numpy as np
+
+# Root of the repository, where the lambda handler module is found
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_ROOT)
+
+from stub_endpoint import (  # noqa: E402
+    StubEndpoint,
+    StubEndpointServer,
+    generate_test_data,
+    stub_clients,
+)
+
+
+class Configuration(NamedTuple):
+    scenario: str
+    rows: int
+    batch_rows: int
+    workers: int
+    content_type: str
+    http: bool
+    latency: float
+    jitter: float
+    latency_per_row: float
+    error_rate: float
+
+
+class Result(NamedTuple):
+    seconds: float
+    batches: int
+    p50_latency: float
+    p99_latency: float
+    bytes_sent: int
+    throttled: int
+    peak_rss_bytes: int
+
+
+class TimedPredictor:
+    """Records the latency of every mini-batch sent by a predictor."""
+
+    def __init__(self, predictor: Any):
+        """
+        :param predictor: Predictor invoking the stand-in endpoint
+        """
+        self.predictor = predictor
+        self.serializer = getattr(predictor, "serializer", None)
+        self.latencies: list[float] = []
+        self._lock = threading.Lock()
+
+    def predict(self, data: np.ndarray) -> bytes:
+        started = time.perf_counter()
+        try:
+            return self.predictor.predict(data)
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - started)
+
+
+def runtime_client(endpoint: StubEndpoint, server: Any) -> Any:
+    """
+    :param endpoint: Stand-in endpoint answering in-process
+    :param server: Stand-in endpoint answering over HTTP, None to answer in-process
+    :return: client with the `invoke_endpoint` method of a boto3 `sagemaker-runtime` client
+    """
+    if server is None:
+        return stub_clients(endpoint=endpoint, test_data=b"")["sagemaker-runtime"]
+    import boto3
+
+    return boto3.client(
+        "sagemaker-runtime",
+        endpoint_url=server.url,
+        region_name="eu-west-2",
+        aws_access_key_id="benchmark",
+        aws_secret_access_key="benchmark",
+    )
+
+
+def run_configuration(configuration: Configuration) -> Result:
+    """
+    Run a single configuration, called within a fresh process.
+
+    :param configuration: What to measure
+    :return: measurements of the configuration
+    """
+    os.environ.setdefault("AWS_REGION", "eu-west-2")
+    os.environ["ENDPOINT_CONTENT_TYPE"] = configuration.content_type
+    os.environ.setdefault("EMF_METRICS_ENABLED", "false")
+    import model_evaluation
+    import parameter_store
+    from dataset import read_test_data_chunks
+    from endpoint import RuntimePredictor
+    from serializers import get_serializer
+
+    test_data = generate_test_data(rows=configuration.rows)
+    endpoint = StubEndpoint(
+        latency=configuration.latency,
+        jitter=configuration.jitter,
+        latency_per_row=configuration.latency_per_row,
+        error_rate=configuration.error_rate,
+    )
+    server = StubEndpointServer(endpoint=endpoint) if configuration.http else None
+    if server is not None:
+        server.__enter__()
+    try:
+        predictor = TimedPredictor(
+            RuntimePredictor(
+                endpoint_name="benchmark",
+                serializer=get_serializer(configuration.content_type),
+                client=runtime_client(endpoint=endpoint, server=server),
+            )
+        )
+        if configuration.scenario == "predictions":
+            features = np.concatenate(
+                [
+                    features
+                    for features, _ in read_test_data_chunks(
+                        body=io.BytesIO(test_data), chunk_rows=configuration.rows
+                    )
+                ]
+            )
+            started = time.perf_counter()
+            model_evaluation.perform_predictions(
+                data=features,
+                predictor=predictor,
+                rows=configuration.batch_rows,
+                max_workers=configuration.workers,
+            )
+            seconds = time.perf_counter() - started
+        else:
+            clients = stub_clients(endpoint=endpoint, test_data=test_data)
+            model_evaluation.get_client = clients.__getitem__
+            parameter_store.get_client = clients.__getitem__
+            model_evaluation.create_predictor = (
+                lambda endpoint_name, **kwargs: predictor
+            )
+            model_evaluation.predict_test_data = functools.partial(
+                model_evaluation.predict_test_data,
+                rows=configuration.batch_rows,
+                max_workers=configuration.workers,
+            )
+            event = {
+                "Records": [
+                    {
+                        "messageId": "benchmark",
+                        "eventSource": "aws:sqs",
+                        "body": json.dumps(
+                            {
+                                "endpointName": "benchmark",
+                                "testDataS3BucketName": "benchmark",
+                                "testDataS3Key": "test.csv",
+                            }
+                        ),
+                    }
+                ]
+            }
+            started = time.perf_counter()
+            response = model_evaluation.lambda_handler(event, None)
+            seconds = time.perf_counter() - started
+            if response["batchItemFailures"]:
+                raise RuntimeError("Evaluation failed, see the logs")
+    finally:
+        if server is not None:
+            server.__exit__(None, None, None)
+
+    latencies = np.asarray(predictor.latencies)
+    return Result(
+        seconds=seconds,
+        batches=latencies.shape[0],
+        p50_latency=float(np.percentile(latencies, 50)),
+        p99_latency=float(np.percentile(latencies, 99)),
+        bytes_sent=endpoint.bytes_received,
+        throttled=endpoint.throttled,
+        # Reported in kilobytes on Linux and bytes on macOS.
+        peak_rss_bytes=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        * (1 if sys.platform == "darwin" else 1024),
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenario", choices=["predictions", "end-to-end"], default="predictions"
+    )
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch-sizes", default="100,500,2000")
+    parser.add_argument("--workers", default="1,4,8")
+    parser.add_argument("--content-types", default="text/csv,application/x-npy")
+    parser.add_argument(
+        "--http",
+        action="store_true",
+        help="invoke the stand-in endpoint over HTTP with a boto3 client",
+    )
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--latency-per-row", type=float, default=0.00001)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    print(
+        "{:<31} {:>6} {:>7} {:>10} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+            "content type",
+            "rows",
+            "workers",
+            "rows/s",
+            "p50 ms",
+            "p99 ms",
+            "sent MB",
+            "throttled",
+            "peak MB",
+        )
+    )
+    for content_type in args.content_types.split(","):
+        for batch_rows in [int(value) for value in args.batch_sizes.split(",")]:
+            for workers in [int(value) for value in args.workers.split(",")]:
+                configuration = Configuration(
+                    scenario=args.scenario,
+                    rows=args.rows,
+                    batch_rows=batch_rows,
+                    workers=workers,
+                    content_type=content_type,
+                    http=args.http,
+                    latency=args.latency,
+                    jitter=args.jitter,
+                    latency_per_row=args.latency_per_row,
+                    error_rate=args.error_rate,
+                )
+                with ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context("spawn")
+                ) as executor:
+                    result = executor.submit(run_configuration, configuration).result()
+                print(
+                    "{:<31} {:>6} {:>7} {:>10.0f} {:>9.1f} {:>9.1f} {:>9.2f} {:>9} {:>9.0f}".format(
+                        content_type,
+                        batch_rows,
+                        workers,
+                        args.rows / result.seconds,
+                        result.p50_latency * 1000,
+                        result.p99_latency * 1000,
+                        result.bytes_sent / 1024 / 1024,
+                        result.throttled,
+                        result.peak_rss_bytes / 1024 / 1024,
+                    )
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
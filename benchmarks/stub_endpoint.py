@@ -0,0 +1,337 @@
+"""
+Local stand-ins for a SageMaker real-time endpoint and the AWS services used by the
+lambda, so the prediction pipeline can be benchmarked without an AWS account.
+
+- `StubRuntimeClient` has the `invoke_endpoint` method of a boto3 `sagemaker-runtime`
+  client and answers in-process.
+- `StubEndpointServer` is a local HTTP server answering the `InvokeEndpoint` API, so a
+  real boto3 client, including request signing and connection pooling, can be used.
+- `stub_clients` returns in-process clients for every service used by the lambda handler.
+- `generate_test_data` creates test data shaped like `tests/example_payload.csv`.
+"""
+
+import hashlib
+import io
+import json
+import random
+import re
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+# Categorical features one-hot encoded within the test data, in column order
+CATEGORIES = {
+    "job": [
+        "admin.",
+        "blue-collar",
+        "entrepreneur",
+        "housemaid",
+        "management",
+        "retired",
+        "self-employed",
+        "services",
+        "student",
+        "technician",
+        "unemployed",
+        "unknown",
+    ],
+    "marital": ["divorced", "married", "single", "unknown"],
+    "education": [
+        "basic.4y",
+        "basic.6y",
+        "basic.9y",
+        "high.school",
+        "illiterate",
+        "professional.course",
+        "university.degree",
+        "unknown",
+    ],
+    "default": ["no", "unknown", "yes"],
+    "housing": ["no", "unknown", "yes"],
+    "loan": ["no", "unknown", "yes"],
+    "contact": ["cellular", "telephone"],
+    "month": ["apr", "aug", "dec", "jul", "jun", "mar", "may", "nov", "oct", "sep"],
+    "day_of_week": ["fri", "mon", "thu", "tue", "wed"],
+    "poutcome": ["failure", "nonexistent", "success"],
+}
+
+# Jobs counted as not working
+NOT_WORKING_JOBS = ["retired", "student", "unemployed"]
+
+# Magic number at the start of every RecordIO record
+RECORDIO_MAGIC = 0xCED7230A
+
+# Path of the InvokeEndpoint API, e.g. `/endpoints/benchmark/invocations`
+INVOCATIONS_PATH = re.compile(r"^/endpoints/([^/]+)/invocations$")
+
+
+def generate_test_data(rows: int, positive_rate: float = 0.11, seed: int = 0) -> bytes:
+    """
+    Create test data with the same columns as `tests/example_payload.csv`: an unnamed
+    index, numeric features, one-hot encoded categorical features and the `y_no` and
+    `y_yes` target columns.
+
+    :param rows: Number of rows to create
+    :param positive_rate: Fraction of rows in the positive class
+    :param seed: Seed of the random number generator, the same seed creates the same data
+    :return: the test data as CSV
+    """
+    # Only imported when used, as pandas is slow to import.
+    import pandas as pd
+
+    generator = np.random.default_rng(seed)
+    pdays = np.where(
+        generator.random(rows) < 0.96, 999, generator.integers(0, 28, rows)
+    )
+    columns = {
+        "age": generator.integers(18, 96, rows),
+        "campaign": np.minimum(generator.geometric(0.4, rows), 40),
+        "pdays": pdays,
+        "previous": np.where(pdays == 999, 0, generator.integers(1, 8, rows)),
+        "no_previous_contact": (pdays == 999).astype(int),
+    }
+    choices = {
+        name: generator.integers(0, len(values), rows)
+        for name, values in CATEGORIES.items()
+    }
+    columns["not_working"] = np.isin(
+        choices["job"], [CATEGORIES["job"].index(job) for job in NOT_WORKING_JOBS]
+    ).astype(int)
+    for name, values in CATEGORIES.items():
+        for index, value in enumerate(values):
+            columns["{}_{}".format(name, value)] = (choices[name] == index).astype(
+                float
+            )
+    is_positive = generator.random(rows) < positive_rate
+    columns["y_no"] = (~is_positive).astype(float)
+    columns["y_yes"] = is_positive.astype(float)
+
+    frame = pd.DataFrame(columns, index=generator.permutation(rows * 4)[:rows])
+    return frame.to_csv().encode("utf-8")
+
+
+def count_rows(body: bytes, content_type: str) -> int:
+    """
+    Count the rows within an invocation payload.
+
+    :param body: Payload sent to the endpoint
+    :param content_type: MIME type of the payload
+    :return: number of rows
+    """
+    if content_type == "application/x-npy":
+        return int(np.load(io.BytesIO(body), allow_pickle=False).shape[0])
+    if content_type == "application/x-recordio-protobuf":
+        rows, offset = 0, 0
+        while offset < len(body):
+            magic, length = struct.unpack_from("<II", body, offset)
+            if magic != RECORDIO_MAGIC:
+                raise ValueError("Invalid RecordIO record at byte {}".format(offset))
+            # Records are padded to a multiple of 4 bytes.
+            offset += 8 + length + (-length % 4)
+            rows += 1
+        return rows
+    return body.count(b"\n") + 1 if body else 0
+
+
+class StubEndpoint:
+    """
+    Endpoint responding with a random score for every row sent, after a configurable
+    latency, and throttling a configurable fraction of invocations.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.02,
+        jitter: float = 0.01,
+        latency_per_row: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        """
+        :param latency: Seconds every invocation takes
+        :param jitter: Upper limit of random seconds added to every invocation
+        :param latency_per_row: Seconds added for every row sent
+        :param error_rate: Fraction of invocations throttled
+        :param seed: Seed of the random number generator
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.latency_per_row = latency_per_row
+        self.error_rate = error_rate
+        self.invocations = 0
+        self.throttled = 0
+        self.bytes_received = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke(self, body: bytes, content_type: str) -> Optional[bytes]:
+        """
+        :param body: Payload sent to the endpoint
+        :param content_type: MIME type of the payload
+        :return: comma separated scores, or None when the invocation is throttled
+        """
+        rows = count_rows(body, content_type)
+        with self._lock:
+            self.invocations += 1
+            self.bytes_received += len(body)
+            jitter = self._random.uniform(0, self.jitter)
+            throttled = self._random.random() < self.error_rate
+            scores = [self._random.random() for _ in range(rows)]
+            if throttled:
+                self.throttled += 1
+        time.sleep(self.latency + jitter + self.latency_per_row * rows)
+        if throttled:
+            return None
+        return ",".join("{:.6f}".format(score) for score in scores).encode("utf-8")
+
+
+class StubRuntimeClient:
+    """In-process stand-in for a boto3 `sagemaker-runtime` client."""
+
+    def __init__(self, endpoint: StubEndpoint):
+        """
+        :param endpoint: Endpoint answering every invocation
+        """
+        self.endpoint = endpoint
+
+    def invoke_endpoint(self, **request: Any) -> dict:
+        response = self.endpoint.invoke(request["Body"], request["ContentType"])
+        if response is None:
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+                "InvokeEndpoint",
+            )
+        return {
+            "Body": io.BytesIO(response),
+            "ContentType": "text/csv",
+            "InvokedProductionVariant": "AllTraffic",
+        }
+
+
+class StubEndpointServer:
+    """
+    Local HTTP server answering the SageMaker `InvokeEndpoint` API, pass `url` as the
+    `endpoint_url` of a boto3 `sagemaker-runtime` client. Use as a context manager.
+    """
+
+    def __init__(self, endpoint: StubEndpoint, port: int = 0):
+        """
+        :param endpoint: Endpoint answering every invocation
+        :param port: Port to listen on, a free port is used if 0
+        """
+        stub = endpoint
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not INVOCATIONS_PATH.match(self.path):
+                    self.respond(404, b"", {"x-amzn-ErrorType": "NotFound"})
+                    return
+                response = stub.invoke(body, self.headers.get("Content-Type", ""))
+                if response is None:
+                    error = {
+                        "__type": "ThrottlingException",
+                        "message": "Rate exceeded",
+                    }
+                    self.respond(
+                        400,
+                        json.dumps(error).encode("utf-8"),
+                        {"x-amzn-ErrorType": "ThrottlingException"},
+                    )
+                    return
+                self.respond(
+                    200, response, {"x-Amzn-Invoked-Production-Variant": "AllTraffic"}
+                )
+
+            def respond(self, status: int, body: bytes, headers: dict) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "text/csv")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return "http://{host}:{port}".format(host=host, port=port)
+
+    def __enter__(self) -> "StubEndpointServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubS3Client:
+    """In-process stand-in for a boto3 `s3` client holding a single test data object."""
+
+    def __init__(self, test_data: bytes):
+        """
+        :param test_data: Body returned for every object
+        """
+        self.test_data = test_data
+        self.uploaded: dict[str, bytes] = {}
+
+    def get_object(self, Bucket: str, Key: str) -> dict:
+        return {
+            "Body": io.BytesIO(self.test_data),
+            "ContentLength": len(self.test_data),
+            "ETag": '"{}"'.format(hashlib.md5(self.test_data).hexdigest()),
+        }
+
+    def put_object(self, Bucket: str, Key: str, Body: Any, **kwargs: Any) -> dict:
+        self.uploaded[Key] = Body if isinstance(Body, bytes) else Body.encode("utf-8")
+        return {}
+
+
+class StubSageMakerClient:
+    """In-process stand-in for a boto3 `sagemaker` client, every endpoint is InService."""
+
+    def describe_endpoint(self, EndpointName: str) -> dict:
+        return {
+            "EndpointName": EndpointName,
+            "EndpointConfigName": EndpointName,
+            "EndpointStatus": "InService",
+        }
+
+
+class StubSSMClient:
+    """In-process stand-in for a boto3 `ssm` client, every parameter is its own name."""
+
+    def get_parameter(self, Name: str, WithDecryption: bool = False) -> dict:
+        return {"Parameter": {"Name": Name, "Value": Name}}
+
+    def get_parameters(self, Names: list, WithDecryption: bool = False) -> dict:
+        return {"Parameters": [{"Name": name, "Value": name} for name in Names]}
+
+
+def stub_clients(endpoint: StubEndpoint, test_data: bytes) -> dict[str, Any]:
+    """
+    :param endpoint: Endpoint answering every invocation
+    :param test_data: Body returned for every S3 object
+    :return: in-process client for every service used by the lambda handler
+    """
+    return {
+        "s3": StubS3Client(test_data=test_data),
+        "sagemaker": StubSageMakerClient(),
+        "sagemaker-runtime": StubRuntimeClient(endpoint=endpoint),
+        "ssm": StubSSMClient(),
+    }
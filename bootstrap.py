@@ -0,0 +1,171 @@
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+# Resamples evaluated at the same time, bounding the memory used by the resample weights
+BOOTSTRAP_BLOCK_RESAMPLES = 250
+
+
+class ConfidenceInterval(NamedTuple):
+    """Value of a metric for the test data, and the bootstrap percentile interval around it."""
+
+    estimate: float
+    lower: float
+    upper: float
+
+
+class MetricIntervals(NamedTuple):
+    """Bootstrap confidence interval of each evaluation metric."""
+
+    accuracy: ConfidenceInterval
+    precision: ConfidenceInterval
+    recall: ConfidenceInterval
+    f1_score: ConfidenceInterval
+    specificity: ConfidenceInterval
+    roc_auc: ConfidenceInterval
+    pr_auc: ConfidenceInterval
+
+
+def resample_weights(
+    counts: np.ndarray, resamples: int, generator: np.random.Generator
+) -> np.ndarray:
+    """
+    Draw the number of times every row is picked by each bootstrap resample, for rows
+    grouped by their counts. Rows within a group are interchangeable, so drawing the
+    groups from a multinomial distribution is the same as resampling every row.
+
+    :param counts: Number of rows in each group
+    :param resamples: Number of resamples drawn
+    :param generator: Random number generator
+    :return: `(resamples, groups)` rows picked from each group by each resample
+    """
+    rows = int(counts.sum())
+    return generator.multinomial(rows, counts / max(rows, 1), size=resamples)
+
+
+def binned_metrics(
+    score_histogram: np.ndarray, threshold_bin: int
+) -> dict[str, np.ndarray]:
+    """
+    Calculate every metric for a batch of score histograms at once.
+
+    :param score_histogram: `(histograms, 2, bins)` scores of other classes, then of the positive class
+    :param threshold_bin: First bin predicted as the positive class
+    :return: each metric, with a value for every histogram
+    """
+    negatives = score_histogram[:, 0, :].astype(np.float64)
+    positives = score_histogram[:, 1, :].astype(np.float64)
+    true_positive = positives[:, threshold_bin:].sum(axis=1)
+    false_negative = positives[:, :threshold_bin].sum(axis=1)
+    false_positive = negatives[:, threshold_bin:].sum(axis=1)
+    true_negative = negatives[:, :threshold_bin].sum(axis=1)
+
+    precision = divide(true_positive, true_positive + false_positive)
+    recall = divide(true_positive, true_positive + false_negative)
+
+    # Highest bin first, so the cumulative sums count the rows at or above each bin.
+    cumulative_positives = np.cumsum(positives[:, ::-1], axis=1)
+    cumulative_negatives = np.cumsum(negatives[:, ::-1], axis=1)
+    total_positives = cumulative_positives[:, -1:]
+    total_negatives = cumulative_negatives[:, -1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        true_positive_rate = np.pad(
+            cumulative_positives / total_positives, ((0, 0), (1, 0))
+        )
+        false_positive_rate = np.pad(
+            cumulative_negatives / total_negatives, ((0, 0), (1, 0))
+        )
+        curve_precision = np.nan_to_num(
+            cumulative_positives / (cumulative_positives + cumulative_negatives)
+        )
+    # Empty bins add nothing to either curve, the same as sweeping only occupied bins.
+    roc_auc = np.sum(
+        np.diff(false_positive_rate, axis=1)
+        * (true_positive_rate[:, 1:] + true_positive_rate[:, :-1])
+        / 2,
+        axis=1,
+    )
+    pr_auc = np.sum(np.diff(true_positive_rate, axis=1) * curve_precision, axis=1)
+
+    return {
+        "accuracy": divide(
+            true_positive + true_negative,
+            true_positive + false_positive + true_negative + false_negative,
+        ),
+        "precision": precision,
+        "recall": recall,
+        "f1_score": divide(2 * precision * recall, precision + recall),
+        "specificity": divide(true_negative, false_positive + true_negative),
+        # Without both classes the AUC is undefined, and left out of the interval.
+        "roc_auc": np.where(
+            (total_positives[:, 0] > 0) & (total_negatives[:, 0] > 0), roc_auc, np.nan
+        ),
+        "pr_auc": np.where(total_positives[:, 0] > 0, pr_auc, np.nan),
+    }
+
+
+def bootstrap_intervals(
+    score_histogram: np.ndarray,
+    threshold: float = 0.5,
+    resamples: int = 1000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+) -> MetricIntervals:
+    """
+    Estimate how much each metric would vary with a different sample of test data, by
+    resampling the rows with replacement. Only the score histogram is needed, as every
+    metric is calculated from it, so the resamples are drawn as a weight matrix over the
+    histogram bins and every metric of every resample is calculated with array
+    operations, in blocks of `BOOTSTRAP_BLOCK_RESAMPLES` resamples.
+
+    :param score_histogram: `(2, bins)` scores of other classes, then of the positive class,
+        see `MetricsAccumulator.score_histogram`
+    :param threshold: score at which a row is predicted as the positive class
+    :param resamples: Number of bootstrap resamples
+    :param confidence: Fraction of resampled values within each interval
+    :param seed: Seed of the random number generator, the same seed gives the same intervals
+    :return: confidence interval of each metric
+    """
+    if resamples < 1:
+        raise ValueError("At least one resample is needed, got {}".format(resamples))
+    bins = score_histogram.shape[1]
+    threshold_bin = min(bins, int(np.ceil(threshold * bins)))
+    generator = np.random.default_rng(seed)
+
+    estimates = binned_metrics(score_histogram[np.newaxis], threshold_bin)
+    values: dict[str, list[np.ndarray]] = {name: [] for name in estimates}
+    for block in range(0, resamples, BOOTSTRAP_BLOCK_RESAMPLES):
+        weights = resample_weights(
+            counts=score_histogram.reshape(-1),
+            resamples=min(BOOTSTRAP_BLOCK_RESAMPLES, resamples - block),
+            generator=generator,
+        )
+        for name, value in binned_metrics(
+            weights.reshape(-1, *score_histogram.shape), threshold_bin
+        ).items():
+            values[name].append(value)
+
+    tail = (1 - confidence) / 2
+    intervals = {}
+    for name, estimate in estimates.items():
+        resampled = np.concatenate(values[name])
+        if np.isnan(resampled).all():
+            lower, upper = np.nan, np.nan
+        else:
+            lower, upper = np.nanquantile(resampled, [tail, 1 - tail])
+        intervals[name] = ConfidenceInterval(
+            estimate=float(estimate[0]), lower=float(lower), upper=float(upper)
+        )
+    return MetricIntervals(**intervals)
+
+
+def divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """
+    :return: numerator divided by denominator, or 0 where the denominator is 0
+    """
+    return np.divide(
+        numerator,
+        denominator,
+        out=np.zeros_like(numerator, dtype=np.float64),
+        where=denominator != 0,
+    )
@@ -0,0 +1,232 @@
+import io
+import logging
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from baseline import BaselineStatistics
+from instrumentation import NULL_TELEMETRY, Telemetry
+from metrics import MetricsAccumulator
+from prediction_cache import CacheBackend
+
+# Configure logging
+logger = logging.getLogger("model-evaluation")
+
+# Prefix of the names of the baseline statistics arrays within a checkpoint
+BASELINE_PREFIX = "baseline_"
+
+
+class EvaluationProgress:
+    """
+    Rows of the test data that have been evaluated, and the metrics and baseline statistics
+    of those rows. All are updated together, so a snapshot of the progress always has
+    metrics and statistics for exactly the rows marked as completed, even though
+    mini-batches complete out of order.
+    """
+
+    def __init__(
+        self,
+        accumulator: MetricsAccumulator,
+        completed: Optional[list[tuple[int, int]]] = None,
+        baseline: Optional[BaselineStatistics] = None,
+    ):
+        """
+        :param accumulator: Metrics of the completed rows
+        :param completed: start (inclusive) and stop (exclusive) row offsets of completed rows
+        :param baseline: Statistics of the features, target variable and predictions of the
+            completed rows, not calculated if not set
+        """
+        self.accumulator = accumulator
+        self.baseline = baseline
+        self.completed: list[tuple[int, int]] = []
+        for start, stop in completed or []:
+            self._add(start, stop)
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        start: int,
+        stop: int,
+        actuals: np.ndarray,
+        scores: np.ndarray,
+        features: Optional[np.ndarray] = None,
+        telemetry: Telemetry = NULL_TELEMETRY,
+    ) -> None:
+        """
+        Add the predictions of a mini-batch, safe to call from several threads.
+
+        :param start: first row offset of the mini-batch within the test data
+        :param stop: row offset after the last row of the mini-batch
+        :param actuals: actual class of each row
+        :param scores: predictions returned by the endpoint
+        :param features: features of each row, needed for the baseline statistics
+        :param telemetry: Records the time taken updating metrics and statistics
+        """
+        with self._lock:
+            with telemetry.span("MetricsTime"):
+                self.accumulator.update(actuals=actuals, scores=scores)
+            if self.baseline is not None:
+                with telemetry.span("StatisticsTime"):
+                    self.baseline.update(
+                        features=features, actuals=actuals, predictions=scores
+                    )
+            self._add(start, stop)
+
+    def pending(self, offset: int, rows: int) -> list[tuple[int, int]]:
+        """
+        :param offset: row offset of the chunk within the test data
+        :param rows: number of rows in the chunk
+        :return: row offsets within the chunk that have not been evaluated
+        """
+        pending, position = [], offset
+        with self._lock:
+            for start, stop in self.completed:
+                if stop <= position or start >= offset + rows:
+                    continue
+                if start > position:
+                    pending.append((position - offset, start - offset))
+                position = max(position, stop)
+        if position < offset + rows:
+            pending.append((position - offset, rows))
+        return pending
+
+    def to_bytes(self) -> bytes:
+        """
+        :return: the progress in the NPZ format
+        """
+        buffer = io.BytesIO()
+        with self._lock:
+            baseline = self.baseline.to_arrays() if self.baseline is not None else {}
+            np.savez(
+                buffer,
+                completed=np.asarray(self.completed, dtype=np.int64).reshape(-1, 2),
+                confusion_matrix=self.accumulator.confusion_matrix,
+                score_histogram=self.accumulator.score_histogram,
+                calibration=self.accumulator.calibration,
+                **{BASELINE_PREFIX + name: array for name, array in baseline.items()},
+            )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(
+        cls,
+        value: bytes,
+        accumulator: MetricsAccumulator,
+        baseline: Optional[BaselineStatistics] = None,
+    ) -> "EvaluationProgress":
+        """
+        :param value: progress saved by `to_bytes`
+        :param accumulator: Empty metrics configured the same as when the progress was saved
+        :param baseline: Empty statistics the saved statistics are restored to, if calculated
+        :return: the saved progress
+        """
+        names = ["confusion_matrix", "score_histogram", "calibration"]
+        with np.load(io.BytesIO(value), allow_pickle=False) as saved:
+            arrays = {name: saved[name] for name in names + ["completed"]}
+            baseline_arrays = {
+                name.removeprefix(BASELINE_PREFIX): saved[name]
+                for name in saved.files
+                if name.startswith(BASELINE_PREFIX)
+            }
+        if baseline is not None and arrays["completed"].size and not baseline_arrays:
+            raise ValueError("Saved progress has no baseline statistics")
+        for name in names:
+            expected = getattr(accumulator, name).shape
+            if arrays[name].shape != expected:
+                raise ValueError(
+                    "Saved {name} has shape {saved}, expected {expected}".format(
+                        name=name, saved=arrays[name].shape, expected=expected
+                    )
+                )
+        for name in names:
+            getattr(accumulator, name)[...] += arrays[name]
+        if baseline is not None and baseline_arrays:
+            baseline.restore(baseline_arrays)
+        completed = [(start, stop) for start, stop in arrays["completed"].tolist()]
+        return cls(accumulator=accumulator, completed=completed, baseline=baseline)
+
+    def _add(self, start: int, stop: int) -> None:
+        # Keep the ranges sorted and merged, as mini-batches are mostly contiguous.
+        ranges = sorted(self.completed + [(start, stop)])
+        merged = [ranges[0]]
+        for range_start, range_stop in ranges[1:]:
+            if range_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], range_stop))
+            else:
+                merged.append((range_start, range_stop))
+        self.completed = merged
+
+
+class EvaluationCheckpoint:
+    """
+    Saves the progress of an evaluation, so a redelivered message resumes from where
+    the previous attempt stopped instead of the first row of the test data.
+    """
+
+    def __init__(self, backend: CacheBackend, key: str, interval: float = 30.0):
+        """
+        :param backend: Storage for the checkpoint
+        :param key: Identifies the endpoint configuration and test data being evaluated
+        :param interval: Minimum seconds between saves, 0 saves after every mini-batch
+        """
+        self.backend = backend
+        self.key = key
+        self.interval = interval
+        self.saves = 0
+        self._last_saved = time.monotonic()
+        self._lock = threading.Lock()
+
+    def load(
+        self,
+        accumulator: MetricsAccumulator,
+        baseline: Optional[BaselineStatistics] = None,
+    ) -> EvaluationProgress:
+        """
+        :param accumulator: Empty metrics the saved progress is added to
+        :param baseline: Empty statistics the saved statistics are restored to, if calculated
+        :return: the saved progress, or no progress when nothing usable was saved
+        """
+        value = self.backend.get(self.key)
+        if value is not None:
+            try:
+                progress = EvaluationProgress.from_bytes(value, accumulator, baseline)
+                logger.info(
+                    "Resuming evaluation from checkpoint with %s rows already evaluated",
+                    progress.accumulator.rows,
+                )
+                return progress
+            except ValueError:
+                logger.warning("Ignoring checkpoint %s", self.key, exc_info=True)
+        return EvaluationProgress(accumulator=accumulator, baseline=baseline)
+
+    def save(self, progress: EvaluationProgress, force: bool = False) -> bool:
+        """
+        Save the progress, unless it was saved less than `interval` seconds ago or
+        is being saved by another mini-batch.
+
+        :param progress: Progress of the evaluation
+        :param force: Save regardless of when the progress was last saved
+        :return: True if the progress was saved
+        """
+        if not self._lock.acquire(blocking=force):
+            return False
+        try:
+            if not force and time.monotonic() - self._last_saved < self.interval:
+                return False
+            self.backend.put(self.key, progress.to_bytes())
+            self._last_saved = time.monotonic()
+            self.saves += 1
+        finally:
+            self._lock.release()
+        return True
+
+    def clear(self) -> None:
+        """
+        Delete the saved progress once the evaluation is complete, so the next evaluation
+        of the same endpoint configuration and test data, such as a duplicate delivery of
+        the message, evaluates every row again instead of resuming from a stale checkpoint.
+        """
+        with self._lock:
+            self.backend.delete(self.key)
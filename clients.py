@@ -0,0 +1,110 @@
+import os
+import threading
+from typing import Any
+
+# The AWS region
+aws_region = os.environ.get("AWS_REGION", "eu-west-2")
+
+# Connections each client keeps open, at least the number of requests made at the same time,
+# i.e. PREDICTION_MAX_WORKERS for every message evaluated at the same time and every target
+BOTO_MAX_POOL_CONNECTIONS = int(os.environ.get("BOTO_MAX_POOL_CONNECTIONS", 50))
+
+# Send TCP keep-alive probes, so pooled connections are not dropped between warm invocations
+BOTO_TCP_KEEPALIVE = os.environ.get("BOTO_TCP_KEEPALIVE", "true").lower() == "true"
+
+# Seconds to wait for a connection to be opened
+BOTO_CONNECT_TIMEOUT = float(os.environ.get("BOTO_CONNECT_TIMEOUT", 5))
+
+# Seconds to wait for a response, an endpoint has up to 60 seconds to respond to an invocation
+BOTO_READ_TIMEOUT = float(os.environ.get("BOTO_READ_TIMEOUT", 70))
+
+# Retry mode of every client: `legacy`, `standard` or `adaptive`
+BOTO_RETRY_MODE = os.environ.get("BOTO_RETRY_MODE", "standard")
+
+# Attempts made by a client for each request, including the first
+BOTO_MAX_ATTEMPTS = int(os.environ.get("BOTO_MAX_ATTEMPTS", 3))
+
+# Attempts made by the clients of services retried by the evaluation itself, endpoint invocations
+# are only retried by `call_with_retry`, so every throttled attempt is counted and backed off once
+SERVICE_MAX_ATTEMPTS = {"sagemaker-runtime": 1}
+
+# Session, SageMaker SDK session and clients created so far, reused across warm invocations
+registry: dict[str, Any] = {}
+
+# Held while creating a session or client, so concurrent messages never create the same one twice
+registry_lock = threading.RLock()
+
+
+def client_config(service_name: str) -> Any:
+    """
+    :param service_name: Name of the AWS service e.g. s3
+    :return: botocore configuration of the service's client
+    """
+    from botocore.config import Config
+
+    return Config(
+        region_name=aws_region,
+        max_pool_connections=BOTO_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=BOTO_TCP_KEEPALIVE,
+        connect_timeout=BOTO_CONNECT_TIMEOUT,
+        read_timeout=BOTO_READ_TIMEOUT,
+        retries={
+            "mode": BOTO_RETRY_MODE,
+            "total_max_attempts": SERVICE_MAX_ATTEMPTS.get(
+                service_name, BOTO_MAX_ATTEMPTS
+            ),
+        },
+    )
+
+
+def get_session() -> Any:
+    """
+    Get the boto3 session every client is created from, created on first use. Clients
+    are created from a single session, as creating a session loads the service models again.
+
+    :return: boto3 session
+    """
+    with registry_lock:
+        if "session" not in registry:
+            # Only imported when a client is first needed, to keep the cold start import light.
+            import boto3
+
+            registry["session"] = boto3.session.Session(region_name=aws_region)
+        return registry["session"]
+
+
+def get_client(service_name: str) -> Any:
+    """
+    Get a boto3 client for the service, created on first use and then reused across
+    warm invocations, so a cold start only pays for the clients it needs and warm
+    invocations reuse the pooled connections, without another TLS handshake.
+
+    :param service_name: Name of the AWS service e.g. s3
+    :return: boto3 client
+    """
+    key = "client:{}".format(service_name)
+    with registry_lock:
+        if key not in registry:
+            registry[key] = get_session().client(
+                service_name=service_name, config=client_config(service_name)
+            )
+        return registry[key]
+
+
+def get_sagemaker_session() -> Any:
+    """
+    Get the SageMaker SDK session, created on first use from the same clients as the
+    rest of the evaluation, instead of a session with its own boto3 session and clients.
+
+    :return: SageMaker SDK session
+    """
+    with registry_lock:
+        if "sagemaker-session" not in registry:
+            import sagemaker
+
+            registry["sagemaker-session"] = sagemaker.Session(
+                boto_session=get_session(),
+                sagemaker_client=get_client("sagemaker"),
+                sagemaker_runtime_client=get_client("sagemaker-runtime"),
+            )
+        return registry["sagemaker-session"]
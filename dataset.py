@@ -0,0 +1,539 @@
+import io
+import logging
+import os
+import queue
+import threading
+from typing import Any, Iterable, Iterator, Optional
+
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger("model-evaluation")
+
+# Columns within the test data that are the target variable and not features
+LABEL_COLUMNS = ["y_no", "y_yes"]
+
+# Column used as the actual value when comparing against predictions
+TARGET_COLUMN = "y_yes"
+
+# Format of the test data for each file extension, CSV is assumed for any other extension
+TEST_DATA_FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+# Integer types a column of whole numbers is stored as, smallest first
+INTEGER_DTYPES = [np.int8, np.int16, np.int32]
+
+# Number of rows at the start of the test data each column's type is planned from
+DTYPE_SAMPLE_ROWS = 1000
+
+# Planned integer types hold this multiple of the values sampled, as later rows may be larger
+DTYPE_HEADROOM = 2
+
+# Bytes requested from the bucket by each read of columnar test data
+S3_READ_BUFFER_BYTES = 256 * 1024
+
+
+class S3ObjectFile(io.RawIOBase):
+    """
+    Read only, seekable file of an object within a bucket. Every read is a ranged get
+    object request, so columnar formats only download the parts of the object they need.
+    """
+
+    def __init__(
+        self, client: Any, bucket_name: str, key: str, size: int, etag: Optional[str]
+    ):
+        """
+        :param client: boto3 client configured to use s3
+        :param bucket_name: AWS S3 Bucket name containing the object
+        :param key: Full path of object within AWS S3 Bucket
+        :param size: Size of the object in bytes
+        :param etag: ETag of the object, reads fail if the object is replaced while being read
+        """
+        super().__init__()
+        self.client = client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.size = size
+        self.etag = etag
+        self.position = 0
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError("Invalid whence: {}".format(whence))
+        self.position = max(0, position)
+        return self.position
+
+    def readinto(self, buffer: Any) -> int:
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        request = {
+            "Bucket": self.bucket_name,
+            "Key": self.key,
+            "Range": "bytes={start}-{end}".format(
+                start=self.position, end=self.position + length - 1
+            ),
+        }
+        if self.etag:
+            request["IfMatch"] = self.etag
+        data = self.client.get_object(**request)["Body"].read()
+        buffer[: len(data)] = data
+        self.position += len(data)
+        self.bytes_read += len(data)
+        return len(data)
+
+
+def detect_test_data_format(key: str, declared: Optional[str] = None) -> str:
+    """
+    :param key: Full path of object within AWS S3 Bucket
+    :param declared: Format given in the message, used over the file extension
+    :return: `csv`, `parquet` or `arrow`
+    """
+    if declared:
+        return declared
+    return TEST_DATA_FORMATS.get(os.path.splitext(key)[1].lower(), "csv")
+
+
+def open_test_data(
+    bucket_name: str, key: str, client: Any, test_data_format: str = "csv"
+) -> dict:
+    """
+    Start downloading the test data from the bucket, the body is read as it is parsed.
+    CSV is read in a single request, while columnar formats are read with ranged requests
+    so only the columns used are downloaded.
+
+    :param bucket_name: AWS S3 Bucket name containing the test data
+    :param key: Full path of object within AWS S3 Bucket
+    :param client: boto3 client configured to use s3
+    :param test_data_format: `csv`, `parquet` or `arrow`
+    :return: get object response, including the ETag and VersionId of the object
+    """
+    if test_data_format == "csv":
+        response = client.get_object(Bucket=bucket_name, Key=key)
+    else:
+        response = client.head_object(Bucket=bucket_name, Key=key)
+        response["Body"] = io.BufferedReader(
+            S3ObjectFile(
+                client=client,
+                bucket_name=bucket_name,
+                key=key,
+                size=response["ContentLength"],
+                etag=response.get("ETag"),
+            ),
+            buffer_size=S3_READ_BUFFER_BYTES,
+        )
+    logger.info(
+        "Streaming %s test data s3://%s/%s (%s bytes)",
+        test_data_format,
+        bucket_name,
+        key,
+        response.get("ContentLength"),
+    )
+    return response
+
+
+def read_test_data_chunks(
+    body: Any,
+    chunk_rows: int,
+    test_data_format: str = "csv",
+    feature_names: Optional[list[str]] = None,
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Parse the test data `chunk_rows` rows at a time, excluding the index column. Only the
+    current chunk is held in memory, and rows are available to be used before the whole
+    object has been downloaded.
+
+    :param body: Body of the test data object
+    :param chunk_rows: Number of rows parsed for each chunk
+    :param test_data_format: `csv`, `parquet` or `arrow`
+    :param feature_names: Filled with the name of each feature column once the first chunk is read
+    :return: features and target variable of each chunk as NumPy arrays
+    """
+    if test_data_format == "parquet":
+        return read_parquet_chunks(
+            body=body, chunk_rows=chunk_rows, feature_names=feature_names
+        )
+    if test_data_format == "arrow":
+        return read_arrow_chunks(
+            body=body, chunk_rows=chunk_rows, feature_names=feature_names
+        )
+    if test_data_format == "csv":
+        return read_csv_chunks(
+            body=body, chunk_rows=chunk_rows, feature_names=feature_names
+        )
+    raise ValueError("Unsupported test data format: {}".format(test_data_format))
+
+
+class ReplayedFile(io.RawIOBase):
+    """
+    Read only file returning the bytes already read from a body before the rest of the
+    body, so the start of a stream can be sampled and then parsed again from the first byte.
+    """
+
+    def __init__(self, head: bytes, body: Any):
+        """
+        :param head: Bytes already read from the body
+        :param body: Body the rest of the bytes are read from
+        """
+        super().__init__()
+        self.head = memoryview(head)
+        self.body = body
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        if self.head:
+            length = min(len(buffer), len(self.head))
+            buffer[:length] = self.head[:length]
+            self.head = self.head[length:]
+            return length
+        data = self.body.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def read_csv_chunks(
+    body: Any, chunk_rows: int, feature_names: Optional[list[str]] = None
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Parse the test data CSV `chunk_rows` rows at a time, excluding the first column. The
+    type of every column is planned from the first rows, and passed to the parser so
+    each column is parsed straight into its planned type.
+
+    :param body: Streaming body of the test data object
+    :param chunk_rows: Number of rows parsed for each chunk
+    :param feature_names: Filled with the name of each feature column once the first chunk is read
+    :return: features and target variable of each chunk as NumPy arrays
+    """
+    # Only imported when used, to keep the cold start import light.
+    import pandas as pd
+
+    def usecols(name: str) -> bool:
+        # Labels other than the target variable are never parsed.
+        return name == TARGET_COLUMN or name not in LABEL_COLUMNS
+
+    head = read_lines(body=body, lines=DTYPE_SAMPLE_ROWS + 1)
+    sample = pd.read_csv(
+        io.BytesIO(head),
+        index_col=0,
+        usecols=usecols,
+        nrows=DTYPE_SAMPLE_ROWS,
+    )
+    dtypes = plan_dtypes(
+        columns={name: sample[name].to_numpy() for name in sample.columns}
+    )
+    features = [name for name in sample.columns if name != TARGET_COLUMN]
+    if feature_names is not None:
+        feature_names[:] = features
+    del sample
+
+    # https://pandas.pydata.org/docs/user_guide/io.html#iterating-through-files-chunk-by-chunk
+    with pd.read_csv(
+        io.BufferedReader(ReplayedFile(head=head, body=body)),
+        index_col=0,
+        usecols=usecols,
+        dtype=dtypes,
+        chunksize=chunk_rows,
+    ) as reader:
+        for chunk in reader:
+            # Each column is a view of the parsed chunk, copied once into the features.
+            yield compact_arrays(
+                features=[chunk[name].to_numpy() for name in features],
+                actuals=chunk[TARGET_COLUMN].to_numpy(),
+                dtypes=dtypes,
+                feature_names=features,
+            )
+
+
+def read_lines(body: Any, lines: int) -> bytes:
+    """
+    :param body: Streaming body of the test data object
+    :param lines: Number of lines read
+    :return: the bytes read from the body, at least `lines` complete lines unless the body ends first
+    """
+    head = bytearray()
+    while head.count(b"\n") < lines:
+        data = body.read(S3_READ_BUFFER_BYTES)
+        if not data:
+            break
+        head += data
+    return bytes(head)
+
+
+def read_parquet_chunks(
+    body: Any, chunk_rows: int, feature_names: Optional[list[str]] = None
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Read the test data Parquet file row group by row group, reading only the feature
+    columns and the target variable.
+
+    :param body: Seekable body of the test data object
+    :param chunk_rows: Maximum number of rows in each chunk
+    :param feature_names: Filled with the name of each feature column once the schema is read
+    :return: features and target variable of each chunk as NumPy arrays
+    """
+    # Only imported when used, to keep the cold start import light.
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(body)
+    features = feature_columns(parquet_file.schema_arrow)
+    if feature_names is not None:
+        feature_names[:] = features
+    # https://arrow.apache.org/docs/python/generated/pyarrow.parquet.ParquetFile.html#pyarrow.parquet.ParquetFile.iter_batches
+    dtypes = None
+    for batch in parquet_file.iter_batches(
+        batch_size=chunk_rows, columns=features + [TARGET_COLUMN]
+    ):
+        if dtypes is None:
+            dtypes = record_batch_dtypes(batch=batch)
+        yield record_batch_arrays(batch=batch, features=features, dtypes=dtypes)
+
+
+def read_arrow_chunks(
+    body: Any, chunk_rows: int, feature_names: Optional[list[str]] = None
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Read the test data Arrow IPC file record batch by record batch, reading only the
+    feature columns and the target variable.
+
+    :param body: Seekable body of the test data object
+    :param chunk_rows: Maximum number of rows in each chunk
+    :param feature_names: Filled with the name of each feature column once the schema is read
+    :return: features and target variable of each chunk as NumPy arrays
+    """
+    # Only imported when used, to keep the cold start import light.
+    import pyarrow as pa
+
+    schema = pa.ipc.open_file(body).schema
+    features = feature_columns(schema)
+    if feature_names is not None:
+        feature_names[:] = features
+    # https://arrow.apache.org/docs/python/generated/pyarrow.ipc.IpcReadOptions.html
+    reader = pa.ipc.open_file(
+        body,
+        options=pa.ipc.IpcReadOptions(
+            included_fields=[
+                schema.get_field_index(name) for name in features + [TARGET_COLUMN]
+            ]
+        ),
+    )
+    dtypes = None
+    for index in range(reader.num_record_batches):
+        batch = reader.get_batch(index)
+        if dtypes is None:
+            dtypes = record_batch_dtypes(batch=batch)
+        for offset in range(0, batch.num_rows, chunk_rows):
+            yield record_batch_arrays(
+                batch=batch.slice(offset, chunk_rows), features=features, dtypes=dtypes
+            )
+
+
+def feature_columns(schema: Any) -> list[str]:
+    """
+    :param schema: Arrow schema of the test data
+    :return: names of every column that is not the index or a label
+    """
+    pandas_metadata = schema.pandas_metadata or {}
+    index_columns = {
+        column
+        for column in pandas_metadata.get("index_columns", [])
+        if isinstance(column, str)
+    }
+    return [
+        name
+        for name in schema.names
+        if name not in LABEL_COLUMNS
+        and name not in index_columns
+        and name not in ("", "Unnamed: 0")
+    ]
+
+
+def record_batch_dtypes(batch: Any) -> dict[str, np.dtype]:
+    """
+    :param batch: First Arrow record batch of the test data
+    :return: planned type of every column, from the first rows of the batch
+    """
+    sample = batch.slice(0, DTYPE_SAMPLE_ROWS)
+    return plan_dtypes(
+        columns={
+            name: sample.column(name).to_numpy(zero_copy_only=False)
+            for name in sample.schema.names
+        }
+    )
+
+
+def record_batch_arrays(
+    batch: Any, features: list[str], dtypes: dict[str, np.dtype]
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Copy the columns of an Arrow record batch straight into a feature matrix, casting each
+    column to its planned type. A value that does not fit its planned type raises an error.
+
+    :param batch: Arrow record batch containing the features and target variable
+    :param features: names of the feature columns, in order
+    :param dtypes: planned type of every column, see `plan_dtypes`
+    :return: features and target variable as NumPy arrays
+    """
+    import pyarrow as pa
+
+    def column(name: str) -> np.ndarray:
+        values = batch.column(name)
+        if values.null_count and dtypes[name].kind != "f":
+            raise ValueError(
+                "Column {} has missing values, but none in the rows its type was planned from".format(
+                    name
+                )
+            )
+        # https://arrow.apache.org/docs/python/generated/pyarrow.compute.cast.html
+        return values.cast(pa.from_numpy_dtype(dtypes[name]), safe=True).to_numpy(
+            zero_copy_only=False
+        )
+
+    return compact_arrays(
+        features=[column(name) for name in features],
+        actuals=column(TARGET_COLUMN),
+        dtypes=dtypes,
+        feature_names=features,
+    )
+
+
+def plan_dtypes(columns: dict[str, np.ndarray]) -> dict[str, np.dtype]:
+    """
+    Plan the type of every column once, from the first rows of the test data, so every
+    chunk is parsed into the same types. Integer types are planned with headroom, as
+    later rows may hold larger values than the first rows.
+
+    :param columns: values of each column within the first rows
+    :return: type of each column
+    """
+    return {
+        name: column_dtype(values, headroom=DTYPE_HEADROOM)
+        for name, values in columns.items()
+    }
+
+
+def compact_arrays(
+    features: list[np.ndarray],
+    actuals: np.ndarray,
+    dtypes: dict[str, np.dtype],
+    feature_names: list[str],
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Build the feature matrix from its columns with the smallest type that holds every
+    planned column type, e.g. one-hot encoded and small integer columns are stored as
+    `int16` instead of `float64`, using a quarter of the memory. The type of the matrix
+    is the same for every chunk, as it only depends on the plan.
+
+    :param features: values of each feature column, already of its planned type
+    :param actuals: values of the target variable
+    :param dtypes: planned type of every column, see `plan_dtypes`
+    :param feature_names: names of the feature columns, in order
+    :return: features and target variable as NumPy arrays
+    """
+    dtype = np.result_type(np.int8, *[dtypes[name] for name in feature_names])
+    rows = actuals.shape[0]
+    matrix = np.empty((rows, len(features)), dtype=dtype)
+    for index, column in enumerate(features):
+        matrix[:, index] = column
+    return matrix, actuals.astype(dtypes[TARGET_COLUMN], copy=False)
+
+
+def column_dtype(values: np.ndarray, headroom: int = 1) -> np.dtype:
+    """
+    Plan the type of a column: the smallest integer type when every value is a whole
+    number, `float32` when every value survives the round trip, otherwise `float64`.
+
+    :param values: values of the column
+    :param headroom: Multiple of the smallest and largest value the integer type must also hold
+    :return: smallest type holding every value exactly
+    """
+    if values.dtype == np.bool_:
+        return np.dtype(np.int8)
+    if not np.issubdtype(values.dtype, np.number):
+        return np.dtype(np.float64)
+    integral = np.issubdtype(values.dtype, np.integer)
+    if not integral:
+        with np.errstate(invalid="ignore"):
+            integral = bool(np.all(values == np.trunc(values)))
+    if integral:
+        low, high = (values.min(), values.max()) if values.size else (0, 0)
+        low, high = int(low) * headroom, int(high) * headroom
+        for dtype in INTEGER_DTYPES:
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                return np.dtype(dtype)
+        if np.issubdtype(values.dtype, np.integer):
+            return np.dtype(np.int64)
+    if np.array_equal(
+        values.astype(np.float32).astype(values.dtype), values, equal_nan=True
+    ):
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+
+def prefetch(iterable: Iterable, depth: int = 1) -> Iterator:
+    """
+    Consume an iterable on a background thread, keeping up to `depth` items ready,
+    so the next chunk of test data is downloaded and parsed while the endpoint is
+    invoked with the current one. Errors raised by the iterable are re-raised.
+
+    :param iterable: The iterable to read ahead of the consumer
+    :param depth: Maximum number of items read ahead
+    :return: items of the iterable, in the same order
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+    end_of_data = object()
+
+    def put(item: tuple) -> bool:
+        # Stop waiting for space in the buffer if the consumer has gone away.
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((end_of_data, None))
+        except Exception as error:
+            put((end_of_data, error))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is end_of_data:
+                return
+            yield item
+    finally:
+        stopped.set()
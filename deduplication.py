@@ -0,0 +1,64 @@
+import numpy as np
+
+# Odd multipliers used to hash each 8 byte word of a row, fixed so hashes are repeatable
+HASH_MULTIPLIERS = np.random.default_rng(0x5EED).integers(
+    1, 2**63, size=4096, dtype=np.uint64
+) | np.uint64(1)
+
+
+def row_words(data: np.ndarray) -> np.ndarray:
+    """
+    View every row of a 2D array as 8 byte words, padding rows with zeros when the
+    row is not a whole number of words.
+
+    :param data: 2D array of rows
+    :return: `(rows, words)` uint64 array
+    """
+    data = np.ascontiguousarray(data)
+    rows = data.shape[0]
+    row_bytes = data.dtype.itemsize * (data.shape[1] if data.ndim > 1 else 1)
+    padded = np.zeros((rows, -(-row_bytes // 8) * 8), dtype=np.uint8)
+    padded[:, :row_bytes] = data.view(np.uint8).reshape(rows, row_bytes)
+    return padded.view(np.uint64)
+
+
+def row_hashes(words: np.ndarray) -> np.ndarray:
+    """
+    Hash every row in a single pass over the array, without a Python loop per row.
+
+    :param words: rows viewed as 8 byte words, see `row_words`
+    :return: 64 bit hash of each row
+    """
+    multipliers = np.resize(HASH_MULTIPLIERS, words.shape[1])
+    # Unsigned arithmetic wraps around, which is what the hash relies on.
+    mixed = (words ^ (words >> np.uint64(31))) * multipliers
+    hashes = mixed.sum(axis=1, dtype=np.uint64)
+    return hashes ^ (hashes >> np.uint64(29))
+
+
+def unique_rows(data: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Find the unique rows of a 2D array by hashing each row. Rows sharing a hash are
+    compared byte for byte, so rows are only treated as duplicates when identical.
+
+    :param data: 2D array of rows
+    :return: index of the first occurrence of each unique row, in their original order,
+        and the position within the unique rows of every row
+    """
+    if data.shape[0] == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    words = row_words(data)
+    _, index, inverse = np.unique(
+        row_hashes(words), return_index=True, return_inverse=True
+    )
+    inverse = inverse.reshape(-1)
+    # A hash collision between different rows keeps the later rows as unique rows.
+    collided = np.flatnonzero(np.any(words != words[index[inverse]], axis=1))
+    if collided.size:
+        inverse[collided] = index.shape[0] + np.arange(collided.size)
+        index = np.concatenate([index, collided])
+    # Keep the unique rows in the order they first appear.
+    order = np.argsort(index, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(order.shape[0])
+    return index[order], rank[inverse]
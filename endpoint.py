@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional, Protocol
+
+import numpy as np
+
+from instrumentation import NULL_TELEMETRY, Telemetry
+
+
+class Predictor(Protocol):
+    """
+    Invokes the endpoint with a mini-batch, such as the SageMaker SDK `Predictor`
+    or `RuntimePredictor`.
+    """
+
+    def predict(self, data: np.ndarray) -> bytes: ...
+
+
+class RuntimePredictor:
+    """
+    Invoke an endpoint directly with the boto3 `sagemaker-runtime` client, with the same
+    `predict` interface as the SageMaker SDK Predictor, without importing the SDK.
+    """
+
+    def __init__(
+        self,
+        endpoint_name: str,
+        serializer: Any,
+        client: Any,
+        accept: str = "*/*",
+        target_variant: Optional[str] = None,
+        telemetry: Telemetry = NULL_TELEMETRY,
+    ):
+        """
+        :param endpoint_name: Endpoint to invoke
+        :param serializer: Serializer used to create the payload of a mini-batch
+        :param client: boto3 client configured to use sagemaker-runtime
+        :param accept: MIME type of the response expected from the endpoint
+        :param target_variant: Production variant to invoke, SageMaker decides if not set
+        :param telemetry: Records the time taken to serialize each mini-batch and the bytes sent
+        """
+        self.endpoint_name = endpoint_name
+        self.serializer = serializer
+        self.client = client
+        self.accept = accept
+        self.target_variant = target_variant
+        self.telemetry = telemetry
+
+    @property
+    def content_type(self) -> str:
+        return self.serializer.CONTENT_TYPE
+
+    def predict(self, data: np.ndarray) -> bytes:
+        """
+        Serialize the mini-batch and invoke the endpoint with it.
+
+        :param data: The mini-batch used for invoking.
+        :return: raw response body returned by the endpoint
+        """
+        return self.invoke(self.serialize(data))
+
+    def serialize(self, data: np.ndarray) -> bytes:
+        """
+        :param data: The mini-batch used for invoking.
+        :return: payload of the mini-batch
+        """
+        with self.telemetry.span("SerializationTime"):
+            body = self.serializer.serialize(data)
+        self.telemetry.count("PayloadBytes", len(body), "Bytes")
+        return body
+
+    def invoke(self, body: bytes) -> bytes:
+        """
+        :param body: payload of a mini-batch, see `serialize`
+        :return: raw response body returned by the endpoint
+        """
+        request = {
+            "EndpointName": self.endpoint_name,
+            "ContentType": self.content_type,
+            "Accept": self.accept,
+            "Body": body,
+        }
+        if self.target_variant:
+            request["TargetVariant"] = self.target_variant
+        # https://docs.aws.amazon.com/sagemaker/latest/APIReference/API_runtime_InvokeEndpoint.html
+        response = self.client.invoke_endpoint(**request)
+        return response["Body"].read()
+
+
+class FanOutPredictor:
+    """
+    Invoke several endpoints, or production variants, with every mini-batch. Each
+    mini-batch is serialized once, and the same payload is sent to every target at the
+    same time. Close the predictor, or use it as a context manager, once done.
+    """
+
+    def __init__(
+        self,
+        predictors: list[RuntimePredictor],
+        max_workers: int = 4,
+        invoke: Optional[Callable[[RuntimePredictor, bytes], bytes]] = None,
+    ):
+        """
+        :param predictors: Predictor of each target, all using the same serializer
+        :param max_workers: Maximum number of mini-batches predicted at the same time
+        :param invoke: Invokes a target with a payload, e.g. retrying throttled requests,
+            `RuntimePredictor.invoke` if not set
+        """
+        content_types = {predictor.content_type for predictor in predictors}
+        if len(content_types) != 1:
+            raise ValueError(
+                "Every target must be sent the same content type, got {}".format(
+                    sorted(content_types)
+                )
+            )
+        self.predictors = predictors
+        self.serializer = predictors[0].serializer
+        self.invoke = invoke or RuntimePredictor.invoke
+        # The first target is invoked by the thread predicting the mini-batch.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers * (len(predictors) - 1))
+        )
+
+    def predict(self, data: np.ndarray) -> list[bytes]:
+        """
+        Serialize the mini-batch and invoke every target with it.
+
+        :param data: The mini-batch used for invoking.
+        :return: raw response body returned by each target, in the order of the predictors
+        """
+        body = self.predictors[0].serialize(data)
+        futures = [
+            self._executor.submit(self.invoke, predictor, body)
+            for predictor in self.predictors[1:]
+        ]
+        try:
+            first = self.invoke(self.predictors[0], body)
+        finally:
+            # Wait for every target, so no invocation is left running after an error.
+            wait(futures)
+        return [first] + [future.result() for future in futures]
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def __enter__(self) -> "FanOutPredictor":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
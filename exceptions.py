@@ -0,0 +1,12 @@
+class EndpointNotReadyError(Exception):
+    """
+    Raised when the endpoint did not reach InService in the time available,
+    so the message is handed back to be retried later.
+    """
+
+
+class EvaluationIncompleteError(Exception):
+    """
+    Raised when the evaluation stopped before every row was evaluated, as the
+    invocation was running out of time, so the message is redelivered to resume it.
+    """
@@ -0,0 +1,166 @@
+import contextlib
+import json
+import threading
+import time
+from typing import ContextManager, Iterable, Iterator, Optional
+
+import numpy as np
+
+# Maximum number of values of a single metric within an EMF log line
+# https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+EMF_MAX_VALUES = 100
+
+
+class Telemetry:
+    """
+    Timings and counters of a single evaluation, written to the log as one CloudWatch
+    Embedded Metric Format (EMF) line when flushed, which CloudWatch turns into metrics
+    without any API calls. Timings of a phase are summed across threads, so the time of
+    a phase running on several threads can exceed the time of the evaluation.
+    """
+
+    def __init__(self, namespace: str, dimensions: dict[str, str]):
+        """
+        :param namespace: CloudWatch namespace the metrics are created in
+        :param dimensions: Dimensions added to every metric, e.g. the endpoint name
+        """
+        self.namespace = namespace
+        self.dimensions = dimensions
+        self.properties: dict[str, str] = {}
+        self.totals: dict[str, tuple[float, str]] = {}
+        self.values: dict[str, tuple[list[float], str]] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str) -> ContextManager:
+        """
+        Time a phase of the evaluation, adding the milliseconds taken to the metric.
+
+        :param name: Metric name of the phase
+        :return: context manager timing the phase
+        """
+        return self._span(name)
+
+    @contextlib.contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.count(name, (time.perf_counter() - started) * 1000, "Milliseconds")
+
+    def timed(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        Time how long each item of an iterable takes to be produced.
+
+        :param name: Metric name of the phase
+        :param iterable: The iterable to time
+        :return: items of the iterable, in the same order
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.span(name):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def count(self, name: str, value: float = 1, unit: str = "Count") -> None:
+        """
+        Add to a metric summed over the evaluation, safe to call from several threads.
+
+        :param name: Metric name
+        :param value: Amount added
+        :param unit: CloudWatch unit of the metric
+        """
+        with self._lock:
+            total, _ = self.totals.get(name, (0, unit))
+            self.totals[name] = (total + value, unit)
+
+    def observe(self, name: str, value: float, unit: str) -> None:
+        """
+        Record a value of a metric with a value for every occurrence, such as the
+        latency of each mini-batch, safe to call from several threads.
+
+        :param name: Metric name
+        :param value: The value observed
+        :param unit: CloudWatch unit of the metric
+        """
+        with self._lock:
+            self.values.setdefault(name, ([], unit))[0].append(value)
+
+    def set_property(self, name: str, value: str) -> None:
+        """
+        :param name: Name of a field added to the log line, searchable but not a metric
+        :param value: Value of the field
+        """
+        self.properties[name] = value
+
+    def emf(self, timestamp: Optional[float] = None) -> dict:
+        """
+        :param timestamp: Seconds since the epoch the metrics are recorded at, now if not set
+        :return: the metrics as an EMF document
+        """
+        with self._lock:
+            metrics = {
+                name: (total, unit) for name, (total, unit) in self.totals.items()
+            }
+            for name, (values, unit) in self.values.items():
+                if len(values) > EMF_MAX_VALUES:
+                    # Keep the distribution with evenly spaced quantiles of the values.
+                    values = np.quantile(
+                        values, np.linspace(0, 1, EMF_MAX_VALUES)
+                    ).tolist()
+                metrics[name] = (list(values), unit)
+        document = {
+            "_aws": {
+                "Timestamp": int((timestamp or time.time()) * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [sorted(self.dimensions)],
+                        "Metrics": [
+                            {"Name": name, "Unit": unit}
+                            for name, (_, unit) in sorted(metrics.items())
+                        ],
+                    }
+                ],
+            },
+            **self.properties,
+            **self.dimensions,
+        }
+        document.update({name: value for name, (value, _) in metrics.items()})
+        return document
+
+    def flush(self) -> None:
+        """Write the metrics to the log, Lambda sends everything printed to CloudWatch Logs."""
+        print(json.dumps(self.emf()), flush=True)
+
+
+class NullTelemetry(Telemetry):
+    """Telemetry that records nothing, used when metrics are switched off."""
+
+    def __init__(self):
+        super().__init__(namespace="", dimensions={})
+        self._null_span = contextlib.nullcontext()
+
+    def span(self, name: str) -> ContextManager:
+        return self._null_span
+
+    def timed(self, name: str, iterable: Iterable) -> Iterator:
+        return iter(iterable)
+
+    def count(self, name: str, value: float = 1, unit: str = "Count") -> None:
+        pass
+
+    def observe(self, name: str, value: float, unit: str) -> None:
+        pass
+
+    def set_property(self, name: str, value: str) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+# Shared instance used when metrics are switched off
+NULL_TELEMETRY = NullTelemetry()
@@ -0,0 +1,370 @@
+import threading
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+
+class ConfusionMatrixMetrics(NamedTuple):
+    """Quantitative evaluation metrics calculated from a confusion matrix."""
+
+    accuracy: float
+    precision: float
+    recall: float
+    f1_score: float
+    specificity: float
+
+
+class BinaryCounts(NamedTuple):
+    """Confusion matrix counts for the positive class vs. every other class."""
+
+    true_positive: int
+    true_negative: int
+    false_positive: int
+    false_negative: int
+
+
+def predicted_classes(scores: np.ndarray, threshold: float = 0.5) -> np.ndarray:
+    """
+    Convert the scores returned by the endpoint into the predicted class, rows with
+    a score at or above the threshold are predicted as the positive class.
+
+    :param scores: predictions returned by the endpoint
+    :param threshold: score at which a row is predicted as the positive class
+    :return: predicted class of each row
+    """
+    return (np.asarray(scores) >= threshold).astype(np.intp)
+
+
+def confusion_matrix(
+    actuals: np.ndarray, predictions: np.ndarray, num_classes: Optional[int] = None
+) -> np.ndarray:
+    """
+    Count every combination of actual and predicted class in a single pass, classes
+    missing from either array are still included with zero counts.
+
+    :param actuals: actual class of each row
+    :param predictions: predicted class of each row
+    :param num_classes: number of classes, found from the largest class if not provided
+    :return: `(num_classes, num_classes)` matrix with actuals as rows and predictions as columns
+    :raises ValueError: when a class is not a whole number between 0 and `num_classes`
+    """
+    actuals = class_indices(actuals, num_classes=num_classes, name="actuals")
+    predictions = class_indices(
+        predictions, num_classes=num_classes, name="predictions"
+    )
+    if num_classes is None:
+        num_classes = max(
+            2,
+            int(actuals.max(initial=0)) + 1,
+            int(predictions.max(initial=0)) + 1,
+        )
+    # Each combination of classes is given its own index, so one bincount counts them all.
+    counts = np.bincount(
+        actuals * num_classes + predictions, minlength=num_classes * num_classes
+    )
+    return counts.reshape(num_classes, num_classes)
+
+
+def class_indices(
+    classes: np.ndarray, num_classes: Optional[int], name: str
+) -> np.ndarray:
+    """
+    Check every class is a whole number that indexes the confusion matrix, as a NaN or a
+    class out of range would otherwise be counted in the wrong cell.
+
+    :param classes: class of each row, as integers or as whole numbers stored as floats
+    :param num_classes: number of classes, any class of 0 or more is valid if not provided
+    :param name: name of the classes within the error
+    :return: class of each row as an index
+    :raises ValueError: naming the invalid classes
+    """
+    values = np.asarray(classes, dtype=np.float64)
+    invalid = ~np.isfinite(values) | (values != np.trunc(values)) | (values < 0)
+    if num_classes is not None:
+        invalid |= values >= num_classes
+    if invalid.any():
+        expected = (
+            "of 0 or more"
+            if num_classes is None
+            else "from 0 to {}".format(num_classes - 1)
+        )
+        raise ValueError(
+            "{name} must be whole numbers {expected}, got {invalid}".format(
+                name=name.capitalize(),
+                expected=expected,
+                invalid=np.unique(values[invalid])[:10].tolist(),
+            )
+        )
+    return values.astype(np.intp)
+
+
+def binary_counts(matrix: np.ndarray, positive_class: int = 1) -> BinaryCounts:
+    """
+    Collapse a confusion matrix into counts for the positive class vs. every other class.
+
+    :param matrix: confusion matrix with actuals as rows and predictions as columns
+    :param positive_class: index of the positive class
+    :return: true positive, true negative, false positive and false negative counts
+    """
+    true_positive = int(matrix[positive_class, positive_class])
+    false_negative = int(matrix[positive_class, :].sum()) - true_positive
+    false_positive = int(matrix[:, positive_class].sum()) - true_positive
+    true_negative = int(matrix.sum()) - true_positive - false_negative - false_positive
+    return BinaryCounts(true_positive, true_negative, false_positive, false_negative)
+
+
+def metrics_from_counts(
+    true_positive: int, true_negative: int, false_positive: int, false_negative: int
+) -> ConfusionMatrixMetrics:
+    """
+    Calculate the evaluation metrics from confusion matrix counts. A metric with a
+    denominator of zero, such as precision when nothing is predicted as positive, is 0.
+
+    :param true_positive: positive class being classified correctly.
+    :param true_negative: negative class being classified correctly.
+    :param false_positive: negative class but being classified wrongly as belonging to the positive class.
+    :param false_negative: positive class but being classified wrongly as belonging to the negative class.
+    :return: calculated accuracy, precision, recall, f1_score, specificity
+    """
+    precision = safe_divide(true_positive, true_positive + false_positive)
+    recall = safe_divide(true_positive, true_positive + false_negative)
+    return ConfusionMatrixMetrics(
+        accuracy=safe_divide(
+            true_positive + true_negative,
+            true_positive + false_positive + true_negative + false_negative,
+        ),
+        precision=precision,
+        recall=recall,
+        f1_score=safe_divide(2 * precision * recall, precision + recall),
+        specificity=safe_divide(true_negative, false_positive + true_negative),
+    )
+
+
+def safe_divide(numerator: float, denominator: float) -> float:
+    """
+    :return: numerator divided by denominator, or 0 if the denominator is 0
+    """
+    return float(numerator) / denominator if denominator else 0.0
+
+
+class ThresholdCurves(NamedTuple):
+    """ROC and precision-recall curves over every threshold swept, in descending threshold order."""
+
+    thresholds: np.ndarray
+    true_positive_rate: np.ndarray
+    false_positive_rate: np.ndarray
+    precision: np.ndarray
+    roc_auc: float
+    pr_auc: float
+    best_f1_threshold: float
+    best_f1_score: float
+
+    @property
+    def recall(self) -> np.ndarray:
+        return self.true_positive_rate
+
+
+def curves_from_counts(
+    thresholds: np.ndarray, true_positive: np.ndarray, false_positive: np.ndarray
+) -> ThresholdCurves:
+    """
+    Create the ROC and precision-recall curves from the number of rows predicted as
+    positive at each threshold.
+
+    :param thresholds: thresholds in descending order
+    :param true_positive: cumulative count of positives at or above each threshold
+    :param false_positive: cumulative count of negatives at or above each threshold
+    :return: ROC and precision-recall curves, their AUC and the threshold with the best F1 score
+    """
+    positives, negatives = int(true_positive[-1]), int(false_positive[-1])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        true_positive_rate = np.nan_to_num(true_positive / positives)
+        false_positive_rate = np.nan_to_num(false_positive / negatives)
+        precision = true_positive / (true_positive + false_positive)
+        f1_score = 2 * true_positive / (true_positive + false_positive + positives)
+
+    # Start both curves from the threshold where nothing is predicted as positive.
+    fpr, tpr = np.r_[0.0, false_positive_rate], np.r_[0.0, true_positive_rate]
+    roc_auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+    # Average precision, the precision at each threshold weighted by the increase in recall.
+    pr_auc = float(np.sum(np.diff(tpr) * precision))
+    best = int(np.argmax(f1_score))
+
+    return ThresholdCurves(
+        thresholds=thresholds,
+        true_positive_rate=true_positive_rate,
+        false_positive_rate=false_positive_rate,
+        precision=precision,
+        roc_auc=roc_auc if positives and negatives else float("nan"),
+        pr_auc=pr_auc if positives else float("nan"),
+        best_f1_threshold=float(thresholds[best]),
+        best_f1_score=float(f1_score[best]),
+    )
+
+
+class CalibrationBins(NamedTuple):
+    """Mean score vs. observed rate of the positive class, for equal width score bins."""
+
+    lower_edges: np.ndarray
+    count: np.ndarray
+    mean_score: np.ndarray
+    positive_rate: np.ndarray
+    expected_calibration_error: float
+
+
+class MetricsAccumulator:
+    """
+    Evaluation metrics updated as each mini-batch of predictions is received, instead
+    of once every prediction has been collected. Only counts are kept: the confusion
+    matrix at the threshold, a histogram of scores for each class used for the
+    threshold sweep, and the totals of each calibration bin. Memory used is the same
+    regardless of the number of rows evaluated.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.5,
+        num_classes: int = 2,
+        positive_class: int = 1,
+        score_bins: int = 1000,
+        calibration_bins: int = 10,
+    ):
+        """
+        :param threshold: score at which a row is predicted as the positive class
+        :param num_classes: number of classes in the confusion matrix
+        :param positive_class: class treated as positive
+        :param score_bins: number of equal width bins between 0 and 1 used for the threshold sweep
+        :param calibration_bins: number of equal width bins between 0 and 1 used for calibration
+        """
+        self.threshold = threshold
+        self.positive_class = positive_class
+        self.confusion_matrix = np.zeros((num_classes, num_classes), dtype=np.int64)
+        # Row 0 counts the scores of other classes, row 1 the scores of the positive class.
+        self.score_histogram = np.zeros((2, score_bins), dtype=np.int64)
+        # Rows are the count, sum of scores and sum of positives in each bin.
+        self.calibration = np.zeros((3, calibration_bins), dtype=np.float64)
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self) -> int:
+        return int(self.confusion_matrix.sum())
+
+    def update(self, actuals: np.ndarray, scores: np.ndarray) -> None:
+        """
+        Add a mini-batch of predictions, safe to call from several threads.
+
+        :param actuals: actual class of each row
+        :param scores: predictions returned by the endpoint
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        is_positive = (np.asarray(actuals) == self.positive_class).astype(np.intp)
+        matrix = confusion_matrix(
+            actuals=actuals,
+            predictions=predicted_classes(scores, self.threshold),
+            num_classes=self.confusion_matrix.shape[0],
+        )
+        score_bins = self.score_histogram.shape[1]
+        histogram = np.bincount(
+            is_positive * score_bins + bin_index(scores, score_bins),
+            minlength=2 * score_bins,
+        ).reshape(2, score_bins)
+        calibration_bins = self.calibration.shape[1]
+        calibration_index = bin_index(scores, calibration_bins)
+        calibration = np.stack(
+            [
+                np.bincount(calibration_index, minlength=calibration_bins),
+                np.bincount(calibration_index, scores, minlength=calibration_bins),
+                np.bincount(calibration_index, is_positive, minlength=calibration_bins),
+            ]
+        )
+        with self._lock:
+            self.confusion_matrix += matrix
+            self.score_histogram += histogram
+            self.calibration += calibration
+
+    def metrics(self) -> ConfusionMatrixMetrics:
+        """
+        :return: metrics of the predictions received so far, at the threshold
+        """
+        return metrics_from_counts(
+            *binary_counts(self.confusion_matrix, self.positive_class)
+        )
+
+    def curves(self) -> ThresholdCurves:
+        """
+        Sweep the lower edge of every score bin containing predictions as a threshold.
+
+        :return: ROC and precision-recall curves of the predictions received so far
+        """
+        if self.rows == 0:
+            raise ValueError("Cannot evaluate thresholds without any predictions")
+        score_bins = self.score_histogram.shape[1]
+        # Highest bin first, so the cumulative sums count the rows at or above each edge.
+        negatives, positives = self.score_histogram[:, ::-1]
+        occupied = (negatives + positives) > 0
+        return curves_from_counts(
+            thresholds=(np.arange(score_bins)[::-1] / score_bins)[occupied],
+            true_positive=np.cumsum(positives)[occupied],
+            false_positive=np.cumsum(negatives)[occupied],
+        )
+
+    def calibration_bins(self) -> CalibrationBins:
+        """
+        :return: mean score and observed rate of the positive class for each calibration bin
+        """
+        count, score_sum, positive_sum = self.calibration
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_score = score_sum / count
+            positive_rate = positive_sum / count
+        return CalibrationBins(
+            lower_edges=np.arange(count.size) / count.size,
+            count=count.astype(np.int64),
+            mean_score=mean_score,
+            positive_rate=positive_rate,
+            expected_calibration_error=safe_divide(
+                np.abs(score_sum - positive_sum).sum(), count.sum()
+            ),
+        )
+
+
+class ComparisonAccumulator:
+    """
+    Metrics of several endpoints evaluated with the same rows, updated with one column
+    of scores for each endpoint. Progress is reported from the first endpoint.
+    """
+
+    def __init__(self, accumulators: list[MetricsAccumulator]):
+        """
+        :param accumulators: Metrics of each endpoint, in the order of the score columns
+        """
+        self.accumulators = accumulators
+
+    @property
+    def rows(self) -> int:
+        return self.accumulators[0].rows
+
+    def update(self, actuals: np.ndarray, scores: np.ndarray) -> None:
+        """
+        Add a mini-batch of predictions, safe to call from several threads.
+
+        :param actuals: actual class of each row
+        :param scores: `(rows, endpoints)` predictions returned by each endpoint
+        """
+        for column, accumulator in enumerate(self.accumulators):
+            accumulator.update(actuals=actuals, scores=scores[:, column])
+
+    def metrics(self) -> ConfusionMatrixMetrics:
+        """
+        :return: metrics of the first endpoint, at the threshold
+        """
+        return self.accumulators[0].metrics()
+
+
+def bin_index(scores: np.ndarray, bins: int) -> np.ndarray:
+    """
+    :param scores: predictions returned by the endpoint, clipped between 0 and 1
+    :param bins: number of equal width bins between 0 and 1
+    :return: index of the bin each score falls into, a score of 1 is in the last bin
+    """
+    return np.minimum((np.clip(scores, 0, 1) * bins).astype(np.intp), bins - 1)
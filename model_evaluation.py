@@ -1,29 +1,186 @@
+import functools
 import json
 import logging
 import os
+import random
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Any, Tuple
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
 
-import boto3
 import numpy as np
-import pandas as pd
-import sagemaker
-from sagemaker.predictor import Predictor
+from botocore.exceptions import ClientError
 
-from models import SQSRecord, ModelEvalMessage
+from baseline import BaselineStatistics
+from batching import BatchPlanner, SAGEMAKER_MAX_PAYLOAD_BYTES
+from bootstrap import MetricIntervals, bootstrap_intervals
+from checkpoint import EvaluationCheckpoint, EvaluationProgress
+from clients import aws_region, get_client, get_sagemaker_session
+from dataset import (
+    TARGET_COLUMN,
+    detect_test_data_format,
+    open_test_data,
+    prefetch,
+    read_test_data_chunks,
+)
+from deduplication import unique_rows
+from endpoint import FanOutPredictor, Predictor, RuntimePredictor
+from exceptions import EndpointNotReadyError, EvaluationIncompleteError
+from instrumentation import NULL_TELEMETRY, Telemetry
+from metrics import (
+    CalibrationBins,
+    ComparisonAccumulator,
+    ConfusionMatrixMetrics,
+    MetricsAccumulator,
+    binary_counts,
+    metrics_from_counts,
+    ThresholdCurves,
+)
+from models import EvaluationTarget, SQSEvent, SQSRecord, ModelEvalMessage
+from parameter_store import ParameterCache
+from prediction_cache import (
+    CacheBackend,
+    LocalDiskCacheBackend,
+    PredictionCache,
+    S3CacheBackend,
+)
+from report import (
+    comparison_markdown,
+    confidence_intervals_markdown,
+    confusion_matrix_markdown,
+    report_prefix,
+    threshold_curves_json,
+    threshold_metrics_markdown,
+    upload_report,
+)
+from sampling import SequentialSampler
+from serializers import get_serializer
 
-# The AWS region
-aws_region = os.environ.get("AWS_REGION", "eu-west-2")
+# The environment the lambda is currently deployed in
+SERVERLESS_ENVIRONMENT = os.environ.get("SERVERLESS_ENVIRONMENT")
 
-# Configure S3 client
-s3_client = boto3.client(service_name="s3", region_name=aws_region)
+# Maximum number of mini-batches sent to the endpoint at the same time
+PREDICTION_MAX_WORKERS = int(os.environ.get("PREDICTION_MAX_WORKERS", 4))
 
-# Configure SageMaker client
-sagemaker_client = boto3.client(service_name="sagemaker", region_name=aws_region)
+# Maximum number of attempts for a mini-batch while the endpoint is throttling requests
+PREDICTION_MAX_ATTEMPTS = int(os.environ.get("PREDICTION_MAX_ATTEMPTS", 5))
 
-# The environment the lambda is currently deployed in
-SERVERLESS_ENVIRONMENT = os.environ.get("SERVERLESS_ENVIRONMENT")
+# Number of test data rows parsed and held in memory at a time
+TEST_DATA_CHUNK_ROWS = int(os.environ.get("TEST_DATA_CHUNK_ROWS", 10000))
+
+# Payload ceiling a mini-batch is sized against, serverless endpoints only accept 4 MB
+ENDPOINT_MAX_PAYLOAD_BYTES = int(
+    os.environ.get("ENDPOINT_MAX_PAYLOAD_BYTES", SAGEMAKER_MAX_PAYLOAD_BYTES)
+)
+
+# Adjust the mini-batch size so each invocation takes around this many seconds, 0 to disable
+BATCH_TARGET_LATENCY_SECONDS = float(os.environ.get("BATCH_TARGET_LATENCY_SECONDS", 0))
+
+# Content type of the payload sent to the endpoint, see `serializers.SERIALIZERS`
+ENDPOINT_CONTENT_TYPE = os.environ.get("ENDPOINT_CONTENT_TYPE", "text/csv")
+
+# Invoke the endpoint with the boto3 `sagemaker-runtime` client or the SageMaker SDK (`sdk`)
+ENDPOINT_INVOCATION_CLIENT = os.environ.get("ENDPOINT_INVOCATION_CLIENT", "boto3")
+
+# Maximum number of messages within an SQS event evaluated at the same time
+SQS_RECORD_MAX_WORKERS = int(os.environ.get("SQS_RECORD_MAX_WORKERS", 4))
+
+# Maximum number of seconds to wait for an endpoint to be InService
+ENDPOINT_MAX_WAIT_SECONDS = float(os.environ.get("ENDPOINT_MAX_WAIT_SECONDS", 300))
+
+# Seconds of the invocation left for the evaluation when waiting for an endpoint
+ENDPOINT_WAIT_RESERVED_SECONDS = float(
+    os.environ.get("ENDPOINT_WAIT_RESERVED_SECONDS", 120)
+)
+
+# Endpoint statuses that will change without any action being taken
+TRANSIENT_ENDPOINT_STATUSES = {"Creating", "Updating", "SystemUpdating", "RollingBack"}
+
+# Describe endpoint response of endpoints found to be InService, kept across warm invocations
+in_service_endpoints: dict[str, dict] = {}
+
+# SageMaker SDK predictors of each endpoint, kept across warm invocations
+sdk_predictors: dict[str, Any] = {}
+
+# Seconds parameter store values are cached for across warm invocations, 0 to disable
+PARAMETER_STORE_CACHE_TTL_SECONDS = float(
+    os.environ.get("PARAMETER_STORE_CACHE_TTL_SECONDS", 300)
+)
+
+# Parameter store values retrieved by previous invocations
+parameter_cache = ParameterCache(ttl_seconds=PARAMETER_STORE_CACHE_TTL_SECONDS)
+
+# Cache the predictions of each mini-batch for redelivered messages: `local`, `s3` or empty to disable
+PREDICTION_CACHE_BACKEND = os.environ.get("PREDICTION_CACHE_BACKEND", "")
+
+# Directory predictions are cached in with the `local` backend
+PREDICTION_CACHE_DIRECTORY = os.environ.get(
+    "PREDICTION_CACHE_DIRECTORY", "/tmp/prediction-cache"
+)
+
+# Location predictions are cached in with the `s3` backend, defaults to the model monitoring bucket
+PREDICTION_CACHE_S3_URI = os.environ.get("PREDICTION_CACHE_S3_URI", "")
+
+# Rows in each block of cached predictions, blocks do not change with the size of each mini-batch
+PREDICTION_CACHE_BLOCK_ROWS = int(os.environ.get("PREDICTION_CACHE_BLOCK_ROWS", 500))
+
+# Save the progress of each evaluation so a redelivered message resumes it: `local`, `s3` or empty to disable
+CHECKPOINT_BACKEND = os.environ.get("CHECKPOINT_BACKEND", "")
+
+# Directory checkpoints are saved in with the `local` backend
+CHECKPOINT_DIRECTORY = os.environ.get(
+    "CHECKPOINT_DIRECTORY", "/tmp/evaluation-checkpoints"
+)
+
+# Location checkpoints are saved in with the `s3` backend, defaults to the model monitoring bucket
+CHECKPOINT_S3_URI = os.environ.get("CHECKPOINT_S3_URI", "")
+
+# Minimum seconds between checkpoints while mini-batches are received, 0 saves after every mini-batch
+CHECKPOINT_INTERVAL_SECONDS = float(os.environ.get("CHECKPOINT_INTERVAL_SECONDS", 30))
+
+# Seconds of the invocation kept to finish in-flight mini-batches, save the checkpoint and report
+EVALUATION_RESERVED_SECONDS = float(os.environ.get("EVALUATION_RESERVED_SECONDS", 60))
+
+# Write the time taken by each phase of an evaluation to the log as CloudWatch Embedded Metric Format
+EMF_METRICS_ENABLED = os.environ.get("EMF_METRICS_ENABLED", "true").lower() == "true"
+
+# CloudWatch namespace the metrics are created in
+EMF_METRICS_NAMESPACE = os.environ.get("EMF_METRICS_NAMESPACE", "ModelEvaluation")
+
+# Only send the unique rows of each chunk to the endpoint, for endpoints returning the same prediction for a row
+DEDUPLICATE_ROWS = os.environ.get("DEDUPLICATE_ROWS", "false").lower() == "true"
+
+# Bootstrap resamples used for the confidence interval of each metric, 0 to disable
+BOOTSTRAP_RESAMPLES = int(os.environ.get("BOOTSTRAP_RESAMPLES", 1000))
+
+# Fraction of resampled values within each confidence interval
+BOOTSTRAP_CONFIDENCE = float(os.environ.get("BOOTSTRAP_CONFIDENCE", 0.95))
+
+# Seed of the bootstrap resamples so intervals are reproducible, a random seed is used if empty
+BOOTSTRAP_SEED = (
+    int(os.environ["BOOTSTRAP_SEED"]) if os.environ.get("BOOTSTRAP_SEED") else None
+)
+
+# Evaluate a stratified sample of the test data, stopping once the metrics are precise enough
+SAMPLING_ENABLED = os.environ.get("SAMPLING_ENABLED", "false").lower() == "true"
+
+# Fraction of the rows of each class sampled from every chunk of test data
+SAMPLING_FRACTION = float(os.environ.get("SAMPLING_FRACTION", 0.1))
+
+# Comma separated metrics whose confidence interval is checked, e.g. `precision,recall,roc_auc`
+SAMPLING_METRICS = os.environ.get("SAMPLING_METRICS", "precision,recall")
+
+# Sampling stops once the confidence interval of every metric is narrower than this
+SAMPLING_TOLERANCE = float(os.environ.get("SAMPLING_TOLERANCE", 0.02))
+
+# Maximum number of rows sampled, sampling stops once reached
+SAMPLING_MAX_ROWS = int(os.environ.get("SAMPLING_MAX_ROWS", 100000))
+
+# Save statistics and constraints of the test data and predictions as a Model Monitor baseline
+BASELINE_STATISTICS_ENABLED = (
+    os.environ.get("BASELINE_STATISTICS_ENABLED", "true").lower() == "true"
+)
 
 # Configure logging
 logger = logging.getLogger("model-evaluation")
@@ -39,9 +196,48 @@ ssm_model_evaluation_output_bucket_name = (
 
 def lambda_handler(event, context):
     """
-    Invoke created endpoint and use test data to generate baseline constraints
+    Invoke created endpoint and use test data to generate baseline constraints, for
+    every message in the event. Messages are evaluated concurrently, and the messages
+    that failed are returned so only those are redelivered.
+    https://docs.aws.amazon.com/lambda/latest/dg/services-sqs-errorhandling.html#services-sqs-batchfailurereporting
+    """
+    sqs_event = SQSEvent(event)
+    logger.info("Received %s message(s)", len(sqs_event.records))
+
+    # Resolve every parameter needed in a single call, warm invocations use the cache.
+    parameter_cache.prefetch(names=[ssm_model_evaluation_output_bucket_name])
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(SQS_RECORD_MAX_WORKERS, len(sqs_event.records)))
+    ) as executor:
+        evaluations = [
+            (sqs_record, executor.submit(evaluate_message, sqs_record, context))
+            for sqs_record in sqs_event.records
+        ]
+
+    batch_item_failures = []
+    for sqs_record, evaluation in evaluations:
+        try:
+            evaluation.result()
+        except Exception:
+            logger.exception(
+                "Failed to evaluate messageId: %s, message will be redelivered",
+                sqs_record.message_id,
+            )
+            batch_item_failures.append({"itemIdentifier": sqs_record.message_id})
+
+    return {"batchItemFailures": batch_item_failures}
+
+
+def evaluate_message(sqs_record: SQSRecord, context: Any) -> None:
+    """
+    Invoke the endpoint named in the message with the test data, and save the confusion
+    matrix of the predictions vs. actuals to the output bucket. The time taken by each
+    phase of the evaluation is written to the log as CloudWatch metrics.
+
+    :param sqs_record: SQS message received
+    :param context: Lambda context object
     """
-    sqs_record = SQSRecord(event)
     logger.info(
         "Received messageId: %s from source: %s with message: %s",
         sqs_record.message_id,
@@ -51,93 +247,604 @@ def lambda_handler(event, context):
 
     message = ModelEvalMessage(**json.loads(sqs_record.body))
 
-    # Check that the endpoint is ready to receive requests.
-    if (
-        wait_endpoint_status_in_service(endpoint_name=message.endpointName)
-        != "InService"
-    ):
+    telemetry = create_telemetry(endpoint_name=message.endpointName)
+    telemetry.set_property("MessageId", sqs_record.message_id)
+    try:
+        with telemetry.span("EvaluationTime"):
+            evaluate_endpoint(message=message, context=context, telemetry=telemetry)
+    except Exception as error:
+        telemetry.set_property("Error", type(error).__name__)
+        raise
+    finally:
+        telemetry.flush()
+
+
+def evaluate_endpoint(
+    message: ModelEvalMessage, context: Any, telemetry: Telemetry = NULL_TELEMETRY
+) -> None:
+    """
+    Invoke the endpoint with the test data, and save the confusion matrix of the
+    predictions vs. actuals to the output bucket. When the message names other endpoints
+    or production variants to compare with, the test data is read and serialized once
+    and sent to every target, and a side by side comparison is saved as well.
+
+    :param message: Endpoints and test data to evaluate
+    :param context: Lambda context object
+    :param telemetry: Records the time taken by each phase of the evaluation
+    """
+    targets = message.targets
+    endpoint_names = list(dict.fromkeys(target.endpointName for target in targets))
+
+    # Check that every endpoint is ready to receive requests.
+    with telemetry.span("EndpointWaitTime"):
+        statuses = [
+            wait_endpoint_status_in_service(
+                endpoint_name=endpoint_name, context=context
+            )
+            for endpoint_name in endpoint_names
+        ]
+    if any(status != "InService" for status in statuses):
         logger.warning(
             "Endpoint failed to deployed, will not invoke endpoint with test data."
         )
         return
 
-    # Create predictor object for making predictions against endpoint
-    # https://sagemaker.readthedocs.io/en/stable/api/inference/predictors.html#predictors
-    sagemaker_session = sagemaker.Session()
-    predictor = Predictor(
-        endpoint_name=message.endpointName,
-        sagemaker_session=sagemaker_session,
-        serializer=sagemaker.serializers.CSVSerializer(),
+    logger.info(
+        "Sending test data to the endpoint(s) %s. \nPlease wait...",
+        ", ".join(target.label for target in targets),
     )
-
-    # Read the test data CSV from the bucket and exclude the first column.
-    data = pd.read_csv(
-        filepath_or_buffer="s3://{bucket_name}/{bucket_key}".format(
-            bucket_name=message.testDataS3BucketName, bucket_key=message.testDataS3Key
-        ),
-        index_col=0,
+    # Stream the test data from the bucket, the next chunk is downloaded while
+    # the endpoint is invoked with the current one.
+    test_data_format = detect_test_data_format(
+        key=message.testDataS3Key, declared=message.testDataFormat
     )
-
-    logger.info("Will use {rows} rows for prediction(s)".format(rows=data.shape[0]))
-
-    logger.info(
-        "Sending test data to the endpoint %s. \nPlease wait...",
-        message.endpointName,
+    with telemetry.span("TestDataOpenTime"):
+        test_data = open_test_data(
+            bucket_name=message.testDataS3BucketName,
+            key=message.testDataS3Key,
+            client=get_client("s3"),
+            test_data_format=test_data_format,
+        )
+    # Downloading and parsing happen together, as the body is parsed as it is read.
+    feature_names: list[str] = []
+    chunks = prefetch(
+        telemetry.timed(
+            "TestDataReadTime",
+            read_test_data_chunks(
+                body=test_data["Body"],
+                chunk_rows=TEST_DATA_CHUNK_ROWS,
+                test_data_format=test_data_format,
+                feature_names=feature_names,
+            ),
+        )
+    )
+    baseline = (
+        BaselineStatistics(seed=BOOTSTRAP_SEED) if BASELINE_STATISTICS_ENABLED else None
     )
-    predictions = perform_predictions(
-        data=data.drop(labels=["y_no", "y_yes"], axis=1).to_numpy(), predictor=predictor
+    sampler = create_sampler(
+        enabled=SAMPLING_ENABLED if message.sampling is None else message.sampling
     )
+    # A random sample differs between attempts, and checkpoints hold the predictions
+    # of a single target, so neither is resumed.
+    checkpoint = (
+        create_checkpoint(
+            endpoint_name=message.endpointName,
+            test_data=test_data,
+            target_variant=message.targetVariant,
+        )
+        if sampler is None and len(targets) == 1
+        else None
+    )
+    try:
+        if len(targets) == 1:
+            # Create predictor object for making predictions against endpoint
+            accumulators = [
+                predict_test_data(
+                    chunks=chunks,
+                    predictor=create_predictor(
+                        endpoint_name=message.endpointName,
+                        target_variant=message.targetVariant,
+                        telemetry=telemetry,
+                    ),
+                    cache=create_prediction_cache(
+                        endpoint_name=message.endpointName,
+                        test_data=test_data,
+                        target_variant=message.targetVariant,
+                    ),
+                    checkpoint=checkpoint,
+                    context=context,
+                    telemetry=telemetry,
+                    sampler=sampler,
+                    baseline=baseline,
+                )
+            ]
+        else:
+            # Cached predictions and checkpoints hold the predictions of a single target.
+            with create_fan_out_predictor(
+                targets=targets, telemetry=telemetry
+            ) as predictor:
+                accumulators = predict_test_data(
+                    chunks=chunks,
+                    predictor=predictor,
+                    context=context,
+                    telemetry=telemetry,
+                    sampler=sampler,
+                    baseline=baseline,
+                ).accumulators
+    except ClientError:
+        # The endpoint may have been updated or deleted since it was cached as InService.
+        for endpoint_name in endpoint_names:
+            in_service_endpoints.pop(endpoint_name, None)
+            sdk_predictors.pop(endpoint_name, None)
+        raise
+
+    logger.info("Used {rows} rows for prediction(s)".format(rows=accumulators[0].rows))
 
     # Upload csv to output bucket for training
     model_evaluation_output_bucket_name = get_parameter_store_value(
         name=ssm_model_evaluation_output_bucket_name
     )
+    today = str(datetime.now().strftime("%Y-%m-%d"))
+
+    results = [
+        report_target(
+            label=target.label,
+            accumulator=accumulator,
+            bucket_name=model_evaluation_output_bucket_name,
+            today=today,
+            telemetry=telemetry,
+            files=(
+                baseline.files(
+                    feature_names=feature_names,
+                    target_column=TARGET_COLUMN,
+                    target=index,
+                )
+                if baseline is not None
+                else None
+            ),
+        )
+        for index, (target, accumulator) in enumerate(zip(targets, accumulators))
+    ]
+    if len(targets) > 1:
+        # Every metric of every target as a single table, so the models can be compared.
+        with telemetry.span("ReportUploadTime"):
+            upload_report(
+                bucket_name=model_evaluation_output_bucket_name,
+                prefix=report_prefix(endpoint_name=targets[0].label, today=today),
+                files={
+                    "COMPARISON.md": comparison_markdown(
+                        results={
+                            target.label: (metrics, curves, calibration)
+                            for target, (metrics, curves, calibration, _) in zip(
+                                targets, results
+                            )
+                        },
+                        intervals={
+                            target.label: intervals
+                            for target, (*_, intervals) in zip(targets, results)
+                            if intervals is not None
+                        },
+                    )
+                },
+                client=get_client("s3"),
+            )
 
-    # Create confusion matrix to see how well the model predicted vs. actuals.
-    prediction_confusion_matrix = pd.crosstab(
-        index=data["y_yes"],
-        columns=np.round(predictions),
-        rownames=["actuals"],
-        colnames=["predictions"],
+    # Only once every file is saved, so a redelivered message resumes instead of starting again.
+    if checkpoint is not None:
+        checkpoint.clear()
+    logger.info(
+        "Completed invoking endpoint with test data, please confusion matrix created for model"
     )
 
-    # predictions   0.0  1.0
+
+def report_target(
+    label: str,
+    accumulator: MetricsAccumulator,
+    bucket_name: str,
+    today: str,
+    telemetry: Telemetry = NULL_TELEMETRY,
+    resamples: int = BOOTSTRAP_RESAMPLES,
+    files: Optional[dict[str, str]] = None,
+) -> tuple[
+    ConfusionMatrixMetrics, ThresholdCurves, CalibrationBins, Optional[MetricIntervals]
+]:
+    """
+    Calculate the metrics of the predictions made by a single endpoint or production
+    variant, and save its report to the output bucket.
+
+    :param label: Endpoint, or endpoint and production variant, the predictions were made by
+    :param accumulator: Metrics of every prediction
+    :param bucket_name: AWS S3 Bucket name the report is saved to
+    :param today: Date of the evaluation as `%Y-%m-%d`
+    :param telemetry: Records the time taken calculating metrics and saving the report
+    :param resamples: Bootstrap resamples used for the confidence intervals, 0 to not calculate them
+    :param files: Other files saved with the report, such as the Model Monitor baseline
+    :return: metrics at the threshold, the threshold sweep, the calibration of the scores
+        and the confidence interval of each metric, None when not calculated
+    """
+    metrics, curves, calibration, intervals, report = create_report(
+        label=label, accumulator=accumulator, telemetry=telemetry, resamples=resamples
+    )
+
+    # Then save to S3 bucket to be reviewed later as markdown, with the curves as JSON.
+    with telemetry.span("ReportUploadTime"):
+        upload_report(
+            bucket_name=bucket_name,
+            prefix=report_prefix(endpoint_name=label, today=today),
+            files={**report, **(files or {})},
+            client=get_client("s3"),
+        )
+    return metrics, curves, calibration, intervals
+
+
+def create_report(
+    label: str,
+    accumulator: MetricsAccumulator,
+    telemetry: Telemetry = NULL_TELEMETRY,
+    resamples: int = BOOTSTRAP_RESAMPLES,
+) -> tuple[
+    ConfusionMatrixMetrics,
+    ThresholdCurves,
+    CalibrationBins,
+    Optional[MetricIntervals],
+    dict[str, str],
+]:
+    """
+    Calculate the metrics of the predictions made by a single endpoint or production
+    variant, and format its report.
+
+    :param label: Endpoint, or endpoint and production variant, the predictions were made by
+    :param accumulator: Metrics of every prediction
+    :param telemetry: Records the time taken calculating metrics
+    :param resamples: Bootstrap resamples used for the confidence intervals, 0 to not calculate them
+    :return: metrics at the threshold, the threshold sweep, the calibration of the scores,
+        the confidence interval of each metric, None when not calculated, and the contents
+        of each report file by file name
+    """
+    # Confusion matrix to see how well the model predicted vs. actuals.
+    prediction_confusion_matrix = accumulator.confusion_matrix
+
+    # predictions   0     1
     # actuals
-    # 0.0          3583   53
-    # 1.0           382  101
+    # 0          3583    53
+    # 1           382   101
 
-    calculate_confusion_matrix_metrics(
-        true_positive=prediction_confusion_matrix[0][0],
-        true_negative=prediction_confusion_matrix[1][1],
-        false_positive=prediction_confusion_matrix[1][0],
-        false_negative=prediction_confusion_matrix[0][1],
+    logger.info("Metrics of %s", label)
+    metrics = calculate_confusion_matrix_metrics(
+        **binary_counts(prediction_confusion_matrix)._asdict()
     )
 
-    # Then save to S3 bucket to be reviewed later as markdown.
-    prediction_confusion_matrix.to_markdown(
-        buf="s3://{bucket_name}/{today}/predictions/{endpoint_name}/PREDICTIONS.md".format(
-            bucket_name=model_evaluation_output_bucket_name,
-            today=str(datetime.now().strftime("%Y-%m-%d")),
-            endpoint_name=message.endpointName,
+    # Sweep every threshold, as 0.5 is rarely the threshold the model is deployed with.
+    with telemetry.span("MetricsTime"):
+        curves = accumulator.curves()
+        calibration = accumulator.calibration_bins()
+        # Intervals show how much the metrics would vary with another sample of test data.
+        intervals = (
+            bootstrap_intervals(
+                score_histogram=accumulator.score_histogram,
+                threshold=accumulator.threshold,
+                resamples=resamples,
+                confidence=BOOTSTRAP_CONFIDENCE,
+                seed=BOOTSTRAP_SEED,
+            )
+            if resamples
+            else None
+        )
+    logger.info(
+        "Model threshold sweep, ROC AUC: %s, PR AUC: %s, best F1 score: %s at threshold: %s, "
+        "expected calibration error: %s",
+        curves.roc_auc,
+        curves.pr_auc,
+        curves.best_f1_score,
+        curves.best_f1_threshold,
+        calibration.expected_calibration_error,
+    )
+    sections = [
+        confusion_matrix_markdown(prediction_confusion_matrix),
+        threshold_metrics_markdown(curves, calibration),
+    ]
+    if intervals is not None:
+        logger.info(
+            "Bootstrap %s%% confidence intervals, %s",
+            BOOTSTRAP_CONFIDENCE * 100,
+            ", ".join(
+                "{name}: [{interval.lower:.4f}, {interval.upper:.4f}]".format(
+                    name=name, interval=interval
+                )
+                for name, interval in intervals._asdict().items()
+            ),
+        )
+        sections.append(
+            confidence_intervals_markdown(intervals, confidence=BOOTSTRAP_CONFIDENCE)
+        )
+
+    report = {
+        "PREDICTIONS.md": "\n\n".join(sections),
+        "CURVES.json": threshold_curves_json(curves, calibration),
+    }
+    return metrics, curves, calibration, intervals, report
+
+
+def create_predictor(
+    endpoint_name: str,
+    invocation_client: str = ENDPOINT_INVOCATION_CLIENT,
+    target_variant: Optional[str] = None,
+    telemetry: Telemetry = NULL_TELEMETRY,
+) -> Predictor:
+    """
+    Create the predictor used to invoke the endpoint. By default the endpoint is invoked
+    with the boto3 `sagemaker-runtime` client, the SageMaker SDK is only imported when
+    asked for, as importing it adds seconds to a cold start. Both share the clients of
+    previous invocations, and an SDK predictor is reused for every message to its endpoint.
+
+    :param endpoint_name: Endpoint to invoke
+    :param invocation_client: `boto3` or `sdk`, a production variant is always invoked with `boto3`
+    :param target_variant: Production variant to invoke, SageMaker decides if not set
+    :param telemetry: Records the time taken to serialize each mini-batch and the bytes sent
+    :return: predictor for the endpoint
+    """
+    serializer = get_serializer(content_type=ENDPOINT_CONTENT_TYPE)
+    if invocation_client == "sdk" and not target_variant:
+        if endpoint_name not in sdk_predictors:
+            from sagemaker.predictor import Predictor as SageMakerPredictor
+
+            # https://sagemaker.readthedocs.io/en/stable/api/inference/predictors.html#predictors
+            sdk_predictors[endpoint_name] = SageMakerPredictor(
+                endpoint_name=endpoint_name,
+                sagemaker_session=get_sagemaker_session(),
+                serializer=serializer,
+            )
+        return sdk_predictors[endpoint_name]
+    return RuntimePredictor(
+        endpoint_name=endpoint_name,
+        serializer=serializer,
+        client=get_client("sagemaker-runtime"),
+        target_variant=target_variant,
+        telemetry=telemetry,
+    )
+
+
+def create_fan_out_predictor(
+    targets: list[EvaluationTarget],
+    max_workers: int = PREDICTION_MAX_WORKERS,
+    telemetry: Telemetry = NULL_TELEMETRY,
+) -> FanOutPredictor:
+    """
+    Create the predictor sending every mini-batch to several endpoints or production
+    variants, always with the boto3 `sagemaker-runtime` client. A throttled target is
+    retried on its own, without sending the mini-batch to the other targets again.
+
+    :param targets: Endpoints or production variants to invoke
+    :param max_workers: Maximum number of mini-batches sent at the same time
+    :param telemetry: Records the time taken to serialize each mini-batch and the bytes sent
+    :return: predictor returning the response of every target
+    """
+    serializer = get_serializer(content_type=ENDPOINT_CONTENT_TYPE)
+    client = get_client("sagemaker-runtime")
+
+    def invoke(predictor: RuntimePredictor, body: bytes) -> bytes:
+        return call_with_retry(
+            functools.partial(predictor.invoke, body), telemetry=telemetry
+        )
+
+    return FanOutPredictor(
+        predictors=[
+            RuntimePredictor(
+                endpoint_name=target.endpointName,
+                serializer=serializer,
+                client=client,
+                target_variant=target.targetVariant,
+                telemetry=telemetry,
+            )
+            for target in targets
+        ],
+        max_workers=max_workers,
+        invoke=invoke,
+    )
+
+
+def create_telemetry(
+    endpoint_name: str, enabled: bool = EMF_METRICS_ENABLED
+) -> Telemetry:
+    """
+    :param endpoint_name: Endpoint being evaluated, added as a dimension of every metric
+    :param enabled: Record metrics, otherwise nothing is recorded or written to the log
+    :return: telemetry of the evaluation
+    """
+    if not enabled:
+        return NULL_TELEMETRY
+    return Telemetry(
+        namespace=EMF_METRICS_NAMESPACE, dimensions={"EndpointName": endpoint_name}
+    )
+
+
+def create_prediction_cache(
+    endpoint_name: str,
+    test_data: dict,
+    backend: str = PREDICTION_CACHE_BACKEND,
+    target_variant: Optional[str] = None,
+    boto_client: Any = None,
+) -> Optional[PredictionCache]:
+    """
+    Create the cache of predictions for the endpoint and version of the test data, so
+    a redelivered message reuses the blocks of rows already scored.
+
+    :param endpoint_name: Endpoint the predictions are made by
+    :param test_data: get object response of the test data
+    :param backend: `local`, `s3` or empty to not cache predictions
+    :param target_variant: Production variant the predictions are made by
+    :param boto_client: boto3 SageMaker client used to find the endpoint configuration
+    :return: prediction cache, or None when predictions are not cached
+    """
+    if not backend:
+        return None
+    return PredictionCache(
+        backend=create_cache_backend(
+            backend=backend,
+            directory=PREDICTION_CACHE_DIRECTORY,
+            s3_uri=PREDICTION_CACHE_S3_URI,
+            default_prefix="prediction-cache",
         ),
-        tablefmt="grid",
+        namespace=evaluation_namespace(
+            endpoint_name=endpoint_name,
+            test_data=test_data,
+            target_variant=target_variant,
+            boto_client=boto_client,
+        ),
+        block_rows=PREDICTION_CACHE_BLOCK_ROWS,
     )
 
-    logger.info(
-        "Completed invoking endpoint with test data, please confusion matrix created for model"
+
+def create_checkpoint(
+    endpoint_name: str,
+    test_data: dict,
+    backend: str = CHECKPOINT_BACKEND,
+    target_variant: Optional[str] = None,
+    boto_client: Any = None,
+) -> Optional[EvaluationCheckpoint]:
+    """
+    Create the checkpoint of the evaluation of the endpoint with the version of the
+    test data, so a redelivered message resumes from where the last attempt stopped.
+
+    :param endpoint_name: Endpoint the predictions are made by
+    :param test_data: get object response of the test data
+    :param backend: `local`, `s3` or empty to not save checkpoints
+    :param target_variant: Production variant the predictions are made by
+    :param boto_client: boto3 SageMaker client used to find the endpoint configuration
+    :return: checkpoint, or None when checkpoints are not saved
+    """
+    if not backend:
+        return None
+    return EvaluationCheckpoint(
+        backend=create_cache_backend(
+            backend=backend,
+            directory=CHECKPOINT_DIRECTORY,
+            s3_uri=CHECKPOINT_S3_URI,
+            default_prefix="evaluation-checkpoints",
+        ),
+        key=evaluation_namespace(
+            endpoint_name=endpoint_name,
+            test_data=test_data,
+            target_variant=target_variant,
+            boto_client=boto_client,
+        ),
+        interval=CHECKPOINT_INTERVAL_SECONDS,
+    )
+
+
+def create_sampler(enabled: bool = SAMPLING_ENABLED) -> Optional[SequentialSampler]:
+    """
+    :param enabled: Evaluate a sample of the test data, otherwise every row is evaluated
+    :return: sampler of the test data, or None when every row is evaluated
+    """
+    if not enabled:
+        return None
+    return SequentialSampler(
+        fraction=SAMPLING_FRACTION,
+        metrics=[name.strip() for name in SAMPLING_METRICS.split(",") if name.strip()],
+        tolerance=SAMPLING_TOLERANCE,
+        max_rows=SAMPLING_MAX_ROWS,
+        confidence=BOOTSTRAP_CONFIDENCE,
+        seed=BOOTSTRAP_SEED,
+    )
+
+
+def create_cache_backend(
+    backend: str, directory: str, s3_uri: str, default_prefix: str
+) -> CacheBackend:
+    """
+    :param backend: `local` or `s3`
+    :param directory: Directory used by the `local` backend
+    :param s3_uri: Location used by the `s3` backend, the model monitoring bucket if empty
+    :param default_prefix: Key prefix used when the location does not include one
+    :return: storage for cached predictions or checkpoints
+    """
+    if backend == "local":
+        return LocalDiskCacheBackend(directory=directory)
+    if backend == "s3":
+        bucket_name, _, prefix = s3_uri.removeprefix("s3://").partition("/")
+        if not bucket_name:
+            bucket_name = get_parameter_store_value(
+                name=ssm_model_evaluation_output_bucket_name
+            )
+        return S3CacheBackend(
+            bucket_name=bucket_name,
+            prefix=prefix or default_prefix,
+            client=get_client("s3"),
+        )
+    raise ValueError("Unsupported cache backend: {}".format(backend))
+
+
+def evaluation_namespace(
+    endpoint_name: str,
+    test_data: dict,
+    target_variant: Optional[str] = None,
+    boto_client: Any = None,
+) -> str:
+    """
+    The endpoint is always described again, rather than using the status cached by a
+    warm invocation, as `UpdateEndpoint` deploys a different model under the same endpoint
+    name without any error, and predictions of the previous model must not be reused.
+
+    :param endpoint_name: Endpoint the predictions are made by
+    :param test_data: get object response of the test data
+    :param target_variant: Production variant the predictions are made by
+    :param boto_client: boto3 SageMaker client, created on first use if not provided
+    :return: identifies the deployed model and the version of the test data
+    """
+    if boto_client is None:
+        boto_client = get_client("sagemaker")
+    # The endpoint configuration changes whenever a different model is deployed.
+    endpoint_config_name = boto_client.describe_endpoint(EndpointName=endpoint_name)[
+        "EndpointConfigName"
+    ]
+    return PredictionCache.namespace_for(
+        endpoint_name=EvaluationTarget(
+            endpointName=endpoint_name, targetVariant=target_variant
+        ).label,
+        endpoint_config_name=endpoint_config_name,
+        etag=test_data["ETag"],
+        version_id=test_data.get("VersionId"),
     )
-    return event
 
 
 def wait_endpoint_status_in_service(
-    endpoint_name: str, boto_client: Any = sagemaker_client
+    endpoint_name: str,
+    boto_client: Any = None,
+    context: Any = None,
+    max_wait_seconds: float = ENDPOINT_MAX_WAIT_SECONDS,
+    initial_delay: float = 5.0,
+    max_delay: float = 60.0,
 ) -> str:
     """
-    Wait for endpoint to reach a terminal state (InService) using describe endpoint
+    Wait for endpoint to reach a terminal state (InService) using describe endpoint,
+    polling with exponential backoff. An endpoint found to be InService is remembered
+    for warm invocations, so it is not described again.
 
     :param endpoint_name: Endpoint to query
-    :param boto_client: boto3 SageMaker client
+    :param boto_client: boto3 SageMaker client, created on first use if not provided
+    :param context: Lambda context object, the wait stops in time to hand the message back
+    :param max_wait_seconds: Maximum time to wait for the endpoint to be ready
+    :param initial_delay: Seconds before the first poll, doubled after every poll
+    :param max_delay: Upper limit of the delay between polls
+    :return: the status of the endpoint
     """
+    if endpoint_name in in_service_endpoints:
+        logger.info("Endpoint: %s, status is cached as: InService", endpoint_name)
+        return "InService"
+
+    if boto_client is None:
+        boto_client = get_client("sagemaker")
+    deadline = time.monotonic() + max_wait_seconds
+    if context is not None:
+        # Leave enough of the invocation to use the endpoint once it is ready.
+        deadline = min(
+            deadline,
+            time.monotonic()
+            + context.get_remaining_time_in_millis() / 1000
+            - ENDPOINT_WAIT_RESERVED_SECONDS,
+        )
+
     describe_endpoint_response = boto_client.describe_endpoint(
         EndpointName=endpoint_name
     )
@@ -145,64 +852,515 @@ def wait_endpoint_status_in_service(
     # 'EndpointStatus': 'OutOfService'|'Creating'|'Updating'|'SystemUpdating'|'RollingBack'|'InService'
     # |'Deleting'|'Failed'|'UpdateRollbackFailed'
 
-    while describe_endpoint_response["EndpointStatus"] == "Creating":
-        describe_endpoint_response = boto_client.describe_endpoint(
-            EndpointName=endpoint_name
-        )
+    delay = initial_delay
+    while describe_endpoint_response["EndpointStatus"] in TRANSIENT_ENDPOINT_STATUSES:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise EndpointNotReadyError(
+                "Endpoint: {endpoint_name} is still {status}, retry the evaluation later".format(
+                    endpoint_name=endpoint_name,
+                    status=describe_endpoint_response["EndpointStatus"],
+                )
+            )
         logger.info(
             "Waiting for endpoint: %s to be in InService, currently in: %s",
             endpoint_name,
             describe_endpoint_response["EndpointStatus"],
         )
-        time.sleep(15)
+        time.sleep(min(delay, remaining))
+        delay = min(max_delay, delay * 2)
+        describe_endpoint_response = boto_client.describe_endpoint(
+            EndpointName=endpoint_name
+        )
     logger.info(
         "Endpoint: %s, status is currently: %s",
         endpoint_name,
         describe_endpoint_response["EndpointStatus"],
     )
+    if describe_endpoint_response["EndpointStatus"] == "InService":
+        in_service_endpoints[endpoint_name] = describe_endpoint_response
     return describe_endpoint_response["EndpointStatus"]
 
 
+def predict_test_data(
+    chunks: Iterable[tuple[np.ndarray, np.ndarray]],
+    predictor: Predictor,
+    rows: int = 500,
+    max_workers: int = PREDICTION_MAX_WORKERS,
+    accumulator: Optional[Union[MetricsAccumulator, ComparisonAccumulator]] = None,
+    cache: Optional[PredictionCache] = None,
+    checkpoint: Optional[EvaluationCheckpoint] = None,
+    context: Any = None,
+    telemetry: Telemetry = NULL_TELEMETRY,
+    deduplicate: bool = DEDUPLICATE_ROWS,
+    sampler: Optional[SequentialSampler] = None,
+    baseline: Optional[BaselineStatistics] = None,
+) -> Union[MetricsAccumulator, ComparisonAccumulator]:
+    """
+    Invoke the endpoint with each chunk of test data as it is read, adding the
+    predictions of every mini-batch to the metrics as they are received. Neither
+    the features nor the predictions are kept once a chunk has been evaluated.
+
+    When a checkpoint is provided, rows evaluated by a previous attempt are skipped and
+    the progress is saved as mini-batches are received. When the invocation is running
+    out of time no more mini-batches are sent, the progress is saved and
+    `EvaluationIncompleteError` is raised, so the message is redelivered to resume. Once
+    every row has been evaluated the complete progress is saved, so the checkpoint is
+    only deleted by the caller once the report is saved.
+
+    When deduplicating, only the unique rows of each chunk are sent to the endpoint and
+    their predictions are copied to every duplicate row. The progress of a chunk is
+    then recorded once every unique row of the chunk has a prediction.
+
+    When sampling, only a stratified sample of each chunk is sent to the endpoint, and
+    no more chunks are read once the metrics are precise enough or the row budget is spent.
+
+    :param chunks: features and target variable of each chunk of the test dataset
+    :param predictor: SageMaker Predictor object, or `FanOutPredictor` to evaluate several targets
+    :param rows: Initial number of rows in each mini-batch
+    :param max_workers: Maximum number of concurrent endpoint invocations
+    :param accumulator: Metrics the predictions are added to, with one accumulator for
+        each target of a `FanOutPredictor`
+    :param cache: Predictions of mini-batches already scored by the endpoint, not used
+        with a `FanOutPredictor`
+    :param checkpoint: Progress of previous attempts, and where progress is saved, not
+        used with a `FanOutPredictor`
+    :param context: Lambda context object, mini-batches stop being sent in time to save progress,
+        only when a checkpoint is provided
+    :param telemetry: Records the latency of each mini-batch and the time taken updating metrics
+    :param deduplicate: Only send unique rows, for endpoints that always return the same prediction for a row
+    :param sampler: Samples the test data and decides when enough rows have been evaluated,
+        every row is evaluated if not set
+    :param baseline: Statistics of the features, target variable and predictions of the rows
+        evaluated, restored from the checkpoint when resuming
+    :return: metrics of every prediction
+    """
+    if accumulator is None and isinstance(predictor, FanOutPredictor):
+        accumulator = ComparisonAccumulator(
+            accumulators=[MetricsAccumulator() for _ in predictor.predictors]
+        )
+    elif accumulator is None:
+        accumulator = MetricsAccumulator()
+    progress = (
+        checkpoint.load(accumulator=accumulator, baseline=baseline)
+        if checkpoint is not None
+        else EvaluationProgress(accumulator=accumulator, baseline=baseline)
+    )
+
+    def running_out_of_time() -> bool:
+        # Leave enough of the invocation to finish the mini-batches in flight and save progress.
+        return (
+            context is not None
+            and context.get_remaining_time_in_millis() / 1000
+            < EVALUATION_RESERVED_SECONDS
+        )
+
+    # Without a checkpoint a redelivered message starts again from the first row, so
+    # stopping early would never let the evaluation complete.
+    should_stop = running_out_of_time if checkpoint is not None else None
+    if checkpoint is None and context is not None:
+        logger.warning(
+            "Checkpoints are disabled, the evaluation continues until every row is evaluated "
+            "or the invocation times out"
+        )
+
+    # The same planner is used for every chunk, so batch size adjustments carry over.
+    planner = BatchPlanner(
+        rows=rows,
+        max_payload_bytes=ENDPOINT_MAX_PAYLOAD_BYTES,
+        target_latency=BATCH_TARGET_LATENCY_SECONDS,
+    )
+
+    def record_batch(
+        offset: int, features: np.ndarray, actuals: np.ndarray
+    ) -> Callable:
+        def record(start: int, stop: int, predictions: np.ndarray) -> None:
+            progress.record(
+                start=offset + start,
+                stop=offset + stop,
+                actuals=actuals[start:stop],
+                scores=predictions,
+                features=features[start:stop],
+                telemetry=telemetry,
+            )
+            if checkpoint is not None:
+                checkpoint.save(progress)
+
+        return record
+
+    if sampler is not None:
+        chunks = sampler.sample(chunks)
+    accumulators = (
+        accumulator.accumulators
+        if isinstance(accumulator, ComparisonAccumulator)
+        else [accumulator]
+    )
+
+    offset, rows_sent = 0, 0
+    try:
+        for features, actuals in chunks:
+            for start, stop in progress.pending(offset=offset, rows=features.shape[0]):
+                record = record_batch(
+                    offset=offset + start,
+                    features=features[start:stop],
+                    actuals=actuals[start:stop],
+                )
+                if not deduplicate:
+                    perform_predictions(
+                        data=features[start:stop],
+                        predictor=predictor,
+                        max_workers=max_workers,
+                        planner=planner,
+                        cache=cache,
+                        should_stop=should_stop,
+                        telemetry=telemetry,
+                        on_batch=record,
+                    )
+                    rows_sent += stop - start
+                    continue
+                unique_index, inverse = unique_rows(features[start:stop])
+                predictions = perform_predictions(
+                    data=features[start:stop][unique_index],
+                    predictor=predictor,
+                    max_workers=max_workers,
+                    planner=planner,
+                    cache=cache,
+                    should_stop=should_stop,
+                    telemetry=telemetry,
+                )
+                record(0, stop - start, predictions[inverse])
+                rows_sent += unique_index.shape[0]
+            offset += features.shape[0]
+            logger.info(
+                "Received predictions for %s rows, accuracy so far: %s",
+                accumulator.rows,
+                accumulator.metrics().accuracy,
+            )
+            if sampler is not None and sampler.is_precise(accumulators):
+                logger.info(
+                    "Stopped sampling after %s rows, the metrics are within a tolerance of %s",
+                    accumulator.rows,
+                    sampler.tolerance,
+                )
+                break
+    except Exception:
+        if checkpoint is not None:
+            checkpoint.save(progress, force=True)
+            logger.info(
+                "Saved checkpoint with %s rows evaluated, a redelivered message will resume from here",
+                accumulator.rows,
+            )
+        raise
+
+    if checkpoint is not None:
+        checkpoint.save(progress, force=True)
+    if deduplicate:
+        telemetry.count("UniqueRows", rows_sent)
+        logger.info(
+            "Sent %s unique rows to the endpoint for %s rows, deduplication ratio: %.2f",
+            rows_sent,
+            accumulator.rows,
+            accumulator.rows / max(1, rows_sent),
+        )
+    if cache is not None:
+        logger.info(
+            "Reused cached predictions for %s of %s blocks of rows",
+            cache.hits,
+            cache.hits + cache.misses,
+        )
+    return accumulator
+
+
 def perform_predictions(
-    data: np.ndarray, predictor: Predictor, rows: int = 500
+    data: np.ndarray,
+    predictor: Predictor,
+    rows: int = 500,
+    max_workers: int = PREDICTION_MAX_WORKERS,
+    planner: Optional[BatchPlanner] = None,
+    on_batch: Optional[Callable[[int, int, np.ndarray], None]] = None,
+    cache: Optional[PredictionCache] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    telemetry: Telemetry = NULL_TELEMETRY,
 ) -> np.ndarray:
     """
     Use test dataset and split into mini-batches of rows, converting these batches
     into CSV string payloads, dropping the target variable from the dataset first.
-    Then invoke the endpoint for predictions.
+    Then invoke the endpoint for predictions, with up to `max_workers` mini-batches
+    in flight at the same time.
 
     :param data: The test dataset used for invoking.
+    :param predictor: SageMaker Predictor object, or `FanOutPredictor` to invoke several targets
+    :param rows: How to split the data, when a planner is not provided
+    :param max_workers: Maximum number of concurrent endpoint invocations
+    :param planner: Decides the size of each mini-batch
+    :param on_batch: Called with the row offsets and predictions of each mini-batch as it is received
+    :param cache: Predictions of blocks of rows already scored, every block is looked up before any
+        mini-batch is sent and only the rows not found are sent, not used with a `FanOutPredictor`
+    :param should_stop: Checked before each mini-batch is sent, `EvaluationIncompleteError` is raised
+        once the mini-batches in flight complete if it returns True
+    :param telemetry: Records the latency, rows and cache hits of each mini-batch
+    :return np.ndarray: collected predictions as a NumPy array, with a column for each
+        target of a `FanOutPredictor`
+    """
+    if planner is None:
+        planner = BatchPlanner(
+            rows=rows,
+            max_payload_bytes=ENDPOINT_MAX_PAYLOAD_BYTES,
+            target_latency=BATCH_TARGET_LATENCY_SECONDS,
+        )
+    planner.fit_payload(data=data, serializer=getattr(predictor, "serializer", None))
+
+    # Each mini-batch response is parsed straight into its own slice of the result,
+    # so only one array is held regardless of how many mini-batches are sent.
+    fan_out = isinstance(predictor, FanOutPredictor)
+    predictions = np.empty(
+        (data.shape[0], len(predictor.predictors)) if fan_out else data.shape[0],
+        dtype=np.float64,
+    )
+
+    # Predictions are cached in fixed blocks of rows rather than by mini-batch, as the
+    # planner sizes mini-batches from the latency, so they differ between attempts.
+    uncached = [(0, data.shape[0])]
+    unsaved_rows: dict[tuple[int, int], int] = {}
+    unsaved_lock = threading.Lock()
+    if cache is not None:
+        with telemetry.span("CacheLookupTime"):
+            cached = cache.get_many(data=data, max_workers=max_workers)
+        for (start, stop), values in cached.items():
+            predictions[start:stop] = values
+            telemetry.count("CachedBatches")
+            telemetry.count("Rows", stop - start)
+            if on_batch is not None:
+                on_batch(start, stop, predictions[start:stop])
+        unsaved_rows = {
+            (start, stop): stop - start
+            for start, stop in cache.blocks(total_rows=data.shape[0])
+            if (start, stop) not in cached
+        }
+        uncached = merge_ranges(list(unsaved_rows))
+
+    def planned_batches() -> Iterator[tuple[int, int]]:
+        for range_start, range_stop in uncached:
+            for start, stop in planner.batches(total_rows=range_stop - range_start):
+                yield range_start + start, range_start + stop
+
+    def completed_blocks(start: int, stop: int) -> list[tuple[int, int]]:
+        # Blocks are only saved once every row of the block has a prediction.
+        completed = []
+        with unsaved_lock:
+            for index in range(
+                start // cache.block_rows, (stop - 1) // cache.block_rows + 1
+            ):
+                block = (
+                    index * cache.block_rows,
+                    min(data.shape[0], (index + 1) * cache.block_rows),
+                )
+                overlap = min(stop, block[1]) - max(start, block[0])
+                unsaved_rows[block] -= overlap
+                if unsaved_rows[block] == 0:
+                    completed.append(block)
+        return completed
+
+    def invoke(batch: tuple[int, int]) -> None:
+        start, stop = batch
+        started = time.perf_counter()
+        if fan_out:
+            # Each target is retried on its own, see `create_fan_out_predictor`.
+            responses = predictor.predict(data[start:stop])
+        else:
+            # https://sagemaker.readthedocs.io/en/stable/api/inference/predictors.html#sagemaker.predictor.Predictor.predict
+            responses = [
+                predict_with_retry(
+                    predictor=predictor, data=data[start:stop], telemetry=telemetry
+                )
+            ]
+        seconds = time.perf_counter() - started
+        planner.record(rows=stop - start, seconds=seconds)
+        telemetry.observe("BatchLatency", seconds * 1000, "Milliseconds")
+        parsed = [
+            parse_predictions(response=response, start=start, stop=stop)
+            for response in responses
+        ]
+        predictions[start:stop] = np.column_stack(parsed) if fan_out else parsed[0]
+        if cache is not None:
+            # Saved in the background, so the worker is free for the next invocation.
+            for block_start, block_stop in completed_blocks(start=start, stop=stop):
+                saves.append(
+                    writer.submit(
+                        cache.put,
+                        data[block_start:block_stop],
+                        predictions[block_start:block_stop],
+                    )
+                )
+        telemetry.count("Batches")
+        telemetry.count("Rows", stop - start)
+        if on_batch is not None:
+            on_batch(start, stop, predictions[start:stop])
+
+    saves: list[Future] = []
+    with ThreadPoolExecutor(max_workers=max_workers) as writer, ThreadPoolExecutor(
+        max_workers=max_workers
+    ) as executor:
+        # Only plan the next mini-batch when a worker is free, so it is sized from the
+        # latency of the invocations completed so far.
+        in_flight, stopped = set(), False
+        for batch in planned_batches():
+            if should_stop is not None and should_stop():
+                stopped = True
+                break
+            if len(in_flight) >= max_workers:
+                completed, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    future.result()
+            in_flight.add(executor.submit(invoke, batch))
+        # Consume the results, so an error raised by any mini-batch is raised here.
+        for future in in_flight:
+            future.result()
+    for save in saves:
+        save.result()
+
+    if stopped:
+        raise EvaluationIncompleteError(
+            "Stopped before every mini-batch was sent as the invocation is running out of time"
+        )
+    return predictions
+
+
+def merge_ranges(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    :param ranges: start (inclusive) and stop (exclusive) row offsets, in ascending order
+    :return: the same rows, with adjacent ranges joined
+    """
+    merged: list[tuple[int, int]] = []
+    for start, stop in ranges:
+        if merged and merged[-1][1] == start:
+            merged[-1] = (merged[-1][0], stop)
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def parse_predictions(response: bytes, start: int, stop: int) -> np.ndarray:
+    """
+    Parse the comma or newline separated predictions returned by the endpoint for
+    a single mini-batch, checking one prediction was returned for every row sent.
+
+    :param response: raw response body returned by the endpoint
+    :param start: first row offset of the mini-batch
+    :param stop: row offset after the last row of the mini-batch
+    :return: predictions for the mini-batch
+    """
+    values = response.decode("utf-8").replace("\n", ",").split(",")
+    predictions = np.asarray([value for value in values if value.strip()], dtype=float)
+    if predictions.shape[0] != stop - start:
+        raise ValueError(
+            "Endpoint returned {count} predictions for rows {start} to {stop}, expected {expected}".format(
+                count=predictions.shape[0],
+                start=start,
+                stop=stop,
+                expected=stop - start,
+            )
+        )
+    return predictions
+
+
+def predict_with_retry(
+    predictor: Predictor,
+    data: np.ndarray,
+    max_attempts: int = PREDICTION_MAX_ATTEMPTS,
+    base_delay: float = 0.5,
+    max_delay: float = 20.0,
+    telemetry: Telemetry = NULL_TELEMETRY,
+) -> bytes:
+    """
+    Invoke the endpoint with a single mini-batch, retrying with exponential backoff
+    and full jitter when the endpoint is throttling requests. Any other error is raised
+    straight away.
+
     :param predictor: SageMaker Predictor object
-    :param rows: How to split the data
-    :return np.ndarray: collected predictions as a NumPy array
+    :param data: The mini-batch used for invoking.
+    :param max_attempts: Maximum number of attempts before the error is raised
+    :param base_delay: Initial backoff delay in seconds
+    :param max_delay: Upper limit of the backoff delay in seconds
+    :param telemetry: Records the number of throttled attempts
+    :return: raw response body returned by the endpoint
     """
-    split_array = np.array_split(data, int(data.shape[0] / float(rows) + 1))
-    predictions = ""
-    # Loop through each row in the file and use as a payload to the endpoint
-    # https://sagemaker.readthedocs.io/en/stable/api/inference/predictors.html#sagemaker.predictor.Predictor.predict
-    for array in split_array:
-        predictions = ",".join([predictions, predictor.predict(array).decode("utf-8")])
+    return call_with_retry(
+        functools.partial(predictor.predict, data),
+        max_attempts=max_attempts,
+        base_delay=base_delay,
+        max_delay=max_delay,
+        telemetry=telemetry,
+    )
 
-    return np.fromstring(predictions[1:], sep=",")
 
+def call_with_retry(
+    call: Callable[[], bytes],
+    max_attempts: int = PREDICTION_MAX_ATTEMPTS,
+    base_delay: float = 0.5,
+    max_delay: float = 20.0,
+    telemetry: Telemetry = NULL_TELEMETRY,
+) -> bytes:
+    """
+    Invoke an endpoint, retrying with exponential backoff and full jitter when the
+    endpoint is throttling requests. Any other error is raised straight away.
 
-def get_parameter_store_value(
-    name: str, client: Any = boto3.client(service_name="ssm", region_name=aws_region)
-) -> str:
+    :param call: Invokes the endpoint, returning the raw response body
+    :param max_attempts: Maximum number of attempts before the error is raised
+    :param base_delay: Initial backoff delay in seconds
+    :param max_delay: Upper limit of the backoff delay in seconds
+    :param telemetry: Records the number of throttled attempts
+    :return: raw response body returned by the endpoint
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return call()
+        except ClientError as error:
+            if not is_throttling_error(error):
+                raise
+            telemetry.count("Throttles")
+            if attempt == max_attempts:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2**attempt))
+            logger.warning(
+                "Endpoint throttled mini-batch (attempt %s of %s), retrying in %.2f seconds",
+                attempt,
+                max_attempts,
+                delay,
+            )
+            time.sleep(delay)
+
+
+def is_throttling_error(error: ClientError) -> bool:
+    """
+    Check if the error returned when invoking the endpoint was caused by throttling,
+    either by SageMaker itself or by the model container responding with a 429.
+
+    :param error: error raised by the boto3 client
+    :return: True if the request can be retried
+    """
+    error_code = error.response.get("Error", {}).get("Code")
+    if error_code == "ThrottlingException":
+        return True
+    return (
+        error_code == "ModelError" and error.response.get("OriginalStatusCode") == 429
+    )
+
+
+def get_parameter_store_value(name: str, client: Any = None) -> str:
     """
-    Get a parameter store value from AWS.
+    Get a parameter store value from AWS, cached for warm invocations.
 
     :param name: The name or Amazon Resource Name (ARN) of the parameter that you want to query
-    :param client: boto3 client configured to use ssm
+    :param client: boto3 client configured to use ssm, created on first use if not provided
     :return: value
     """
-    logger.info("Retrieving %s from parameter store", name)
-    return client.get_parameter(Name=name, WithDecryption=True)["Parameter"]["Value"]
+    return parameter_cache.get(name=name, client=client)
 
 
 def calculate_confusion_matrix_metrics(
     true_positive: int, true_negative: int, false_positive: int, false_negative: int
-) -> tuple[float, float, float, float, float]:
+) -> ConfusionMatrixMetrics:
     """
     Calculate quantitative evaluation metrics against machine learning model.
 
@@ -212,21 +1370,16 @@ def calculate_confusion_matrix_metrics(
     :param false_negative: positive class but being classified wrongly as belonging to the negative class.
     :return: calculated accuracy, precision, recall, f1_score, specificity
     """
-    accuracy = (true_negative + true_negative) / (
-        true_positive + false_positive + true_negative + false_negative
+    metrics = metrics_from_counts(
+        true_positive=true_positive,
+        true_negative=true_negative,
+        false_positive=false_positive,
+        false_negative=false_negative,
     )
-    precision = true_positive / (true_positive + false_positive)
-    recall = true_positive / (true_positive + false_negative)
-    f1_score = 2 * (precision * recall) / (precision + recall)
-    specificity = true_negative / (false_positive + true_negative)
 
     logger.info(
         "Model confusion metrics scores, accuracy: %s, precision: %s, recall: %s, F1 score: %s and "
         "specificity: %s",
-        accuracy,
-        precision,
-        recall,
-        f1_score,
-        specificity,
+        *metrics,
     )
-    return accuracy, precision, recall, f1_score, specificity
+    return metrics
@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic import Field, BaseModel
 
 
@@ -13,13 +15,41 @@ class S3Record:
 class SQSRecord:
     """Instantiated record from an SQS Event"""
 
+    def __init__(self, record: dict):
+        self.message_id = record["messageId"]
+        self.body = record["body"]
+        self.event_source = record["eventSource"]
+
+
+class SQSEvent:
+    """Instantiated records from an SQS Event, which can contain more than one message"""
+
     def __init__(self, event: dict):
-        self.message_id = event["Records"][0]["messageId"]
-        self.body = event["Records"][0]["body"]
-        self.event_source = event["Records"][0]["eventSource"]
+        self.records = [SQSRecord(record) for record in event["Records"]]
 
 
 # https://docs.pydantic.dev/latest/api/fields/#pydantic.fields.FieldInfo
+class EvaluationTarget(BaseModel):
+    """Endpoint, or production variant of an endpoint, invoked with the test data."""
+
+    endpointName: str = Field(
+        title="AWS SageMaker endpoint invoked",
+        examples=["tensorflow-training-2023-11-16-20-52-24-381"],
+    )
+    targetVariant: Optional[str] = Field(
+        default=None,
+        title="Production variant invoked, SageMaker decides if not set",
+        examples=["AllTraffic"],
+    )
+
+    @property
+    def label(self) -> str:
+        """Name of the target within reports, e.g. `endpoint-name/variant-name`"""
+        if self.targetVariant:
+            return "{}/{}".format(self.endpointName, self.targetVariant)
+        return self.endpointName
+
+
 class ModelEvalMessage(BaseModel):
     """Message received by lambda function, including location of test data."""
 
@@ -33,3 +63,34 @@ class ModelEvalMessage(BaseModel):
     testDataS3Key: str = Field(
         title="Full path of object within AWS S3 Bucket", examples=["test-data.csv"]
     )
+    testDataFormat: Optional[Literal["csv", "parquet", "arrow"]] = Field(
+        default=None,
+        title="Format of the test data, detected from the file extension if not set",
+        examples=["parquet"],
+    )
+    targetVariant: Optional[str] = Field(
+        default=None,
+        title="Production variant of endpointName invoked, SageMaker decides if not set",
+        examples=["AllTraffic"],
+    )
+    compareWith: list[EvaluationTarget] = Field(
+        default=[],
+        title="Other endpoints or production variants evaluated side by side with the same test data",
+        examples=[
+            [{"endpointName": "candidate-endpoint", "targetVariant": "VariantB"}]
+        ],
+    )
+    sampling: Optional[bool] = Field(
+        default=None,
+        title="Evaluate a stratified sample of the test data, SAMPLING_ENABLED decides if not set",
+        examples=[True],
+    )
+
+    @property
+    def targets(self) -> list[EvaluationTarget]:
+        """Every endpoint or production variant evaluated, endpointName first"""
+        return [
+            EvaluationTarget(
+                endpointName=self.endpointName, targetVariant=self.targetVariant
+            )
+        ] + self.compareWith
@@ -0,0 +1,105 @@
+import logging
+import threading
+import time
+from typing import Any, Iterable, Optional
+
+from clients import get_client
+
+# Configure logging
+logger = logging.getLogger("model-evaluation")
+
+# Maximum number of names accepted by a single GetParameters request
+# https://docs.aws.amazon.com/systems-manager/latest/APIReference/API_GetParameters.html
+GET_PARAMETERS_MAX_NAMES = 10
+
+
+class ParameterCache:
+    """
+    Parameter store values kept in memory for `ttl_seconds`, so warm invocations
+    do not call SSM again for values that rarely change.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        """
+        :param ttl_seconds: Seconds a value is used for before it is retrieved again, 0 disables caching
+        """
+        self.ttl_seconds = ttl_seconds
+        self._values: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, client: Any = None) -> str:
+        """
+        Get a parameter store value, retrieving it from AWS if it is not cached or has expired.
+
+        :param name: The name or Amazon Resource Name (ARN) of the parameter that you want to query
+        :param client: boto3 client configured to use ssm, created on first use if not provided
+        :return: value
+        """
+        value = self._cached_value(name)
+        if value is not None:
+            return value
+
+        if client is None:
+            client = get_client("ssm")
+        logger.info("Retrieving %s from parameter store", name)
+        value = client.get_parameter(Name=name, WithDecryption=True)["Parameter"][
+            "Value"
+        ]
+        self._store(name, value)
+        return value
+
+    def prefetch(self, names: Iterable[str], client: Any = None) -> dict[str, str]:
+        """
+        Retrieve every parameter not already cached with as few GetParameters calls as
+        possible, so a cold start resolves all the parameters it needs in one call.
+        Nothing is retrieved when caching is disabled, as the values would not be kept.
+
+        :param names: The names of the parameters that will be queried
+        :param client: boto3 client configured to use ssm, created on first use if not provided
+        :return: values of the parameters found
+        """
+        if self.ttl_seconds <= 0:
+            return {}
+        names = list(dict.fromkeys(names))
+        missing = [name for name in names if self._cached_value(name) is None]
+        if missing and client is None:
+            client = get_client("ssm")
+
+        for offset in range(0, len(missing), GET_PARAMETERS_MAX_NAMES):
+            batch = missing[offset:][:GET_PARAMETERS_MAX_NAMES]
+            logger.info("Retrieving %s from parameter store", ", ".join(batch))
+            response = client.get_parameters(Names=batch, WithDecryption=True)
+            for parameter in response["Parameters"]:
+                self._store(parameter["Name"], parameter["Value"])
+            if response.get("InvalidParameters"):
+                logger.warning(
+                    "Parameters not found in parameter store: %s",
+                    ", ".join(response["InvalidParameters"]),
+                )
+
+        values = {name: self._cached_value(name) for name in names}
+        return {name: value for name, value in values.items() if value is not None}
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """
+        Remove a value from the cache, so it is retrieved again on next use.
+
+        :param name: Name of the parameter to remove, every parameter is removed if not provided
+        """
+        with self._lock:
+            if name is None:
+                self._values.clear()
+            else:
+                self._values.pop(name, None)
+
+    def _cached_value(self, name: str) -> Optional[str]:
+        cached = self._values.get(name)
+        if cached is None or time.monotonic() >= cached[1]:
+            return None
+        return cached[0]
+
+    def _store(self, name: str, value: str) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._values[name] = (value, time.monotonic() + self.ttl_seconds)
@@ -0,0 +1,213 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, Protocol
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+# Configure logging
+logger = logging.getLogger("model-evaluation")
+
+
+class CacheBackend(Protocol):
+    """Storage for the cached predictions of each mini-batch."""
+
+    def get(self, key: str) -> Optional[bytes]: ...
+
+    def put(self, key: str, value: bytes) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+
+class LocalDiskCacheBackend:
+    """
+    Cached predictions saved as files within a directory, on Lambda these only
+    survive for as long as the execution environment is reused.
+    """
+
+    def __init__(self, directory: str):
+        """
+        :param directory: Directory the cached predictions are saved to
+        """
+        self.directory = directory
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.directory, key), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, value: bytes) -> None:
+        path = os.path.join(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first, so a partially written file is never read.
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), delete=False
+        ) as file:
+            file.write(value)
+        os.replace(file.name, path)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(os.path.join(self.directory, key))
+        except FileNotFoundError:
+            pass
+
+
+class S3CacheBackend:
+    """Cached predictions saved as objects under a prefix within a bucket."""
+
+    def __init__(self, bucket_name: str, prefix: str, client: Any):
+        """
+        :param bucket_name: AWS S3 Bucket name the cached predictions are saved to
+        :param prefix: Key prefix of the cached predictions
+        :param client: boto3 client configured to use s3
+        """
+        self.bucket_name = bucket_name
+        self.prefix = prefix.strip("/")
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket_name, Key=self._object_key(key)
+            )
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        return response["Body"].read()
+
+    def put(self, key: str, value: bytes) -> None:
+        self.client.put_object(
+            Bucket=self.bucket_name, Key=self._object_key(key), Body=value
+        )
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket_name, Key=self._object_key(key))
+
+    def _object_key(self, key: str) -> str:
+        return "{prefix}/{key}".format(prefix=self.prefix, key=key)
+
+
+class PredictionCache:
+    """
+    Predictions of fixed blocks of rows, so a redelivered message only invokes the endpoint
+    for the rows that were not already scored. Blocks do not depend on how the rows are
+    split into mini-batches, which changes with the latency of the endpoint, so the same
+    blocks are found by every attempt. Predictions are cached under a namespace identifying
+    the endpoint configuration and the version of the test data, and found by a hash of
+    the rows in the block.
+    """
+
+    def __init__(self, backend: CacheBackend, namespace: str, block_rows: int = 500):
+        """
+        :param backend: Storage for the cached predictions
+        :param namespace: Identifies the endpoint configuration and test data, see `namespace_for`
+        :param block_rows: Number of rows in each block of cached predictions
+        """
+        self.backend = backend
+        self.namespace = namespace
+        self.block_rows = max(1, block_rows)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def namespace_for(
+        endpoint_name: str,
+        endpoint_config_name: Optional[str],
+        etag: str,
+        version_id: Optional[str] = None,
+    ) -> str:
+        """
+        :param endpoint_name: Endpoint the predictions are made by
+        :param endpoint_config_name: Endpoint configuration, changes when a new model is deployed
+        :param etag: ETag of the test data object
+        :param version_id: Version of the test data object, if versioning is enabled on the bucket
+        :return: namespace the predictions are cached under
+        """
+        identity = "\n".join(
+            [endpoint_name, endpoint_config_name or "", etag, version_id or ""]
+        )
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def batch_key(data: np.ndarray) -> str:
+        """
+        :param data: The block of rows sent to the endpoint
+        :return: hash of the shape, type and contents of the block
+        """
+        data = np.ascontiguousarray(data)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update("{}{}".format(data.shape, data.dtype.str).encode("utf-8"))
+        digest.update(data.data)
+        return digest.hexdigest()
+
+    def blocks(self, total_rows: int) -> list[tuple[int, int]]:
+        """
+        :param total_rows: Number of rows in the data
+        :return: start (inclusive) and stop (exclusive) row offsets of each block
+        """
+        return [
+            (start, min(total_rows, start + self.block_rows))
+            for start in range(0, total_rows, self.block_rows)
+        ]
+
+    def get_many(
+        self, data: np.ndarray, max_workers: int = 1
+    ) -> dict[tuple[int, int], np.ndarray]:
+        """
+        Look up every block of the data at the same time, so the latency of a remote
+        backend is paid once for the data instead of once for each mini-batch.
+
+        :param data: The rows sent to the endpoint
+        :param max_workers: Maximum number of concurrent lookups
+        :return: cached predictions of each block found, by row offsets
+        """
+        blocks = self.blocks(total_rows=data.shape[0])
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            found = list(
+                executor.map(lambda block: self.get(data[slice(*block)]), blocks)
+            )
+        return {
+            block: predictions
+            for block, predictions in zip(blocks, found)
+            if predictions is not None
+        }
+
+    def get(self, data: np.ndarray) -> Optional[np.ndarray]:
+        """
+        :param data: The block of rows sent to the endpoint
+        :return: cached predictions of the block, or None when not cached
+        """
+        value = self.backend.get(self._key(data))
+        predictions = None
+        if value is not None:
+            predictions = np.frombuffer(value, dtype="<f8")
+            # Ignore anything that does not have a prediction for every row.
+            if predictions.shape[0] != data.shape[0]:
+                predictions = None
+        with self._lock:
+            if predictions is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return predictions
+
+    def put(self, data: np.ndarray, predictions: np.ndarray) -> None:
+        """
+        :param data: The block of rows sent to the endpoint
+        :param predictions: predictions returned for the block
+        """
+        self.backend.put(self._key(data), predictions.astype("<f8").tobytes())
+
+    def _key(self, data: np.ndarray) -> str:
+        return "{namespace}/{batch}".format(
+            namespace=self.namespace, batch=self.batch_key(data)
+        )
@@ -0,0 +1,257 @@
+import json
+import logging
+import math
+import os
+from typing import Any, Optional
+
+import numpy as np
+
+from bootstrap import MetricIntervals
+from metrics import CalibrationBins, ConfusionMatrixMetrics, ThresholdCurves
+
+# Configure logging
+logger = logging.getLogger("model-evaluation")
+
+# Content type of each report file, found by its extension
+CONTENT_TYPES = {".md": "text/markdown", ".json": "application/json"}
+
+# Name of each metric with a confidence interval within the report
+INTERVAL_METRIC_NAMES = {
+    "accuracy": "Accuracy",
+    "precision": "Precision",
+    "recall": "Recall",
+    "f1_score": "F1 score",
+    "specificity": "Specificity",
+    "roc_auc": "ROC AUC",
+    "pr_auc": "PR AUC",
+}
+
+
+def report_prefix(endpoint_name: str, today: str) -> str:
+    """
+    :param endpoint_name: Endpoint the predictions were made by
+    :param today: Date of the evaluation as `%Y-%m-%d`
+    :return: key prefix the report files for the evaluation are saved under
+    """
+    return "{today}/predictions/{endpoint_name}".format(
+        today=today, endpoint_name=endpoint_name
+    )
+
+
+def confusion_matrix_markdown(matrix: np.ndarray) -> str:
+    """
+    Format the confusion matrix as a grid table, with actuals as rows and predictions as columns.
+
+    :param matrix: confusion matrix
+    :return: markdown table
+    """
+    # Only imported when used, to keep the cold start import light.
+    import pandas as pd
+
+    classes = pd.RangeIndex(matrix.shape[0])
+    return pd.DataFrame(
+        matrix, index=classes.rename("actuals"), columns=classes.rename("predictions")
+    ).to_markdown(tablefmt="grid")
+
+
+def threshold_metrics_markdown(
+    curves: ThresholdCurves, calibration: CalibrationBins
+) -> str:
+    """
+    Format the metrics found by sweeping every threshold, and the calibration error
+    of the scores, as a grid table.
+
+    :param curves: result of the threshold sweep
+    :param calibration: calibration of the scores
+    :return: markdown table
+    """
+    import pandas as pd
+
+    return pd.DataFrame(
+        {
+            "value": [
+                curves.roc_auc,
+                curves.pr_auc,
+                curves.best_f1_threshold,
+                curves.best_f1_score,
+                calibration.expected_calibration_error,
+            ]
+        },
+        index=pd.Index(
+            [
+                "ROC AUC",
+                "PR AUC",
+                "Best F1 threshold",
+                "Best F1 score",
+                "Expected calibration error",
+            ],
+            name="metric",
+        ),
+    ).to_markdown(tablefmt="grid")
+
+
+def confidence_intervals_markdown(intervals: MetricIntervals, confidence: float) -> str:
+    """
+    Format the bootstrap confidence interval of each metric as a grid table.
+
+    :param intervals: confidence interval of each metric
+    :param confidence: Fraction of resampled values within each interval
+    :return: markdown table
+    """
+    import pandas as pd
+
+    return pd.DataFrame(
+        [list(interval) for interval in intervals],
+        columns=[
+            "estimate",
+            "{:g}% lower".format(confidence * 100),
+            "{:g}% upper".format(confidence * 100),
+        ],
+        index=pd.Index(
+            [INTERVAL_METRIC_NAMES[name] for name in intervals._fields], name="metric"
+        ),
+    ).to_markdown(tablefmt="grid")
+
+
+def comparison_markdown(
+    results: dict[str, tuple[ConfusionMatrixMetrics, ThresholdCurves, CalibrationBins]],
+    intervals: Optional[dict[str, MetricIntervals]] = None,
+) -> str:
+    """
+    Format the metrics of several endpoints or production variants evaluated with the
+    same test data as a grid table, with a column for each. With confidence intervals,
+    a row with the interval of each metric is added, so a difference between targets
+    can be told apart from the noise of the test data.
+
+    :param results: metrics at the threshold, threshold sweep and calibration of each target
+    :param intervals: bootstrap confidence interval of each metric of each target
+    :return: markdown table
+    """
+    import pandas as pd
+
+    names = [
+        "Accuracy",
+        "Precision",
+        "Recall",
+        "F1 score",
+        "Specificity",
+        "ROC AUC",
+        "PR AUC",
+        "Best F1 threshold",
+        "Best F1 score",
+        "Expected calibration error",
+    ]
+    columns = {
+        label: [
+            *metrics,
+            curves.roc_auc,
+            curves.pr_auc,
+            curves.best_f1_threshold,
+            curves.best_f1_score,
+            calibration.expected_calibration_error,
+        ]
+        for label, (metrics, curves, calibration) in results.items()
+    }
+    if intervals:
+        names += [
+            "{} interval".format(INTERVAL_METRIC_NAMES[name])
+            for name in MetricIntervals._fields
+        ]
+        for label in columns:
+            columns[label] += [
+                "[{:.4f}, {:.4f}]".format(interval.lower, interval.upper)
+                for interval in intervals[label]
+            ]
+    return pd.DataFrame(columns, index=pd.Index(names, name="metric")).to_markdown(
+        tablefmt="grid"
+    )
+
+
+def threshold_curves_json(
+    curves: ThresholdCurves,
+    calibration: Optional[CalibrationBins] = None,
+    max_points: int = 1000,
+) -> str:
+    """
+    Serialize the ROC and precision-recall curves, keeping at most `max_points` points
+    evenly spread along the curves, always including the first and last threshold.
+
+    :param curves: result of the threshold sweep
+    :param calibration: calibration of the scores, not saved if not provided
+    :param max_points: maximum number of points saved for each curve
+    :return: JSON document
+    """
+    points = np.unique(
+        np.linspace(0, curves.thresholds.size - 1, num=max_points).round().astype(int)
+    )
+    report = {
+        "roc_auc": finite_or_none(curves.roc_auc),
+        "pr_auc": finite_or_none(curves.pr_auc),
+        "best_f1_threshold": finite_or_none(curves.best_f1_threshold),
+        "best_f1_score": finite_or_none(curves.best_f1_score),
+        "thresholds": curves.thresholds[points].tolist(),
+        "roc": {
+            "false_positive_rate": curves.false_positive_rate[points].tolist(),
+            "true_positive_rate": curves.true_positive_rate[points].tolist(),
+        },
+        "precision_recall": {
+            "precision": curves.precision[points].tolist(),
+            "recall": curves.recall[points].tolist(),
+        },
+    }
+    if calibration is not None:
+        report["calibration"] = {
+            "expected_calibration_error": calibration.expected_calibration_error,
+            "lower_edges": calibration.lower_edges.tolist(),
+            "count": calibration.count.tolist(),
+            # Empty bins have no mean score or positive rate.
+            "mean_score": [finite_or_none(v) for v in calibration.mean_score.tolist()],
+            "positive_rate": [
+                finite_or_none(v) for v in calibration.positive_rate.tolist()
+            ],
+        }
+    return json.dumps(report)
+
+
+def upload_report(
+    bucket_name: str, prefix: str, files: dict[str, str], client: Any
+) -> None:
+    """
+    Save the report files to the bucket under the prefix.
+
+    :param bucket_name: AWS S3 Bucket name the report is saved to
+    :param prefix: Key prefix of the report files
+    :param files: Contents of each file by file name
+    :param client: boto3 client configured to use s3
+    """
+    for name, body in files.items():
+        key = "{prefix}/{name}".format(prefix=prefix, name=name)
+        client.put_object(
+            Bucket=bucket_name,
+            Key=key,
+            Body=body.encode("utf-8"),
+            ContentType=CONTENT_TYPES.get(os.path.splitext(name)[1], "text/plain"),
+        )
+        logger.info("Saved report to s3://%s/%s", bucket_name, key)
+
+
+def save_report(directory: str, files: dict[str, str]) -> None:
+    """
+    Save the report files to a local directory, for evaluations run outside the lambda.
+
+    :param directory: Directory the report files are saved to, created if missing
+    :param files: Contents of each file by file name
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, body in files.items():
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(body)
+        logger.info("Saved report to %s", path)
+
+
+def finite_or_none(value: float):
+    """
+    :return: the value, or None when it is not a finite number, as JSON has no NaN
+    """
+    return value if math.isfinite(value) else None
@@ -0,0 +1,131 @@
+import logging
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from bootstrap import MetricIntervals, bootstrap_intervals
+from metrics import MetricsAccumulator
+
+# Configure logging
+logger = logging.getLogger("model-evaluation")
+
+
+class SequentialSampler:
+    """
+    Evaluate a stratified random sample of the test data instead of every row. A fraction
+    of each class is drawn from every chunk as it is read, so the sample keeps the class
+    balance of the test data, and the evaluation stops once the confidence interval of
+    every target metric is narrower than the tolerance, or the row budget is spent.
+    """
+
+    def __init__(
+        self,
+        fraction: float = 0.1,
+        metrics: Iterable[str] = ("precision", "recall"),
+        tolerance: float = 0.02,
+        max_rows: int = 100000,
+        confidence: float = 0.95,
+        resamples: int = 200,
+        seed: Optional[int] = None,
+        min_rows: int = 1000,
+    ):
+        """
+        :param fraction: Fraction of the rows of each class drawn from every chunk
+        :param metrics: Metrics checked, names of `MetricIntervals` fields
+        :param tolerance: Largest width of the confidence interval of each metric to stop at
+        :param max_rows: Maximum number of rows sampled
+        :param confidence: Fraction of resampled values within each confidence interval
+        :param resamples: Bootstrap resamples used each time the intervals are checked
+        :param seed: Seed of the random number generator, the same seed draws the same rows
+        :param min_rows: Rows sampled before the intervals are checked, as the intervals of
+            a handful of rows can be misleadingly narrow
+        """
+        self.metrics = list(metrics)
+        unknown = set(self.metrics) - set(MetricIntervals._fields)
+        if unknown:
+            raise ValueError(
+                "Unsupported sampling metrics: {}, expected any of {}".format(
+                    sorted(unknown), list(MetricIntervals._fields)
+                )
+            )
+        if not 0 < fraction <= 1:
+            raise ValueError(
+                "Sampling fraction must be within (0, 1], got {}".format(fraction)
+            )
+        self.fraction = fraction
+        self.tolerance = tolerance
+        self.max_rows = max_rows
+        self.confidence = confidence
+        self.resamples = resamples
+        self.seed = seed
+        self.min_rows = min_rows
+        self.sampled_rows = 0
+        self.generator = np.random.default_rng(seed)
+
+    def sample(
+        self, chunks: Iterable[tuple[np.ndarray, np.ndarray]]
+    ) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """
+        Draw a stratified random sample of each chunk, until the row budget is spent.
+
+        :param chunks: features and target variable of each chunk of the test dataset
+        :return: features and target variable of the rows sampled from each chunk
+        """
+        for features, actuals in chunks:
+            if self.sampled_rows >= self.max_rows:
+                return
+            index = self.stratified_index(actuals)[: self.max_rows - self.sampled_rows]
+            self.sampled_rows += index.shape[0]
+            yield features[index], actuals[index]
+
+    def stratified_index(self, actuals: np.ndarray) -> np.ndarray:
+        """
+        :param actuals: actual class of each row of a chunk
+        :return: rows drawn from each class, in a random order so a truncated sample is still random
+        """
+        drawn = []
+        for value in np.unique(actuals):
+            rows = np.flatnonzero(actuals == value)
+            # Round randomly, so small chunks still sample each class at the fraction on average.
+            size = int(
+                np.floor(rows.shape[0] * self.fraction + self.generator.random())
+            )
+            drawn.append(
+                self.generator.choice(
+                    rows, size=min(size, rows.shape[0]), replace=False
+                )
+            )
+        index = np.concatenate(drawn) if drawn else np.zeros(0, dtype=np.intp)
+        return self.generator.permutation(index)
+
+    def is_precise(self, accumulators: list[MetricsAccumulator]) -> bool:
+        """
+        :param accumulators: Metrics of the rows sampled so far, of every endpoint evaluated
+        :return: True when the confidence interval of every target metric is within the tolerance
+        """
+        widths = {}
+        for accumulator in accumulators:
+            if accumulator.rows < max(1, self.min_rows):
+                return False
+            intervals = bootstrap_intervals(
+                score_histogram=accumulator.score_histogram,
+                threshold=accumulator.threshold,
+                resamples=self.resamples,
+                confidence=self.confidence,
+                seed=self.seed,
+            )
+            for name in self.metrics:
+                interval = getattr(intervals, name)
+                width = interval.upper - interval.lower
+                # An undefined interval, such as AUC without positives, is never precise.
+                widths[name] = max(
+                    widths.get(name, 0.0), width if np.isfinite(width) else np.inf
+                )
+        logger.info(
+            "Sampled %s rows, confidence interval widths: %s",
+            self.sampled_rows,
+            ", ".join(
+                "{}: {:.4f}".format(name, width) for name, width in widths.items()
+            ),
+        )
+        return all(width <= self.tolerance for width in widths.values())
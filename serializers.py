@@ -0,0 +1,163 @@
+import io
+
+import numpy as np
+
+# Integral values within this range are formatted using a lookup table
+LOOKUP_TABLE_MAX_SIZE = 1 << 16
+
+# Largest integer a float64 holds exactly, integral values above this are formatted as floats
+MAX_EXACT_INTEGER = 1 << 53
+
+
+class CompactCSVSerializer:
+    """
+    Serialize a NumPy array to CSV, formatting whole columns at a time instead of
+    every value in Python. Integral values are written without a trailing `.0`, so
+    one-hot encoded features are sent as `0,1` instead of `0.0,1.0`.
+    """
+
+    CONTENT_TYPE = "text/csv"
+
+    def serialize(self, data: np.ndarray) -> bytes:
+        """
+        :param data: The mini-batch to serialize
+        :return: The data serialized as CSV rows
+        """
+        return encode_csv(np.asarray(data))
+
+
+class NumpySerializer:
+    """Serialize a NumPy array to the NPY binary format."""
+
+    CONTENT_TYPE = "application/x-npy"
+
+    def serialize(self, data: np.ndarray) -> bytes:
+        """
+        :param data: The mini-batch to serialize
+        :return: The data serialized in the NPY format
+        """
+        buffer = io.BytesIO()
+        # Features may be held with a compact type, the endpoint is always sent float64.
+        np.save(buffer, np.asarray(data, dtype=np.float64), allow_pickle=False)
+        return buffer.getvalue()
+
+
+class RecordIOProtobufSerializer:
+    """
+    Serialize a NumPy array to RecordIO wrapped protobuf records, as accepted by
+    the SageMaker built-in algorithms.
+    """
+
+    CONTENT_TYPE = "application/x-recordio-protobuf"
+
+    def serialize(self, data: np.ndarray) -> bytes:
+        """
+        :param data: The mini-batch to serialize
+        :return: The data serialized as RecordIO-protobuf records
+        """
+        # Only imported when used, as the SageMaker SDK is slow to import.
+        from sagemaker.amazon.common import write_numpy_to_dense_tensor
+
+        buffer = io.BytesIO()
+        write_numpy_to_dense_tensor(buffer, np.atleast_2d(data).astype(np.float32))
+        return buffer.getvalue()
+
+
+# Serializers available for the content types accepted by the endpoint
+SERIALIZERS = {
+    serializer.CONTENT_TYPE: serializer
+    for serializer in [
+        CompactCSVSerializer,
+        NumpySerializer,
+        RecordIOProtobufSerializer,
+    ]
+}
+
+
+def get_serializer(content_type: str):
+    """
+    Get the serializer for the content type the endpoint accepts.
+
+    :param content_type: MIME type of the payload sent to the endpoint
+    :return: serializer instance
+    """
+    if content_type not in SERIALIZERS:
+        raise ValueError(
+            "Unsupported content type: {content_type}, expected one of {supported}".format(
+                content_type=content_type, supported=", ".join(SERIALIZERS)
+            )
+        )
+    return SERIALIZERS[content_type]()
+
+
+def encode_csv(data: np.ndarray) -> bytes:
+    """
+    Format a 2D array as CSV. Each column is formatted into a fixed width byte matrix
+    padded with null bytes, the columns are joined with the separators and then the
+    padding is removed in a single pass.
+
+    :param data: The mini-batch to serialize
+    :return: CSV rows separated by newlines
+    """
+    data = np.atleast_2d(data)
+    if data.size == 0:
+        raise ValueError("Cannot serialize empty array")
+    rows = data.shape[0]
+    separator = np.full((rows, 1), ord(","), dtype=np.uint8)
+
+    parts = []
+    for column in format_columns(data):
+        parts.extend([column, separator])
+    parts[-1] = np.full((rows, 1), ord("\n"), dtype=np.uint8)
+
+    buffer = np.concatenate(parts, axis=1)
+    # The final newline is dropped, matching the SageMaker SDK serializer.
+    return buffer[buffer != 0].tobytes()[:-1]
+
+
+def format_columns(data: np.ndarray) -> list[np.ndarray]:
+    """
+    Format every column of the array as null padded ASCII text. Integral columns
+    are formatted with a lookup table of every integer between the smallest and
+    largest value, other columns use the shortest round trip representation.
+
+    :param data: 2D array to format
+    :return: a `(rows, width)` uint8 matrix per column
+    """
+    if np.issubdtype(data.dtype, np.bool_):
+        data = data.astype(np.int8)
+    if np.issubdtype(data.dtype, np.integer):
+        integral = np.ones(data.shape[1], dtype=bool)
+    else:
+        with np.errstate(invalid="ignore"):
+            integral = np.all(
+                (data == np.trunc(data)) & (np.abs(data) < MAX_EXACT_INTEGER), axis=0
+            )
+
+    table, low = None, 0
+    if integral.any():
+        low, high = int(data[:, integral].min()), int(data[:, integral].max())
+        if high - low < LOOKUP_TABLE_MAX_SIZE:
+            table = as_byte_matrix(np.arange(low, high + 1).astype("S"))
+
+    columns = []
+    for index in range(data.shape[1]):
+        column = data[:, index]
+        if integral[index] and table is not None:
+            # Widened first, so small integer types do not overflow when offset.
+            columns.append(table[column.astype(np.intp) - low])
+        elif integral[index]:
+            columns.append(as_byte_matrix(column.astype(np.int64).astype("S")))
+        else:
+            columns.append(as_byte_matrix(column.astype("S32")))
+    return columns
+
+
+def as_byte_matrix(text: np.ndarray) -> np.ndarray:
+    """
+    View a fixed width bytes array as a matrix with one character per column.
+
+    :param text: 1D array of dtype `S<width>`
+    :return: `(rows, width)` uint8 matrix
+    """
+    return text.view(np.uint8).reshape(text.shape[0], text.dtype.itemsize)
@@ -0,0 +1,82 @@
+import json
+
+import numpy as np
+
+from baseline import BaselineStatistics, ColumnStatistics, KLLSketch
+
+
+def test_kll_sketch_quantiles():
+    values = np.random.default_rng(0).normal(size=200000)
+    sketch = KLLSketch(k=256, seed=0)
+    for chunk in np.array_split(values, 50):
+        sketch.update(chunk)
+
+    q = np.array([0.01, 0.25, 0.5, 0.75, 0.99])
+    estimated = sketch.quantiles(q)
+
+    # Compare ranks, as the rank error is what the sketch bounds.
+    ranks = np.searchsorted(np.sort(values), estimated) / values.shape[0]
+    np.testing.assert_allclose(ranks, q, atol=0.02)
+    assert sum(len(level) for level in sketch.to_dict()["data"]) < 10000
+
+
+def test_column_statistics_merge_matches_numpy():
+    generator = np.random.default_rng(1)
+    values = np.column_stack(
+        [generator.normal(5, 2, size=10000), generator.integers(0, 10, size=10000)]
+    )
+    values[::7, 0] = np.nan
+    statistics = ColumnStatistics(columns=2, seed=0)
+    other = ColumnStatistics(columns=2, seed=0)
+    statistics.update(values[:3000])
+    other.update(values[3000:])
+    statistics.merge(other)
+
+    fractional = statistics.feature_statistics(0, "fractional")["numerical_statistics"]
+    integral = statistics.feature_statistics(1, "integral")["numerical_statistics"]
+
+    assert statistics.inferred_type(0) == "Fractional"
+    assert statistics.inferred_type(1) == "Integral"
+    assert fractional["common"]["num_missing"] == np.isnan(values[:, 0]).sum()
+    np.testing.assert_allclose(fractional["mean"], np.nanmean(values[:, 0]))
+    np.testing.assert_allclose(fractional["std_dev"], np.nanstd(values[:, 0]))
+    np.testing.assert_allclose(integral["sum"], values[:, 1].sum())
+    assert integral["min"] == values[:, 1].min()
+    assert integral["max"] == values[:, 1].max()
+
+
+def test_baseline_statistics_files():
+    generator = np.random.default_rng(2)
+    features = generator.integers(0, 3, size=(1000, 2))
+    actuals = (generator.random(1000) < 0.3).astype(int)
+    predictions = np.column_stack([generator.random(1000), -generator.random(1000)])
+    baseline = BaselineStatistics(seed=0)
+    for index in np.array_split(np.arange(1000), 4):
+        baseline.update(features[index], actuals[index], predictions[index])
+
+    files = baseline.files(["a", "b"], "target", target=1)
+    statistics = json.loads(files["statistics.json"])
+    constraints = json.loads(files["constraints.json"])
+
+    assert baseline.rows == 1000
+    assert statistics["dataset"]["item_count"] == 1000
+    assert [feature["name"] for feature in statistics["features"]] == [
+        "a",
+        "b",
+        "target",
+        "prediction",
+    ]
+    prediction = statistics["features"][-1]["numerical_statistics"]
+    np.testing.assert_allclose(prediction["mean"], predictions[:, 1].mean())
+    buckets = prediction["distribution"]["kll"]["buckets"]
+    assert sum(bucket["count"] for bucket in buckets) == 1000
+    is_non_negative = {
+        feature["name"]: feature["num_constraints"]["is_non_negative"]
+        for feature in constraints["features"]
+    }
+    assert is_non_negative == {
+        "a": True,
+        "b": True,
+        "target": True,
+        "prediction": False,
+    }
@@ -0,0 +1,164 @@
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pytest
+
+import model_evaluation
+from batch_evaluation import (
+    EvaluationRun,
+    SharedSlotPredictor,
+    StubPredictor,
+    evaluate_run,
+    main,
+    read_manifest,
+    report_directories,
+)
+from serializers import CompactCSVSerializer
+
+# Test data with 10 rows
+EXAMPLE_PAYLOAD = os.path.join(os.path.dirname(__file__), "example_payload.csv")
+
+
+def test_read_manifest(tmp_path):
+    manifest = tmp_path / "evaluations.jsonl"
+    manifest.write_text(
+        "\n".join(
+            [
+                json.dumps(
+                    {"endpointName": "incumbent", "testData": "s3://bucket/a.csv"}
+                ),
+                "",
+                json.dumps(
+                    {
+                        "endpointName": "candidate",
+                        "testData": "b.parquet",
+                        "targetVariant": "VariantB",
+                    }
+                ),
+            ]
+        )
+    )
+
+    runs = read_manifest(str(manifest))
+
+    assert runs == [
+        EvaluationRun(endpoint_name="incumbent", test_data="s3://bucket/a.csv"),
+        EvaluationRun(
+            endpoint_name="candidate", test_data="b.parquet", target_variant="VariantB"
+        ),
+    ]
+    assert runs[1].label == "candidate/VariantB"
+
+    manifest.write_text(json.dumps({"endpointName": "incumbent"}))
+    with pytest.raises(ValueError, match="Line 1"):
+        read_manifest(str(manifest))
+
+
+def test_report_directories_are_unique():
+    runs = [
+        EvaluationRun(endpoint_name="unit-test", test_data="2024/test.csv"),
+        EvaluationRun(endpoint_name="unit-test", test_data="2025/test.csv"),
+        EvaluationRun(endpoint_name="other", test_data="2025/test.csv"),
+    ]
+
+    assert report_directories(runs, "reports") == [
+        os.path.join("reports", "unit-test", "test"),
+        os.path.join("reports", "unit-test", "test-1"),
+        os.path.join("reports", "other", "test"),
+    ]
+
+
+def test_stub_predictor_scores_rows_the_same_in_any_batch():
+    data = np.random.default_rng(0).integers(0, 5, size=(100, 4))
+    predictor = StubPredictor(serializer=CompactCSVSerializer())
+
+    scores = np.array(predictor.predict(data).decode().split(","), dtype=float)
+    reversed_scores = np.array(
+        predictor.predict(data[::-1]).decode().split(","), dtype=float
+    )
+
+    np.testing.assert_array_equal(scores, reversed_scores[::-1])
+    assert ((scores >= 0) & (scores < 1)).all()
+    assert np.unique(scores).shape[0] == np.unique(data, axis=0).shape[0]
+
+
+class PayloadRecordingPredictor(StubPredictor):
+    """Offline predictor recording the size of every payload sent."""
+
+    def __init__(self):
+        super().__init__(serializer=CompactCSVSerializer())
+        self.payload_bytes = []
+
+    def predict(self, data: np.ndarray) -> bytes:
+        self.payload_bytes.append(len(self.serializer.serialize(data)))
+        return super().predict(data)
+
+
+def test_shared_slot_predictor_keeps_the_payload_limit(monkeypatch):
+    monkeypatch.setattr(model_evaluation, "ENDPOINT_MAX_PAYLOAD_BYTES", 20000)
+    features = np.random.default_rng(0).random((2000, 50))
+    predictor = PayloadRecordingPredictor()
+
+    model_evaluation.predict_test_data(
+        chunks=[(features, np.zeros(2000, dtype=int))],
+        predictor=SharedSlotPredictor(
+            predictor=predictor, slots=threading.BoundedSemaphore(2)
+        ),
+    )
+
+    assert sum(predictor.payload_bytes) > 20000 * 4
+    assert max(predictor.payload_bytes) <= 20000
+
+
+def test_evaluate_run_returns_failures(tmp_path):
+    result = evaluate_run(
+        run=EvaluationRun(
+            endpoint_name="unit-test", test_data=str(tmp_path / "missing.csv")
+        ),
+        directory=str(tmp_path / "report"),
+        stub=True,
+    )
+
+    assert result.error.startswith("FileNotFoundError")
+    assert result.metrics is None
+    assert not (tmp_path / "report").exists()
+
+
+def test_main_evaluates_every_dataset_offline(tmp_path):
+    directory = tmp_path / "test-data"
+    directory.mkdir()
+    for name in ["2024.csv", "2025.csv"]:
+        shutil.copy(EXAMPLE_PAYLOAD, directory / name)
+    (directory / "README.txt").write_text("Not test data")
+    output = tmp_path / "reports"
+
+    status = main(
+        [
+            "--directory",
+            str(directory),
+            "--endpoint",
+            "unit-test",
+            "--stub",
+            "--processes",
+            "2",
+            "--max-invocations",
+            "2",
+            "--output",
+            str(output),
+        ]
+    )
+
+    assert status == 0
+    for name in ["2024", "2025"]:
+        assert sorted(os.listdir(output / "unit-test" / name)) == [
+            "CURVES.json",
+            "PREDICTIONS.md",
+            "constraints.json",
+            "statistics.json",
+        ]
+    summary = (output / "SUMMARY.md").read_text()
+    assert "2024.csv" in summary and "2025.csv" in summary
+    assert "README.txt" not in summary
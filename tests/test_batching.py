@@ -0,0 +1,35 @@
+import numpy as np
+from sagemaker.serializers import CSVSerializer
+
+from batching import BatchPlanner, split_into_batches
+
+
+def test_split_into_batches_matches_array_split():
+    batches = split_into_batches(total_rows=4119, rows=500)
+
+    expected = np.array_split(np.arange(4119), int(4119 / 500.0 + 1))
+    assert [stop - start for start, stop in batches] == [len(a) for a in expected]
+    assert batches[0][0] == 0 and batches[-1][1] == 4119
+
+
+def test_fit_payload_caps_rows_under_payload_ceiling():
+    data = np.full((1000, 50), 123.456)
+    planner = BatchPlanner(rows=500, max_payload_bytes=10_000)
+
+    max_rows = planner.fit_payload(data=data, serializer=CSVSerializer())
+
+    payload = CSVSerializer().serialize(data[:max_rows])
+    assert max_rows < 500
+    assert len(payload) <= 10_000
+    assert all(stop - start <= max_rows for start, stop in planner.batches(1000))
+
+
+def test_record_adjusts_rows_from_latency():
+    planner = BatchPlanner(rows=100, target_latency=1.0)
+
+    planner.record(rows=100, seconds=0.1)
+    assert planner.rows == 151
+
+    planner.record(rows=151, seconds=2.0)
+    assert planner.rows == 75
+    assert list(planner.batches(200))[:2] == [(0, 75), (75, 150)]
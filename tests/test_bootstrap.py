@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from bootstrap import bootstrap_intervals
+from metrics import MetricsAccumulator
+
+
+@pytest.fixture
+def accumulator() -> MetricsAccumulator:
+    generator = np.random.default_rng(1)
+    actuals = (generator.random(20_000) < 0.12).astype(int)
+    scores = np.clip(generator.normal(0.3 + 0.35 * actuals, 0.2), 0, 1)
+    accumulator = MetricsAccumulator()
+    accumulator.update(actuals=actuals, scores=scores)
+    return accumulator
+
+
+def test_bootstrap_intervals_estimate_the_metrics_of_the_test_data(accumulator):
+    intervals = bootstrap_intervals(accumulator.score_histogram, resamples=200, seed=0)
+
+    curves = accumulator.curves()
+    assert [interval.estimate for interval in intervals[:5]] == pytest.approx(
+        list(accumulator.metrics())
+    )
+    assert intervals.roc_auc.estimate == pytest.approx(curves.roc_auc)
+    assert intervals.pr_auc.estimate == pytest.approx(curves.pr_auc)
+    for interval in intervals:
+        assert interval.lower < interval.estimate < interval.upper
+
+
+def test_bootstrap_intervals_match_resampling_every_row(accumulator):
+    generator = np.random.default_rng(2)
+    rows = accumulator.score_histogram.sum()
+    # Rebuild rows from the histogram, scored at the lower edge of their bin.
+    bins = accumulator.score_histogram.shape[1]
+    actuals = np.repeat([0] * bins + [1] * bins, accumulator.score_histogram.ravel())
+    scores = np.tile(np.arange(bins) / bins, 2).repeat(
+        accumulator.score_histogram.ravel()
+    )
+    recalls = []
+    for _ in range(300):
+        index = generator.integers(0, rows, rows)
+        resampled = MetricsAccumulator()
+        resampled.update(actuals=actuals[index], scores=scores[index])
+        recalls.append(resampled.metrics().recall)
+
+    intervals = bootstrap_intervals(accumulator.score_histogram, resamples=2000, seed=0)
+
+    lower, upper = np.quantile(recalls, [0.025, 0.975])
+    width = upper - lower
+    assert intervals.recall.lower == pytest.approx(lower, abs=width * 0.15)
+    assert intervals.recall.upper == pytest.approx(upper, abs=width * 0.15)
+
+
+def test_bootstrap_intervals_are_reproducible_with_a_seed(accumulator):
+    first = bootstrap_intervals(accumulator.score_histogram, resamples=300, seed=7)
+    second = bootstrap_intervals(accumulator.score_histogram, resamples=300, seed=7)
+
+    assert first == second
+
+
+def test_bootstrap_intervals_without_positives():
+    accumulator = MetricsAccumulator()
+    accumulator.update(actuals=np.zeros(100), scores=np.linspace(0, 1, 100))
+
+    intervals = bootstrap_intervals(accumulator.score_histogram, resamples=50, seed=0)
+
+    assert intervals.recall == (0.0, 0.0, 0.0)
+    assert np.isnan(intervals.roc_auc.lower) and np.isnan(intervals.roc_auc.upper)
@@ -0,0 +1,112 @@
+import numpy as np
+
+from baseline import BaselineStatistics
+from checkpoint import EvaluationCheckpoint, EvaluationProgress
+from metrics import MetricsAccumulator
+from prediction_cache import LocalDiskCacheBackend
+
+
+def test_pending_skips_completed_rows():
+    progress = EvaluationProgress(
+        accumulator=MetricsAccumulator(), completed=[(0, 100), (150, 200)]
+    )
+    progress.record(start=100, stop=120, actuals=np.zeros(20), scores=np.full(20, 0.2))
+
+    assert progress.completed == [(0, 120), (150, 200)]
+    assert progress.pending(offset=0, rows=100) == []
+    assert progress.pending(offset=100, rows=100) == [(20, 50)]
+    assert progress.pending(offset=200, rows=100) == [(0, 100)]
+
+
+def test_checkpoint_round_trip(tmp_path):
+    checkpoint = EvaluationCheckpoint(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)),
+        key="unit-test",
+        interval=0,
+    )
+    progress = checkpoint.load(accumulator=MetricsAccumulator())
+    progress.record(
+        start=0, stop=4, actuals=np.array([0, 1, 1, 0]), scores=[0.1, 0.9, 0.3, 0.6]
+    )
+    assert checkpoint.save(progress)
+
+    restored = checkpoint.load(accumulator=MetricsAccumulator())
+
+    assert restored.completed == [(0, 4)]
+    np.testing.assert_array_equal(
+        restored.accumulator.confusion_matrix, progress.accumulator.confusion_matrix
+    )
+    np.testing.assert_array_equal(
+        restored.accumulator.score_histogram, progress.accumulator.score_histogram
+    )
+
+
+def test_checkpoint_ignored_when_metrics_configured_differently(tmp_path):
+    checkpoint = EvaluationCheckpoint(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)), key="unit-test"
+    )
+    progress = EvaluationProgress(accumulator=MetricsAccumulator(score_bins=10))
+    progress.record(start=0, stop=1, actuals=[1], scores=[0.9])
+    checkpoint.save(progress, force=True)
+
+    restored = checkpoint.load(accumulator=MetricsAccumulator())
+
+    assert restored.completed == []
+    assert restored.accumulator.rows == 0
+
+
+def test_save_waits_for_interval(tmp_path):
+    checkpoint = EvaluationCheckpoint(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)),
+        key="unit-test",
+        interval=60,
+    )
+    progress = EvaluationProgress(accumulator=MetricsAccumulator())
+
+    assert not checkpoint.save(progress)
+    assert checkpoint.save(progress, force=True)
+    assert checkpoint.saves == 1
+
+
+def test_checkpoint_restores_baseline_statistics(tmp_path):
+    checkpoint = EvaluationCheckpoint(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)), key="unit-test"
+    )
+    features = np.arange(8, dtype=float).reshape(4, 2)
+    progress = checkpoint.load(
+        accumulator=MetricsAccumulator(), baseline=BaselineStatistics(seed=0)
+    )
+    progress.record(
+        start=0,
+        stop=4,
+        actuals=np.array([0, 1, 1, 0]),
+        scores=np.array([0.1, 0.9, 0.3, 0.6]),
+        features=features,
+    )
+    checkpoint.save(progress, force=True)
+
+    restored = checkpoint.load(
+        accumulator=MetricsAccumulator(), baseline=BaselineStatistics(seed=0)
+    )
+
+    assert restored.baseline.rows == 4
+    assert restored.baseline.files(["a", "b"], "y_yes") == progress.baseline.files(
+        ["a", "b"], "y_yes"
+    )
+
+
+def test_checkpoint_ignored_without_baseline_statistics(tmp_path):
+    checkpoint = EvaluationCheckpoint(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)), key="unit-test"
+    )
+    progress = EvaluationProgress(accumulator=MetricsAccumulator())
+    progress.record(start=0, stop=1, actuals=[1], scores=[0.9])
+    checkpoint.save(progress, force=True)
+
+    # The statistics would otherwise be missing the rows evaluated before the checkpoint.
+    restored = checkpoint.load(
+        accumulator=MetricsAccumulator(), baseline=BaselineStatistics()
+    )
+
+    assert restored.completed == []
+    assert restored.baseline.rows == 0
@@ -0,0 +1,60 @@
+import threading
+
+import boto3
+import pytest
+
+import clients
+from clients import get_client
+
+
+@pytest.fixture(autouse=True)
+def empty_registry(monkeypatch):
+    monkeypatch.setattr(clients, "registry", {})
+
+
+def test_get_client_applies_connection_pool_configuration(monkeypatch):
+    monkeypatch.setattr(clients, "BOTO_MAX_POOL_CONNECTIONS", 64)
+    monkeypatch.setattr(clients, "BOTO_READ_TIMEOUT", 30.0)
+    monkeypatch.setattr(clients, "BOTO_RETRY_MODE", "adaptive")
+
+    config = get_client("sagemaker").meta.config
+
+    assert config.max_pool_connections == 64
+    assert config.read_timeout == 30.0
+    assert config.tcp_keepalive is True
+    assert config.retries == {"mode": "adaptive", "total_max_attempts": 3}
+    assert config.region_name == clients.aws_region
+
+
+def test_runtime_client_leaves_retries_to_the_evaluation():
+    config = get_client("sagemaker-runtime").meta.config
+
+    assert config.retries == {"mode": "standard", "total_max_attempts": 1}
+    assert config.max_pool_connections == clients.BOTO_MAX_POOL_CONNECTIONS
+
+
+def test_get_client_creates_each_client_once(monkeypatch):
+    created = []
+    create_client = boto3.session.Session.client
+
+    def client(session, **kwargs):
+        created.append(kwargs["service_name"])
+        return create_client(session, **kwargs)
+
+    monkeypatch.setattr(boto3.session.Session, "client", client)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def get() -> None:
+        barrier.wait()
+        results.append(get_client("s3"))
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert created == ["s3"]
+    assert all(result is results[0] for result in results)
+    assert get_client("ssm") is not results[0]
@@ -0,0 +1,236 @@
+import io
+import os
+import tracemalloc
+
+import botocore.session
+import numpy as np
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+
+import dataset
+from dataset import (
+    TARGET_COLUMN,
+    column_dtype,
+    detect_test_data_format,
+    open_test_data,
+    prefetch,
+    read_test_data_chunks,
+)
+from serializers import encode_csv
+
+EXAMPLE_PAYLOAD = os.path.join(os.path.dirname(__file__), "example_payload.csv")
+
+
+def example_get_object_response():
+    with open(EXAMPLE_PAYLOAD, "rb") as file:
+        body = file.read()
+    return {
+        "Body": StreamingBody(io.BytesIO(body), len(body)),
+        "ContentLength": len(body),
+        "ETag": '"3858f62230ac3c915f300c664312c11f"',
+    }
+
+
+def test_read_test_data_chunks():
+    s3_client = botocore.session.get_session().create_client("s3")
+    stubber = Stubber(s3_client)
+    stubber.add_response(
+        "get_object",
+        example_get_object_response(),
+        {"Bucket": "unit-test", "Key": "test.csv"},
+    )
+
+    with stubber:
+        response = open_test_data(
+            bucket_name="unit-test", key="test.csv", client=s3_client
+        )
+        feature_names = []
+        chunks = list(
+            read_test_data_chunks(
+                body=response["Body"], chunk_rows=4, feature_names=feature_names
+            )
+        )
+
+    assert [features.shape for features, _ in chunks] == [(4, 59), (4, 59), (2, 59)]
+    assert np.concatenate([actuals for _, actuals in chunks]).sum() == 3
+    assert len(feature_names) == 59 and TARGET_COLUMN not in feature_names
+    assert chunks[0][0][0, :3].tolist() == [25, 1, 999]
+
+
+class ExampleS3Client:
+    """S3 client serving ranged get object requests from an in-memory object."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.ranges = []
+
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        return {"ContentLength": len(self.body), "ETag": '"unit-test"'}
+
+    def get_object(self, Bucket: str, Key: str, Range: str, IfMatch: str) -> dict:
+        start, end = [int(value) for value in Range.removeprefix("bytes=").split("-")]
+        self.ranges.append((start, end))
+        data = self.body[start:][: end - start + 1]
+        return {"Body": StreamingBody(io.BytesIO(data), len(data))}
+
+
+def example_columnar_body(test_data_format: str) -> bytes:
+    import pandas as pd
+
+    frame = pd.read_csv(EXAMPLE_PAYLOAD, index_col=0)
+    buffer = io.BytesIO()
+    if test_data_format == "parquet":
+        frame.to_parquet(buffer, row_group_size=4)
+    else:
+        frame.to_feather(buffer, chunksize=4)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("test_data_format", ["parquet", "arrow"])
+def test_read_columnar_test_data_chunks(test_data_format):
+    with open(EXAMPLE_PAYLOAD, "rb") as file:
+        expected = list(read_test_data_chunks(body=file, chunk_rows=4))
+    s3_client = ExampleS3Client(example_columnar_body(test_data_format))
+
+    response = open_test_data(
+        bucket_name="unit-test",
+        key="test",
+        client=s3_client,
+        test_data_format=test_data_format,
+    )
+    chunks = list(
+        read_test_data_chunks(
+            body=response["Body"], chunk_rows=4, test_data_format=test_data_format
+        )
+    )
+
+    assert response["ETag"] == '"unit-test"'
+    assert [features.shape for features, _ in chunks] == [(4, 59), (4, 59), (2, 59)]
+    for (features, actuals), (expected_features, expected_actuals) in zip(
+        chunks, expected
+    ):
+        np.testing.assert_array_equal(features, expected_features)
+        np.testing.assert_array_equal(actuals, expected_actuals)
+    assert all(end < len(s3_client.body) for _, end in s3_client.ranges)
+
+
+def test_column_dtype():
+    assert column_dtype(np.array([0.0, 1.0, 1.0])) == np.int8
+    assert column_dtype(np.array([18, 95, 999])) == np.int16
+    assert column_dtype(np.array([0.5, 1.25, np.nan])) == np.float32
+    assert column_dtype(np.array([0.1, 0.2])) == np.float64
+    assert column_dtype(np.array([True, False])) == np.int8
+    assert column_dtype(np.array([18, 95]), headroom=2) == np.int16
+
+
+@pytest.mark.parametrize("test_data_format", ["csv", "parquet"])
+def test_read_test_data_chunks_plans_one_dtype_per_column(
+    monkeypatch, test_data_format
+):
+    import pandas as pd
+
+    monkeypatch.setattr(dataset, "DTYPE_SAMPLE_ROWS", 4)
+    frame = pd.DataFrame(
+        {
+            "age": [25, 40, 33, 61, 70, 52, 18, 95],
+            "balance": [0.5, 1.25, 2.0, 0.75, 1.0, 2.0, 3.0, 4.0],
+            "y_no": [1, 0, 1, 1, 0, 1, 1, 0],
+            "y_yes": [0, 1, 0, 0, 1, 0, 0, 1],
+        }
+    )
+    buffer = io.BytesIO()
+    if test_data_format == "csv":
+        frame.to_csv(buffer)
+    else:
+        frame.to_parquet(buffer)
+    buffer.seek(0)
+
+    chunks = list(
+        read_test_data_chunks(
+            body=buffer, chunk_rows=4, test_data_format=test_data_format
+        )
+    )
+
+    # The second chunk only has whole numbers, but is planned from the first rows.
+    assert [features.dtype for features, _ in chunks] == [np.float32, np.float32]
+    assert [actuals.dtype for _, actuals in chunks] == [np.int8, np.int8]
+    np.testing.assert_array_equal(
+        np.concatenate([features for features, _ in chunks]),
+        frame[["age", "balance"]].to_numpy(),
+    )
+
+
+def test_read_columnar_test_data_chunks_rejects_values_beyond_the_plan(monkeypatch):
+    import pandas as pd
+
+    monkeypatch.setattr(dataset, "DTYPE_SAMPLE_ROWS", 2)
+    frame = pd.DataFrame({"count": [1, 2, 3, 300], "y_yes": [0, 1, 0, 1]})
+    buffer = io.BytesIO()
+    frame.to_parquet(buffer)
+    buffer.seek(0)
+
+    with pytest.raises(ValueError, match="300 not in range"):
+        list(
+            read_test_data_chunks(body=buffer, chunk_rows=2, test_data_format="parquet")
+        )
+
+
+def test_read_test_data_chunks_peak_memory():
+    rows, one_hot_columns = 50_000, 55
+    generator = np.random.default_rng(0)
+    actuals = generator.integers(0, 2, rows)
+    data = np.column_stack(
+        [
+            np.arange(rows),
+            generator.integers(18, 96, rows),
+            generator.choice([999, 3], rows),
+            generator.integers(0, 2, (rows, one_hot_columns)),
+            1 - actuals,
+            actuals,
+        ]
+    )
+    header = ",".join(
+        ["", "age", "pdays"]
+        + ["one_hot_{}".format(index) for index in range(one_hot_columns)]
+        + ["y_no", "y_yes"]
+    )
+    body = io.BytesIO(header.encode("utf-8") + b"\n" + encode_csv(data))
+    # Imported before tracing starts, so only the memory used reading is counted.
+    import pandas  # noqa: F401
+
+    tracemalloc.start()
+    try:
+        chunks = list(read_test_data_chunks(body=body, chunk_rows=2_000))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    features = np.concatenate([features for features, _ in chunks])
+    assert features.shape == (rows, one_hot_columns + 2)
+    assert features.dtype == np.int16
+    np.testing.assert_array_equal(features, data[:, 1:-2])
+    np.testing.assert_array_equal(np.concatenate([y for _, y in chunks]), actuals)
+    # Holding every chunk takes less than half of the same features as float64.
+    assert peak < rows * (one_hot_columns + 2) * 8 / 2
+
+
+def test_detect_test_data_format():
+    assert detect_test_data_format("data/test.csv") == "csv"
+    assert detect_test_data_format("data/test.PARQUET") == "parquet"
+    assert detect_test_data_format("data/test.arrow") == "arrow"
+    assert detect_test_data_format("data/test") == "csv"
+    assert detect_test_data_format("data/test.csv", declared="parquet") == "parquet"
+
+
+def test_prefetch_keeps_order_and_raises_errors():
+    def chunks():
+        yield from range(5)
+        raise RuntimeError("unit-test")
+
+    results = []
+    with pytest.raises(RuntimeError, match="unit-test"):
+        for item in prefetch(chunks(), depth=2):
+            results.append(item)
+
+    assert results == [0, 1, 2, 3, 4]
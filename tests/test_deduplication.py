@@ -0,0 +1,38 @@
+import numpy as np
+
+from deduplication import row_hashes, row_words, unique_rows
+
+
+def test_unique_rows_scatter_back_to_every_row():
+    generator = np.random.default_rng(0)
+    data = generator.integers(0, 2, (5000, 12)).astype(np.int8)
+
+    index, inverse = unique_rows(data)
+
+    assert index.shape[0] == np.unique(data, axis=0).shape[0]
+    np.testing.assert_array_equal(data[index][inverse], data)
+    # Unique rows are kept in the order they first appear.
+    assert np.all(np.diff(index) > 0)
+    assert index[0] == 0
+
+
+def test_unique_rows_compares_rows_sharing_a_hash(monkeypatch):
+    data = np.array([[1.0, 2.0], [3.0, 4.0], [1.0, 2.0], [np.nan, 0.0], [np.nan, 0.0]])
+    # Every row has the same hash, so only comparing the rows separates them.
+    monkeypatch.setattr(
+        "deduplication.row_hashes", lambda words: np.zeros(words.shape[0], np.uint64)
+    )
+
+    index, inverse = unique_rows(data)
+
+    np.testing.assert_array_equal(data[index][inverse], data)
+    assert index.tolist() == [0, 1, 3, 4]
+
+
+def test_row_hashes_differ_by_position():
+    data = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 0, 0]], dtype=np.int16)
+
+    hashes = row_hashes(row_words(data))
+
+    assert len(set(hashes[:3].tolist())) == 3
+    assert hashes[0] == hashes[3]
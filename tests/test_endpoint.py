@@ -0,0 +1,100 @@
+import io
+import os
+import subprocess
+import sys
+
+import botocore.session
+import numpy as np
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+
+from endpoint import FanOutPredictor, RuntimePredictor
+from serializers import CompactCSVSerializer
+
+
+def test_runtime_predictor_invokes_endpoint():
+    runtime_client = botocore.session.get_session().create_client("sagemaker-runtime")
+    stubber = Stubber(runtime_client)
+    stubber.add_response(
+        "invoke_endpoint",
+        {"Body": StreamingBody(io.BytesIO(b"0.1,0.9"), 7), "ContentType": "text/csv"},
+        {
+            "EndpointName": "endpoint-name",
+            "ContentType": "text/csv",
+            "Accept": "*/*",
+            "Body": b"1,0\n0,1",
+            "TargetVariant": "variant-name",
+        },
+    )
+    predictor = RuntimePredictor(
+        endpoint_name="endpoint-name",
+        serializer=CompactCSVSerializer(),
+        client=runtime_client,
+        target_variant="variant-name",
+    )
+
+    with stubber:
+        assert predictor.predict(np.array([[1.0, 0.0], [0.0, 1.0]])) == b"0.1,0.9"
+
+
+def test_import_does_not_load_sagemaker_sdk():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, model_evaluation; print(sorted({'sagemaker', 'pandas', 'boto3'} & set(sys.modules)))",
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+class CountingSerializer(CompactCSVSerializer):
+    """Serializer counting the mini-batches serialized."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def serialize(self, data: np.ndarray) -> bytes:
+        self.calls += 1
+        return super().serialize(data)
+
+
+class RecordingRuntimeClient:
+    """sagemaker-runtime client recording every request, responding with the endpoint name."""
+
+    def __init__(self):
+        self.requests = []
+
+    def invoke_endpoint(self, **request) -> dict:
+        self.requests.append(request)
+        return {"Body": io.BytesIO(request["EndpointName"].encode("utf-8"))}
+
+
+def test_fan_out_predictor_serializes_each_mini_batch_once():
+    serializer, client = CountingSerializer(), RecordingRuntimeClient()
+    predictors = [
+        RuntimePredictor(
+            endpoint_name=endpoint_name,
+            serializer=serializer,
+            client=client,
+            target_variant=target_variant,
+        )
+        for endpoint_name, target_variant in [("a", None), ("b", "v1"), ("b", "v2")]
+    ]
+
+    with FanOutPredictor(predictors=predictors) as predictor:
+        responses = predictor.predict(np.array([[1.0, 0.0], [0.0, 1.0]]))
+
+    assert responses == [b"a", b"b", b"b"]
+    assert serializer.calls == 1
+    assert {request["Body"] for request in client.requests} == {b"1,0\n0,1"}
+    assert sorted(request.get("TargetVariant", "") for request in client.requests) == [
+        "",
+        "v1",
+        "v2",
+    ]
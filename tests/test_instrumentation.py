@@ -0,0 +1,78 @@
+import json
+
+from instrumentation import EMF_MAX_VALUES, NULL_TELEMETRY, Telemetry
+
+
+def test_emf_document():
+    telemetry = Telemetry(namespace="unit-test", dimensions={"EndpointName": "test"})
+    telemetry.set_property("MessageId", "1")
+    with telemetry.span("EvaluationTime"):
+        telemetry.count("Rows", 10)
+        telemetry.count("Rows", 5)
+    telemetry.count("PayloadBytes", 100, "Bytes")
+    telemetry.observe("BatchLatency", 12.5, "Milliseconds")
+
+    document = telemetry.emf(timestamp=1700000000)
+
+    assert document["_aws"] == {
+        "Timestamp": 1700000000000,
+        "CloudWatchMetrics": [
+            {
+                "Namespace": "unit-test",
+                "Dimensions": [["EndpointName"]],
+                "Metrics": [
+                    {"Name": "BatchLatency", "Unit": "Milliseconds"},
+                    {"Name": "EvaluationTime", "Unit": "Milliseconds"},
+                    {"Name": "PayloadBytes", "Unit": "Bytes"},
+                    {"Name": "Rows", "Unit": "Count"},
+                ],
+            }
+        ],
+    }
+    assert document["EndpointName"] == "test"
+    assert document["MessageId"] == "1"
+    assert document["Rows"] == 15
+    assert document["BatchLatency"] == [12.5]
+    assert document["EvaluationTime"] >= 0
+
+
+def test_emf_values_are_limited():
+    telemetry = Telemetry(namespace="unit-test", dimensions={})
+    for value in range(1000):
+        telemetry.observe("BatchLatency", value, "Milliseconds")
+
+    values = telemetry.emf()["BatchLatency"]
+
+    assert len(values) == EMF_MAX_VALUES
+    assert values[0] == 0
+    assert values[-1] == 999
+
+
+def test_timed_iterable():
+    telemetry = Telemetry(namespace="unit-test", dimensions={})
+
+    assert list(telemetry.timed("ReadTime", iter([1, 2, 3]))) == [1, 2, 3]
+    assert "ReadTime" in telemetry.emf()
+
+
+def test_flush_writes_single_line(capsys):
+    telemetry = Telemetry(namespace="unit-test", dimensions={"EndpointName": "test"})
+    telemetry.count("Batches")
+
+    telemetry.flush()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["Batches"] == 1
+
+
+def test_null_telemetry_writes_nothing(capsys):
+    with NULL_TELEMETRY.span("EvaluationTime"):
+        NULL_TELEMETRY.count("Rows", 10)
+    NULL_TELEMETRY.observe("BatchLatency", 1, "Milliseconds")
+
+    NULL_TELEMETRY.flush()
+
+    assert capsys.readouterr().out == ""
+    assert NULL_TELEMETRY.totals == {}
+    assert NULL_TELEMETRY.values == {}
@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+from metrics import (
+    MetricsAccumulator,
+    binary_counts,
+    confusion_matrix,
+    metrics_from_counts,
+    predicted_classes,
+)
+
+
+def test_confusion_matrix_counts_every_combination():
+    actuals = np.array([0.0, 0.0, 1.0, 1.0, 1.0, 2.0])
+    predictions = np.array([0, 1, 1, 1, 0, 1])
+
+    matrix = confusion_matrix(actuals=actuals, predictions=predictions)
+
+    np.testing.assert_array_equal(matrix, [[1, 1, 0], [1, 2, 0], [0, 1, 0]])
+    assert binary_counts(matrix, positive_class=1) == (2, 1, 2, 1)
+
+
+def test_confusion_matrix_with_absent_class():
+    scores = np.array([0.1, 0.2, 0.49, 0.3])
+
+    matrix = confusion_matrix(
+        actuals=np.array([0, 1, 1, 0]), predictions=predicted_classes(scores)
+    )
+
+    np.testing.assert_array_equal(matrix, [[2, 0], [2, 0]])
+    assert binary_counts(matrix) == (0, 2, 0, 2)
+
+
+def test_confusion_matrix_rejects_nan_actuals():
+    with pytest.raises(ValueError, match=r"Actuals .* got \[nan\]"):
+        confusion_matrix(
+            actuals=np.array([0.0, np.nan, 1.0]), predictions=np.array([0, 1, 1])
+        )
+
+
+def test_accumulator_rejects_actuals_out_of_range():
+    accumulator = MetricsAccumulator(num_classes=2)
+
+    with pytest.raises(ValueError, match=r"from 0 to 1, got \[2.0, 3.0\]"):
+        accumulator.update(
+            actuals=np.array([0, 2, 1, 3]), scores=np.array([0.1, 0.9, 0.8, 0.2])
+        )
+    assert accumulator.rows == 0
+
+
+def test_metrics_from_counts():
+    metrics = metrics_from_counts(
+        true_positive=101, true_negative=3583, false_positive=53, false_negative=382
+    )
+
+    assert metrics.accuracy == (101 + 3583) / 4119
+    assert metrics.precision == 101 / 154
+    assert metrics.recall == 101 / 483
+    assert np.isclose(
+        metrics.f1_score,
+        2 * metrics.precision * metrics.recall / (metrics.precision + metrics.recall),
+    )
+    assert metrics.specificity == 3583 / 3636
+
+
+def test_metrics_from_counts_without_positive_predictions():
+    metrics = metrics_from_counts(
+        true_positive=0, true_negative=10, false_positive=0, false_negative=0
+    )
+
+    assert metrics == (1.0, 0.0, 0.0, 0.0, 1.0)
+
+
+def test_metrics_accumulator_curves_match_confusion_matrix_per_threshold():
+    rng = np.random.default_rng(seed=0)
+    actuals = (rng.random(2000) < 0.12).astype(float)
+    # Scores in the middle of each bin, so every threshold separates the same rows.
+    scores = (
+        np.floor(np.clip(rng.normal(0.3 + 0.3 * actuals, 0.2), 0, 0.999) * 100) + 0.5
+    ) / 100
+    accumulator = MetricsAccumulator(score_bins=1000)
+    accumulator.update(actuals=actuals, scores=scores)
+
+    curves = accumulator.curves()
+
+    # Compare against the counts of a confusion matrix created for every threshold.
+    counts = [
+        binary_counts(confusion_matrix(actuals, predicted_classes(scores, threshold)))
+        for threshold in curves.thresholds
+    ]
+    true_positive = np.array([count.true_positive for count in counts])
+    false_positive = np.array([count.false_positive for count in counts])
+    np.testing.assert_allclose(curves.recall, true_positive / actuals.sum())
+    np.testing.assert_allclose(
+        curves.false_positive_rate, false_positive / (actuals == 0).sum()
+    )
+    f1_scores = 2 * true_positive / (true_positive + false_positive + actuals.sum())
+    assert curves.best_f1_threshold == curves.thresholds[np.argmax(f1_scores)]
+    assert curves.best_f1_score == f1_scores.max()
+    # The best threshold is the lower edge of a bin, below the scores within it.
+    assert curves.best_f1_threshold * 1000 == int(curves.best_f1_threshold * 1000)
+
+    # ROC AUC is the probability a positive is scored above a negative.
+    positives, negatives = scores[actuals == 1], scores[actuals == 0]
+    pairs = positives[:, None] - negatives[None, :]
+    assert np.isclose(curves.roc_auc, np.mean((pairs > 0) + 0.5 * (pairs == 0)))
+
+
+def test_metrics_accumulator_curves_with_one_class():
+    accumulator = MetricsAccumulator()
+    accumulator.update(actuals=np.zeros(3), scores=np.array([0.1, 0.2, 0.3]))
+
+    curves = accumulator.curves()
+
+    assert np.isnan(curves.roc_auc) and np.isnan(curves.pr_auc)
+    assert curves.best_f1_score == 0.0
+
+
+def test_metrics_accumulator_matches_full_evaluation():
+    rng = np.random.default_rng(seed=0)
+    actuals = (rng.random(5000) < 0.12).astype(float)
+    scores = rng.random(5000)
+    accumulator = MetricsAccumulator(score_bins=1000)
+    expected = MetricsAccumulator(score_bins=1000)
+
+    for batch in np.array_split(np.arange(5000), 7):
+        accumulator.update(actuals=actuals[batch], scores=scores[batch])
+    expected.update(actuals=actuals, scores=scores)
+
+    curves = accumulator.curves()
+    np.testing.assert_array_equal(
+        accumulator.confusion_matrix,
+        confusion_matrix(actuals, predicted_classes(scores)),
+    )
+    np.testing.assert_array_equal(accumulator.score_histogram, expected.score_histogram)
+    assert curves.roc_auc == expected.curves().roc_auc
+    assert curves.best_f1_threshold == expected.curves().best_f1_threshold
+
+
+def test_metrics_accumulator_calibration():
+    accumulator = MetricsAccumulator(calibration_bins=2)
+
+    accumulator.update(
+        actuals=np.array([0, 0, 1, 1, 1]), scores=np.array([0.1, 0.3, 0.2, 0.8, 1.0])
+    )
+
+    calibration = accumulator.calibration_bins()
+    assert calibration.count.tolist() == [3, 2]
+    np.testing.assert_allclose(calibration.mean_score, [0.2, 0.9])
+    np.testing.assert_allclose(calibration.positive_rate, [1 / 3, 1.0])
+    assert np.isclose(calibration.expected_calibration_error, (0.4 + 0.2) / 5)
@@ -1,5 +1,14 @@
-import botocore
+import io
+import os
+import random
+import time
+
+import boto3
+import botocore.session
+import numpy as np
 import pytest
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
 from botocore.stub import Stubber, ANY
 
 from example_responses import (
@@ -7,22 +16,249 @@ from example_responses import (
     example_describe_training_job_statuses,
     example_parameters_response,
 )
+import clients
+import model_evaluation
+from baseline import BaselineStatistics
+from checkpoint import EvaluationCheckpoint
+from exceptions import EndpointNotReadyError, EvaluationIncompleteError
+from instrumentation import Telemetry
 from model_evaluation import (
+    create_fan_out_predictor,
+    create_predictor,
     lambda_handler,
     wait_endpoint_status_in_service,
     get_parameter_store_value,
+    perform_predictions,
+    predict_test_data,
+    predict_with_retry,
+    parse_predictions,
 )
+from models import EvaluationTarget
+from prediction_cache import LocalDiskCacheBackend, PredictionCache
+
+
+# Test data with 10 rows
+EXAMPLE_PAYLOAD = os.path.join(os.path.dirname(__file__), "example_payload.csv")
+
+
+@pytest.fixture(autouse=True)
+def clear_warm_invocation_caches():
+    model_evaluation.in_service_endpoints.clear()
+    model_evaluation.sdk_predictors.clear()
+    model_evaluation.parameter_cache.invalidate()
+
+
+class ExampleContext:
+    """Lambda context object with a fixed remaining time."""
+
+    def __init__(self, remaining_time_in_millis: int):
+        self.remaining_time_in_millis = remaining_time_in_millis
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_time_in_millis
+
+
+class ExamplePredictor:
+    """
+    Predictor returning the first column of each row as the prediction,
+    responding after a random delay so mini-batches complete out of order.
+    """
+
+    def __init__(self, errors: list = None):
+        self.errors = errors or []
+        self.calls = 0
+
+    def predict(self, data: np.ndarray) -> bytes:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        time.sleep(random.uniform(0, 0.01))
+        return ",".join(str(value) for value in data[:, 0]).encode("utf-8")
+
+
+class RowCountingPredictor(ExamplePredictor):
+    """Predictor counting the rows sent to the endpoint."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = 0
 
+    def predict(self, data: np.ndarray) -> bytes:
+        self.rows += data.shape[0]
+        return super().predict(data)
 
-@pytest.mark.skip(reason="skipping until implementation flow is completed")
-def test_lambda_handler():
+
+def throttling_error(code: str = "ThrottlingException", status_code: int = None):
+    response = {"Error": {"Code": code, "Message": "unit-test"}}
+    if status_code is not None:
+        response["OriginalStatusCode"] = status_code
+    return ClientError(response, "InvokeEndpoint")
+
+
+def test_lambda_handler(monkeypatch):
     """
     Example unit test for lambda function created, passing in
     the expected event to trigger it.
     """
+    stubbers = stub_clients(monkeypatch, responses=invocation_responses(1))
+
+    event = example_sqs_event()
+    result = lambda_handler(event, None)
+    assert result == {"batchItemFailures": []}
+    for stubber in stubbers:
+        stubber.assert_no_pending_responses()
+
+
+def test_lambda_handler_reports_failed_messages(monkeypatch):
     event = example_sqs_event()
+    event["Records"] = [
+        dict(event["Records"][0], messageId=message_id)
+        for message_id in ["message-1", "message-2", "message-3"]
+    ]
+    evaluated = []
+
+    def evaluate_message(sqs_record, context):
+        evaluated.append(sqs_record.message_id)
+        if sqs_record.message_id == "message-2":
+            raise RuntimeError("unit-test")
+
+    monkeypatch.setattr(model_evaluation, "evaluate_message", evaluate_message)
+    monkeypatch.setattr(model_evaluation.parameter_cache, "prefetch", lambda names: {})
+
     result = lambda_handler(event, None)
-    assert result["Records"][0]["messageId"] == "059f36b4-87a3-44ab-83d2-661975830a7d"
+
+    assert sorted(evaluated) == ["message-1", "message-2", "message-3"]
+    assert result == {"batchItemFailures": [{"itemIdentifier": "message-2"}]}
+
+
+def invocation_responses(invocations: int) -> dict[str, list]:
+    """
+    :param invocations: Number of times the lambda handler is invoked with the example event
+    :return: responses of every call made by the invocations of the lambda handler, by service
+    """
+    with open(EXAMPLE_PAYLOAD, "rb") as file:
+        body = file.read()
+
+    def evaluation() -> dict[str, list]:
+        return {
+            "s3": [
+                (
+                    "get_object",
+                    {
+                        "Body": StreamingBody(io.BytesIO(body), len(body)),
+                        "ContentLength": len(body),
+                        "ETag": '"unit-test"',
+                    },
+                ),
+                # PREDICTIONS.md, CURVES.json, statistics.json and constraints.json
+                *[("put_object", {})] * 4,
+            ],
+            "sagemaker-runtime": [
+                (
+                    "invoke_endpoint",
+                    {
+                        "Body": StreamingBody(io.BytesIO(b"0.9," * 9 + b"0.1"), 39),
+                        "ContentType": "text/csv",
+                    },
+                )
+            ],
+        }
+
+    evaluations = [evaluation() for _ in range(invocations)]
+    return {
+        # Parameters and the endpoint status are cached by the first invocation.
+        "ssm": [
+            (
+                "get_parameters",
+                {
+                    "Parameters": [
+                        {
+                            "Name": model_evaluation.ssm_model_evaluation_output_bucket_name,
+                            "Type": "String",
+                            "Value": "unit-test-output",
+                        }
+                    ]
+                },
+            )
+        ],
+        "sagemaker": [("describe_endpoint", example_describe_training_job_statuses())],
+        **{
+            service_name: [
+                response
+                for responses in evaluations
+                for response in responses[service_name]
+            ]
+            for service_name in ["s3", "sagemaker-runtime"]
+        },
+    }
+
+
+def stub_clients(
+    monkeypatch,
+    responses: dict[str, list],
+    created: list = None,
+    sessions: set = None,
+) -> list[Stubber]:
+    """
+    Stub every client created from a boto3 session with the responses of its service.
+
+    :return: stubber of each client, as clients are created
+    """
+    monkeypatch.setattr(clients, "registry", {})
+    stubbers = []
+    create_client = boto3.session.Session.client
+
+    def client(session, service_name, **kwargs):
+        if created is not None:
+            created.append(service_name)
+        if sessions is not None:
+            sessions.add(id(session))
+        boto_client = create_client(session, service_name=service_name, **kwargs)
+        stubber = Stubber(boto_client)
+        for method, response in responses[service_name]:
+            stubber.add_response(method, response)
+        stubber.activate()
+        stubbers.append(stubber)
+        return boto_client
+
+    monkeypatch.setattr(boto3.session.Session, "client", client)
+    return stubbers
+
+
+def test_lambda_handler_reuses_clients_on_warm_invocations(monkeypatch):
+    created, sessions = [], set()
+    stubbers = stub_clients(
+        monkeypatch,
+        responses=invocation_responses(2),
+        created=created,
+        sessions=sessions,
+    )
+
+    assert lambda_handler(example_sqs_event(), None) == {"batchItemFailures": []}
+    cold_start = list(created)
+    assert lambda_handler(example_sqs_event(), None) == {"batchItemFailures": []}
+
+    assert sorted(cold_start) == ["s3", "sagemaker", "sagemaker-runtime", "ssm"]
+    assert created == cold_start
+    assert len(sessions) == 1
+    for stubber in stubbers:
+        stubber.assert_no_pending_responses()
+
+
+def test_create_predictor_reuses_sdk_predictors(monkeypatch):
+    monkeypatch.setattr(clients, "registry", {"sagemaker-session": object()})
+
+    predictor = create_predictor(endpoint_name="unit-test", invocation_client="sdk")
+
+    assert (
+        create_predictor(endpoint_name="unit-test", invocation_client="sdk")
+        is predictor
+    )
+    assert (
+        create_predictor(endpoint_name="other", invocation_client="sdk")
+        is not predictor
+    )
+    assert predictor.sagemaker_session is clients.registry["sagemaker-session"]
 
 
 def test_wait_endpoint_status_in_service():
@@ -51,6 +287,71 @@ def test_wait_endpoint_status_in_service():
         )
 
 
+def test_wait_endpoint_status_in_service_uses_cached_status():
+    sagemaker_client = botocore.session.get_session().create_client("sagemaker")
+    stubber = Stubber(sagemaker_client)
+    stubber.add_response(
+        "describe_endpoint",
+        example_describe_training_job_statuses(endpoint_status="InService"),
+        {"EndpointName": "endpoint-name"},
+    )
+
+    with stubber:
+        for _ in range(3):
+            assert (
+                wait_endpoint_status_in_service(
+                    endpoint_name="endpoint-name", boto_client=sagemaker_client
+                )
+                == "InService"
+            )
+        stubber.assert_no_pending_responses()
+
+
+def test_wait_endpoint_status_in_service_stops_before_deadline(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    sagemaker_client = botocore.session.get_session().create_client("sagemaker")
+    stubber = Stubber(sagemaker_client)
+    for _ in range(4):
+        stubber.add_response(
+            "describe_endpoint",
+            example_describe_training_job_statuses(endpoint_status="Creating"),
+            {"EndpointName": ANY},
+        )
+
+    # Less time is remaining than is reserved for the evaluation, so it does not wait.
+    with stubber, pytest.raises(EndpointNotReadyError, match="still Creating"):
+        wait_endpoint_status_in_service(
+            endpoint_name="endpoint-name",
+            boto_client=sagemaker_client,
+            context=ExampleContext(remaining_time_in_millis=60_000),
+        )
+    assert sleeps == []
+    assert "endpoint-name" not in model_evaluation.in_service_endpoints
+
+
+def test_wait_endpoint_status_in_service_backs_off(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    sagemaker_client = botocore.session.get_session().create_client("sagemaker")
+    stubber = Stubber(sagemaker_client)
+    for status in ["Creating", "Creating", "Updating", "InService"]:
+        stubber.add_response(
+            "describe_endpoint",
+            example_describe_training_job_statuses(endpoint_status=status),
+            {"EndpointName": ANY},
+        )
+
+    with stubber:
+        assert (
+            wait_endpoint_status_in_service(
+                endpoint_name="endpoint-name", boto_client=sagemaker_client
+            )
+            == "InService"
+        )
+    assert sleeps == [5.0, 10.0, 20.0]
+
+
 def test_get_parameter_store_value():
     ssm_client = botocore.session.get_session().create_client("ssm")
     stubber = Stubber(ssm_client)
@@ -61,3 +362,381 @@ def test_get_parameter_store_value():
 
     with stubber:
         assert get_parameter_store_value("unit-test", ssm_client) == "string"
+
+
+def test_perform_predictions_keeps_row_order():
+    data = np.column_stack([np.arange(2003, dtype=float), np.ones(2003)])
+
+    predictions = perform_predictions(
+        data=data, predictor=ExamplePredictor(), rows=100, max_workers=8
+    )
+
+    np.testing.assert_array_equal(predictions, data[:, 0])
+
+
+def test_perform_predictions_reuses_cached_predictions(tmp_path):
+    data = np.column_stack([np.arange(1000, dtype=float), np.ones(1000)])
+    cache = PredictionCache(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)), namespace="unit-test"
+    )
+    perform_predictions(data=data, predictor=ExamplePredictor(), rows=100, cache=cache)
+    predictor = ExamplePredictor()
+
+    # Blocks of rows are cached, so they are found whatever the size of each mini-batch.
+    predictions = perform_predictions(
+        data=data, predictor=predictor, rows=300, cache=cache
+    )
+
+    np.testing.assert_array_equal(predictions, data[:, 0])
+    assert predictor.calls == 0
+    assert cache.hits == cache.misses == 2
+
+
+def test_perform_predictions_only_sends_uncached_blocks(tmp_path):
+    data = np.column_stack([np.arange(1000, dtype=float), np.ones(1000)])
+    cache = PredictionCache(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)),
+        namespace="unit-test",
+        block_rows=200,
+    )
+    perform_predictions(data=data[:600], predictor=ExamplePredictor(), cache=cache)
+    predictor = RowCountingPredictor()
+    batches = []
+
+    predictions = perform_predictions(
+        data=data,
+        predictor=predictor,
+        rows=150,
+        cache=cache,
+        on_batch=lambda start, stop, values: batches.append((start, stop)),
+    )
+
+    np.testing.assert_array_equal(predictions, data[:, 0])
+    assert predictor.rows == 400
+    assert sorted(batches)[:3] == [(0, 200), (200, 400), (400, 600)]
+    assert cache.get(data[800:]) is not None
+
+
+class ExpiringContext:
+    """Lambda context object running out of time after a number of checks."""
+
+    def __init__(self, checks: int):
+        self.checks = checks
+
+    def get_remaining_time_in_millis(self) -> int:
+        self.checks -= 1
+        return 900_000 if self.checks >= 0 else 1_000
+
+
+def test_prediction_cache_misses_after_endpoint_update(monkeypatch, tmp_path):
+    monkeypatch.setattr(model_evaluation, "PREDICTION_CACHE_DIRECTORY", str(tmp_path))
+    # A warm container found the endpoint InService before it was updated.
+    model_evaluation.in_service_endpoints["endpoint-name"] = {
+        "EndpointConfigName": "config-1"
+    }
+    sagemaker_client = botocore.session.get_session().create_client("sagemaker")
+    stubber = Stubber(sagemaker_client)
+    for endpoint_config_name in ["config-1", "config-2"]:
+        stubber.add_response(
+            "describe_endpoint",
+            dict(
+                example_describe_training_job_statuses(),
+                EndpointConfigName=endpoint_config_name,
+            ),
+            {"EndpointName": "endpoint-name"},
+        )
+    data = np.array([[1.0, 0.0], [0.0, 1.0]])
+
+    with stubber:
+        caches = [
+            model_evaluation.create_prediction_cache(
+                endpoint_name="endpoint-name",
+                test_data={"ETag": '"unit-test"'},
+                backend="local",
+                boto_client=sagemaker_client,
+            )
+            for _ in range(2)
+        ]
+        stubber.assert_no_pending_responses()
+    caches[0].put(data, np.array([0.1, 0.9]))
+
+    assert caches[0].get(data) is not None
+    assert caches[1].get(data) is None
+    assert caches[1].misses == 1
+
+
+def test_predict_test_data_resumes_from_checkpoint(tmp_path):
+    features = np.linspace(0, 1, 2000).reshape(-1, 1)
+    actuals = (np.arange(2000) % 3 == 0).astype(int)
+    chunks = [(features[:1200], actuals[:1200]), (features[1200:], actuals[1200:])]
+    checkpoint = EvaluationCheckpoint(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)),
+        key="unit-test",
+        interval=0,
+    )
+
+    with pytest.raises(EvaluationIncompleteError):
+        predict_test_data(
+            chunks=chunks,
+            predictor=ExamplePredictor(),
+            max_workers=1,
+            checkpoint=checkpoint,
+            context=ExpiringContext(checks=3),
+        )
+    predictor = ExamplePredictor()
+    resumed = predict_test_data(
+        chunks=chunks, predictor=predictor, max_workers=1, checkpoint=checkpoint
+    )
+
+    expected = predict_test_data(chunks=chunks, predictor=ExamplePredictor())
+    assert 0 < predictor.calls < 5
+    assert resumed.rows == 2000
+    np.testing.assert_array_equal(resumed.confusion_matrix, expected.confusion_matrix)
+    np.testing.assert_array_equal(resumed.score_histogram, expected.score_histogram)
+
+
+def test_predict_test_data_resumes_baseline_from_checkpoint(tmp_path):
+    generator = np.random.default_rng(0)
+    features = np.column_stack([generator.random(3000), generator.integers(0, 9, 3000)])
+    actuals = (generator.random(3000) < 0.3).astype(int)
+    chunks = list(zip(np.split(features, 3), np.split(actuals, 3)))
+    checkpoint = EvaluationCheckpoint(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)),
+        key="unit-test",
+        interval=0,
+    )
+
+    with pytest.raises(EvaluationIncompleteError):
+        predict_test_data(
+            chunks=chunks,
+            predictor=ExamplePredictor(),
+            rows=250,
+            max_workers=1,
+            checkpoint=checkpoint,
+            context=ExpiringContext(checks=8),
+            baseline=BaselineStatistics(seed=0),
+        )
+    resumed = BaselineStatistics(seed=0)
+    predict_test_data(
+        chunks=chunks,
+        predictor=ExamplePredictor(),
+        rows=250,
+        max_workers=1,
+        checkpoint=checkpoint,
+        baseline=resumed,
+    )
+
+    expected = BaselineStatistics(seed=0)
+    predict_test_data(
+        chunks=chunks,
+        predictor=ExamplePredictor(),
+        rows=250,
+        max_workers=1,
+        baseline=expected,
+    )
+    assert resumed.rows == 3000
+    assert resumed.files(["a", "b"], "y_yes") == expected.files(["a", "b"], "y_yes")
+
+
+def test_predict_test_data_without_checkpoint_does_not_stop_early():
+    features = np.linspace(0, 1, 2000).reshape(-1, 1)
+    actuals = (np.arange(2000) % 3 == 0).astype(int)
+    predictor = RowCountingPredictor()
+
+    # Stopping would lose every row evaluated, as the next attempt starts from the first row.
+    accumulator = predict_test_data(
+        chunks=[(features, actuals)],
+        predictor=predictor,
+        max_workers=1,
+        context=ExampleContext(remaining_time_in_millis=1000),
+    )
+
+    assert predictor.rows == 2000
+    assert accumulator.rows == 2000
+
+
+def test_predict_test_data_saves_checkpoint_when_complete(tmp_path):
+    features = np.linspace(0, 1, 2000).reshape(-1, 1)
+    actuals = (np.arange(2000) % 3 == 0).astype(int)
+    chunks = [(features[:1200], actuals[:1200]), (features[1200:], actuals[1200:])]
+    checkpoint = EvaluationCheckpoint(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)),
+        key="unit-test",
+        interval=60,
+    )
+    predict_test_data(
+        chunks=chunks,
+        predictor=ExamplePredictor(),
+        max_workers=4,
+        checkpoint=checkpoint,
+    )
+
+    # The report was not saved, so the checkpoint is kept and no rows are sent again.
+    predictor = RowCountingPredictor()
+    accumulator = predict_test_data(
+        chunks=chunks, predictor=predictor, max_workers=4, checkpoint=checkpoint
+    )
+    assert predictor.rows == 0
+    assert accumulator.rows == 2000
+
+
+def test_evaluate_endpoint_deletes_checkpoint_once_report_is_saved(
+    monkeypatch, tmp_path
+):
+    checkpoint = EvaluationCheckpoint(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)), key="unit-test"
+    )
+    monkeypatch.setattr(
+        model_evaluation, "create_checkpoint", lambda **kwargs: checkpoint
+    )
+    responses = invocation_responses(1)
+    # The test data is read by both attempts, the reports are not saved to S3.
+    responses["s3"] = [
+        response
+        for response in invocation_responses(2)["s3"]
+        if response[0] == "get_object"
+    ]
+    stubbers = stub_clients(monkeypatch, responses=responses)
+    uploads = []
+
+    def upload_report(files, **kwargs):
+        uploads.append(files)
+        if len(uploads) == 1:
+            raise RuntimeError("unit-test")
+
+    monkeypatch.setattr(model_evaluation, "upload_report", upload_report)
+
+    result = lambda_handler(example_sqs_event(), None)
+    assert result["batchItemFailures"] != []
+    assert checkpoint.backend.get("unit-test") is not None
+
+    # The endpoint is not invoked again, only the report is saved.
+    assert lambda_handler(example_sqs_event(), None) == {"batchItemFailures": []}
+    assert len(uploads) == 2
+    assert checkpoint.backend.get("unit-test") is None
+    for stubber in stubbers:
+        stubber.assert_no_pending_responses()
+
+
+def test_predict_test_data_only_sends_unique_rows():
+    features = np.tile(np.linspace(0, 1, 100), 20).reshape(-1, 1)
+    actuals = (np.arange(2000) % 2).astype(int)
+    chunks = [(features[:1500], actuals[:1500]), (features[1500:], actuals[1500:])]
+    predictor = RowCountingPredictor()
+
+    deduplicated = predict_test_data(
+        chunks=chunks, predictor=predictor, max_workers=1, deduplicate=True
+    )
+
+    expected = predict_test_data(chunks=chunks, predictor=ExamplePredictor())
+    assert predictor.rows == 200
+    np.testing.assert_array_equal(
+        deduplicated.confusion_matrix, expected.confusion_matrix
+    )
+    np.testing.assert_array_equal(
+        deduplicated.score_histogram, expected.score_histogram
+    )
+
+
+def test_perform_predictions_records_telemetry():
+    data = np.column_stack([np.arange(1000, dtype=float), np.ones(1000)])
+    telemetry = Telemetry(namespace="unit-test", dimensions={})
+
+    perform_predictions(data=data, predictor=ExamplePredictor(), telemetry=telemetry)
+
+    document = telemetry.emf()
+    assert document["Batches"] == 3
+    assert document["Rows"] == 1000
+    assert len(document["BatchLatency"]) == 3
+
+
+def test_predict_with_retry_on_throttling(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    predictor = ExamplePredictor(
+        errors=[throttling_error(), throttling_error("ModelError", 429)]
+    )
+
+    response = predict_with_retry(predictor=predictor, data=np.ones((2, 2)))
+
+    assert response == b"1.0,1.0"
+    assert predictor.calls == 3
+
+
+def test_predict_with_retry_raises_other_errors(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    predictor = ExamplePredictor(errors=[throttling_error("ModelError", 500)])
+
+    with pytest.raises(ClientError):
+        predict_with_retry(predictor=predictor, data=np.ones((2, 2)))
+    assert predictor.calls == 1
+
+
+def test_parse_predictions_detects_missing_rows():
+    assert parse_predictions(b"0.1\n0.9\n", start=0, stop=2).tolist() == [0.1, 0.9]
+
+    with pytest.raises(ValueError, match="expected 3"):
+        parse_predictions(b"0.1,0.9", start=500, stop=503)
+
+
+def test_predict_test_data_accumulates_metrics_per_batch():
+    scores = np.tile([0.1, 0.9, 0.6, 0.2], 525)
+    actuals = np.tile([0.0, 1.0, 0.0, 1.0], 525)
+    chunks = [
+        (np.column_stack([batch, np.zeros(700)]), batch_actuals)
+        for batch, batch_actuals in zip(np.split(scores, 3), np.split(actuals, 3))
+    ]
+
+    accumulator = predict_test_data(
+        chunks=iter(chunks), predictor=ExamplePredictor(), rows=250
+    )
+
+    assert accumulator.rows == 2100
+    np.testing.assert_array_equal(
+        accumulator.confusion_matrix, [[525, 525], [525, 525]]
+    )
+    assert accumulator.calibration[0].tolist() == [0, 525, 525, 0, 0, 0, 525, 0, 0, 525]
+
+
+class ComparisonRuntimeClient:
+    """
+    sagemaker-runtime client scoring each row with its first feature, inverted by the
+    `candidate` endpoint, which throttles its first request.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.throttle = {"candidate"}
+
+    def invoke_endpoint(self, **request) -> dict:
+        self.requests.append(request["EndpointName"])
+        if request["EndpointName"] in self.throttle:
+            self.throttle.remove(request["EndpointName"])
+            raise throttling_error()
+        scores = np.loadtxt(io.BytesIO(request["Body"]), delimiter=",", ndmin=2)[:, 0]
+        if request["EndpointName"] == "candidate":
+            scores = 1 - scores
+        return {"Body": io.BytesIO(",".join(map(str, scores)).encode("utf-8"))}
+
+
+def test_predict_test_data_compares_targets(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    client = ComparisonRuntimeClient()
+    monkeypatch.setattr(model_evaluation, "get_client", lambda name: client)
+    features = np.column_stack([np.tile([0.2, 0.8], 500), np.ones(1000)])
+    actuals = np.tile([0, 1], 500)
+
+    with create_fan_out_predictor(
+        targets=[
+            EvaluationTarget(endpointName="incumbent"),
+            EvaluationTarget(endpointName="candidate"),
+        ]
+    ) as predictor:
+        comparison = predict_test_data(
+            chunks=[(features, actuals)], predictor=predictor
+        )
+
+    incumbent, candidate = comparison.accumulators
+    np.testing.assert_array_equal(incumbent.confusion_matrix, [[500, 0], [0, 500]])
+    np.testing.assert_array_equal(candidate.confusion_matrix, [[0, 500], [500, 0]])
+    # Only the throttled mini-batch is sent to the candidate again.
+    assert client.requests.count("candidate") == client.requests.count("incumbent") + 1
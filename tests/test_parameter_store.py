@@ -0,0 +1,95 @@
+import time
+
+import botocore.session
+from botocore.stub import Stubber, ANY
+
+from example_responses import example_parameters_response
+from parameter_store import ParameterCache
+
+
+def example_get_parameters_response(names: list, invalid: list = None):
+    response = {
+        "Parameters": [
+            dict(example_parameters_response()["Parameter"], Name=name, Value=name)
+            for name in names
+        ]
+    }
+    if invalid:
+        response["InvalidParameters"] = invalid
+    return response
+
+
+def test_get_uses_cached_value_until_expired(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    ssm_client = botocore.session.get_session().create_client("ssm")
+    stubber = Stubber(ssm_client)
+    expected_params = {"Name": "unit-test", "WithDecryption": True}
+    cache = ParameterCache(ttl_seconds=60)
+
+    with stubber:
+        stubber.add_response(
+            "get_parameter", example_parameters_response(), expected_params
+        )
+        assert cache.get("unit-test", ssm_client) == "string"
+        now[0] += 59
+        assert cache.get("unit-test", ssm_client) == "string"
+        stubber.assert_no_pending_responses()
+
+        stubber.add_response(
+            "get_parameter", example_parameters_response(), expected_params
+        )
+        now[0] += 1
+        assert cache.get("unit-test", ssm_client) == "string"
+        stubber.assert_no_pending_responses()
+
+
+def test_prefetch_and_invalidate():
+    names = ["parameter-{}".format(i) for i in range(12)]
+    ssm_client = botocore.session.get_session().create_client("ssm")
+    stubber = Stubber(ssm_client)
+    stubber.add_response(
+        "get_parameters",
+        example_get_parameters_response(names[:10]),
+        {"Names": names[:10], "WithDecryption": True},
+    )
+    stubber.add_response(
+        "get_parameters",
+        example_get_parameters_response(names[10:11], invalid=names[11:]),
+        {"Names": names[10:], "WithDecryption": True},
+    )
+    stubber.add_response(
+        "get_parameter",
+        example_parameters_response(),
+        {"Name": ANY, "WithDecryption": True},
+    )
+    cache = ParameterCache(ttl_seconds=300)
+
+    with stubber:
+        values = cache.prefetch(names, ssm_client)
+        assert values == {name: name for name in names[:11]}
+        assert cache.prefetch(names[:11], ssm_client) == values
+        assert cache.get("parameter-3", ssm_client) == "parameter-3"
+
+        cache.invalidate("parameter-3")
+        assert cache.get("parameter-3", ssm_client) == "string"
+        stubber.assert_no_pending_responses()
+
+
+def test_prefetch_skipped_when_caching_disabled():
+    ssm_client = botocore.session.get_session().create_client("ssm")
+    stubber = Stubber(ssm_client)
+    expected_params = {"Name": "unit-test", "WithDecryption": True}
+    cache = ParameterCache(ttl_seconds=0)
+
+    with stubber:
+        stubber.add_response(
+            "get_parameter", example_parameters_response(), expected_params
+        )
+        stubber.add_response(
+            "get_parameter", example_parameters_response(), expected_params
+        )
+        assert cache.prefetch(["unit-test"], ssm_client) == {}
+        assert cache.get("unit-test", ssm_client) == "string"
+        assert cache.get("unit-test", ssm_client) == "string"
+        stubber.assert_no_pending_responses()
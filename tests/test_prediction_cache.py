@@ -0,0 +1,99 @@
+import io
+
+import botocore.session
+import numpy as np
+from botocore.stub import Stubber
+
+from prediction_cache import LocalDiskCacheBackend, PredictionCache, S3CacheBackend
+
+
+def test_local_disk_cache_round_trip(tmp_path):
+    cache = PredictionCache(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)), namespace="unit-test"
+    )
+    data = np.arange(6, dtype=float).reshape(3, 2)
+
+    assert cache.get(data) is None
+    cache.put(data, np.array([0.1, 0.2, 0.3]))
+
+    np.testing.assert_array_equal(cache.get(data), [0.1, 0.2, 0.3])
+    assert cache.get(data + 1) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_get_many_finds_cached_blocks(tmp_path):
+    cache = PredictionCache(
+        backend=LocalDiskCacheBackend(directory=str(tmp_path)),
+        namespace="unit-test",
+        block_rows=4,
+    )
+    data = np.arange(20, dtype=float).reshape(10, 2)
+    cache.put(data[4:8], np.array([0.1, 0.2, 0.3, 0.4]))
+    cache.put(data[8:], np.array([0.5, 0.6]))
+
+    found = cache.get_many(data, max_workers=3)
+
+    assert cache.blocks(total_rows=10) == [(0, 4), (4, 8), (8, 10)]
+    assert sorted(found) == [(4, 8), (8, 10)]
+    np.testing.assert_array_equal(found[(8, 10)], [0.5, 0.6])
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_namespace_changes_with_endpoint_config_and_test_data_version():
+    namespace = PredictionCache.namespace_for("endpoint", "config-1", '"etag"')
+
+    assert namespace == PredictionCache.namespace_for("endpoint", "config-1", '"etag"')
+    assert namespace != PredictionCache.namespace_for("endpoint", "config-2", '"etag"')
+    assert namespace != PredictionCache.namespace_for("endpoint", "config-1", '"new"')
+    assert namespace != PredictionCache.namespace_for(
+        "endpoint", "config-1", '"etag"', version_id="2"
+    )
+
+
+def test_s3_cache_miss_and_put():
+    s3_client = botocore.session.get_session().create_client("s3")
+    stubber = Stubber(s3_client)
+    cache = PredictionCache(
+        backend=S3CacheBackend(
+            bucket_name="unit-test", prefix="prediction-cache/", client=s3_client
+        ),
+        namespace="namespace",
+    )
+    data = np.ones((2, 2))
+    key = "prediction-cache/namespace/{}".format(PredictionCache.batch_key(data))
+    predictions = np.array([0.25, 0.75])
+
+    with stubber:
+        stubber.add_client_error("get_object", service_error_code="NoSuchKey")
+        stubber.add_response(
+            "put_object",
+            {},
+            {"Bucket": "unit-test", "Key": key, "Body": predictions.tobytes()},
+        )
+        stubber.add_response(
+            "get_object",
+            {"Body": io.BytesIO(predictions.tobytes())},
+            {"Bucket": "unit-test", "Key": key},
+        )
+
+        assert cache.get(data) is None
+        cache.put(data, predictions)
+        np.testing.assert_array_equal(cache.get(data), predictions)
+        stubber.assert_no_pending_responses()
+
+
+def test_s3_cache_delete():
+    s3_client = botocore.session.get_session().create_client("s3")
+    stubber = Stubber(s3_client)
+    backend = S3CacheBackend(
+        bucket_name="unit-test", prefix="evaluation-checkpoints", client=s3_client
+    )
+    stubber.add_response(
+        "delete_object",
+        {},
+        {"Bucket": "unit-test", "Key": "evaluation-checkpoints/unit-test"},
+    )
+
+    with stubber:
+        backend.delete("unit-test")
+        stubber.assert_no_pending_responses()
@@ -0,0 +1,99 @@
+import json
+
+import botocore.session
+import numpy as np
+from botocore.stub import Stubber
+
+from bootstrap import ConfidenceInterval, MetricIntervals
+from metrics import ConfusionMatrixMetrics, MetricsAccumulator
+from report import (
+    comparison_markdown,
+    confidence_intervals_markdown,
+    confusion_matrix_markdown,
+    report_prefix,
+    threshold_curves_json,
+    upload_report,
+)
+
+
+def test_confusion_matrix_markdown():
+    markdown = confusion_matrix_markdown(np.array([[3583, 53], [382, 101]]))
+
+    assert markdown.splitlines()[1] == "|   actuals |    0 |   1 |"
+    assert markdown.splitlines()[5] == "|         1 |  382 | 101 |"
+
+
+def test_threshold_curves_json_keeps_first_and_last_points():
+    scores = np.linspace(0, 1, 5001)
+    accumulator = MetricsAccumulator()
+    accumulator.update(actuals=scores > 0.7, scores=scores)
+    curves = accumulator.curves()
+
+    report = json.loads(threshold_curves_json(curves, max_points=100))
+
+    assert len(report["thresholds"]) == 100
+    assert report["thresholds"][0] == 0.999 and report["thresholds"][-1] == 0.0
+    assert report["roc_auc"] == 1.0
+    assert report["roc"]["true_positive_rate"][-1] == 1.0
+
+
+def test_upload_report():
+    s3_client = botocore.session.get_session().create_client("s3")
+    stubber = Stubber(s3_client)
+    prefix = report_prefix(endpoint_name="endpoint-name", today="2024-08-30")
+    stubber.add_response(
+        "put_object",
+        {},
+        {
+            "Bucket": "unit-test",
+            "Key": "2024-08-30/predictions/endpoint-name/PREDICTIONS.md",
+            "Body": b"# report",
+            "ContentType": "text/markdown",
+        },
+    )
+
+    with stubber:
+        upload_report(
+            bucket_name="unit-test",
+            prefix=prefix,
+            files={"PREDICTIONS.md": "# report"},
+            client=s3_client,
+        )
+        stubber.assert_no_pending_responses()
+
+
+def test_comparison_markdown_has_a_column_for_each_target():
+    scores = np.linspace(0, 1, 101)
+    accumulators = {
+        "incumbent": MetricsAccumulator(),
+        "candidate/VariantB": MetricsAccumulator(),
+    }
+    for (label, accumulator), cutoff in zip(accumulators.items(), [0.5, 0.7]):
+        accumulator.update(actuals=scores > cutoff, scores=scores)
+    results = {
+        label: (
+            ConfusionMatrixMetrics(0.9, 0.8, 0.7, 0.75, 0.95),
+            accumulator.curves(),
+            accumulator.calibration_bins(),
+        )
+        for label, accumulator in accumulators.items()
+    }
+
+    markdown = comparison_markdown(results)
+
+    header = [cell.strip() for cell in markdown.splitlines()[1].split("|")]
+    assert header[1:4] == ["metric", "incumbent", "candidate/VariantB"]
+    accuracy = [cell.strip() for cell in markdown.splitlines()[3].split("|")]
+    assert accuracy[1:4] == ["Accuracy", "0.9", "0.9"]
+
+
+def test_confidence_intervals_markdown():
+    interval = ConfidenceInterval(estimate=0.8, lower=0.75, upper=0.85)
+    intervals = MetricIntervals(*[interval] * len(MetricIntervals._fields))
+
+    markdown = confidence_intervals_markdown(intervals, confidence=0.95)
+
+    header = [cell.strip() for cell in markdown.splitlines()[1].split("|")]
+    assert header[1:5] == ["metric", "estimate", "95% lower", "95% upper"]
+    recall = [cell.strip() for cell in markdown.splitlines()[7].split("|")]
+    assert recall[1:5] == ["Recall", "0.8", "0.75", "0.85"]
@@ -0,0 +1,73 @@
+import numpy as np
+
+from model_evaluation import predict_test_data
+from sampling import SequentialSampler
+
+
+class ScorePredictor:
+    """Predictor returning the first column of each row as the prediction."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def predict(self, data: np.ndarray) -> bytes:
+        self.rows += data.shape[0]
+        return ",".join(str(value) for value in data[:, 0]).encode("utf-8")
+
+
+def example_chunks(rows: int, chunks: int, seed: int = 0) -> list:
+    generator = np.random.default_rng(seed)
+    actuals = (generator.random(rows) < 0.12).astype(int)
+    scores = np.clip(generator.normal(0.3 + 0.35 * actuals, 0.2), 0, 1)
+    features = np.column_stack([scores, np.ones(rows)])
+    return list(zip(np.array_split(features, chunks), np.array_split(actuals, chunks)))
+
+
+def test_stratified_index_keeps_the_class_balance():
+    actuals = np.r_[np.ones(1000), np.zeros(9000)].astype(int)
+    sampler = SequentialSampler(fraction=0.2, seed=0)
+
+    index = sampler.stratified_index(actuals)
+
+    assert abs(index.shape[0] - 2000) <= 2
+    assert abs(actuals[index].sum() - 200) <= 1
+    assert np.unique(index).shape[0] == index.shape[0]
+
+
+def test_sample_stops_at_the_row_budget():
+    sampler = SequentialSampler(fraction=0.5, max_rows=3000, seed=0)
+
+    sampled = list(sampler.sample(example_chunks(rows=20000, chunks=10)))
+
+    assert sum(actuals.shape[0] for _, actuals in sampled) == 3000
+    assert len(sampled) == 3
+
+
+def test_predict_test_data_stops_once_metrics_are_precise():
+    chunks = example_chunks(rows=200000, chunks=40)
+    predictor = ScorePredictor()
+    sampler = SequentialSampler(
+        fraction=0.25, metrics=["recall", "roc_auc"], tolerance=0.1, seed=0
+    )
+
+    accumulator = predict_test_data(
+        chunks=chunks, predictor=predictor, max_workers=1, sampler=sampler
+    )
+
+    expected = predict_test_data(chunks=chunks, predictor=ScorePredictor())
+    assert accumulator.rows == predictor.rows < 20000
+    assert abs(accumulator.metrics().recall - expected.metrics().recall) < 0.05
+    assert abs(accumulator.curves().roc_auc - expected.curves().roc_auc) < 0.05
+
+
+def test_predict_test_data_samples_until_the_row_budget():
+    predictor = ScorePredictor()
+    sampler = SequentialSampler(fraction=0.5, tolerance=0.0, max_rows=4000, seed=0)
+
+    accumulator = predict_test_data(
+        chunks=example_chunks(rows=20000, chunks=10),
+        predictor=predictor,
+        sampler=sampler,
+    )
+
+    assert accumulator.rows == predictor.rows == 4000
@@ -0,0 +1,48 @@
+import io
+
+import numpy as np
+import pytest
+from sagemaker.amazon.common import read_records
+
+from serializers import (
+    CompactCSVSerializer,
+    NumpySerializer,
+    RecordIOProtobufSerializer,
+    get_serializer,
+)
+
+
+def test_compact_csv_serializer():
+    data = np.array([[25.0, 1.0, 999.0, 0.0], [31.0, 0.0, 3.0, 1.0]])
+    data_with_fractions = np.column_stack([data, [0.1, -2.5e-07]])
+
+    assert CompactCSVSerializer().serialize(data) == b"25,1,999,0\n31,0,3,1"
+    assert CompactCSVSerializer().serialize(data_with_fractions) == (
+        b"25,1,999,0,0.1\n31,0,3,1,-2.5e-07"
+    )
+
+
+def test_compact_csv_serializer_round_trip():
+    data = np.random.default_rng(seed=0).normal(size=(200, 12))
+    data[:, :6] = np.round(data[:, :6] * 1000)
+
+    payload = CompactCSVSerializer().serialize(data).decode("utf-8")
+
+    np.testing.assert_array_equal(np.loadtxt(io.StringIO(payload), delimiter=","), data)
+
+
+def test_binary_serializers_round_trip():
+    data = np.arange(12, dtype=np.float32).reshape(3, 4)
+
+    npy = NumpySerializer().serialize(data)
+    records = read_records(io.BytesIO(RecordIOProtobufSerializer().serialize(data)))
+
+    np.testing.assert_array_equal(np.load(io.BytesIO(npy)), data)
+    assert len(records) == 3
+    assert list(records[2].features["values"].float32_tensor.values) == [8, 9, 10, 11]
+
+
+def test_get_serializer():
+    assert isinstance(get_serializer("application/x-npy"), NumpySerializer)
+    with pytest.raises(ValueError, match="Unsupported content type"):
+        get_serializer("application/json")